@@ -0,0 +1 @@
+   # This file makes the api directory a Python package (plain Flask routes on the server)
@@ -0,0 +1,68 @@
+"""
+**`api/datasets.py`**
+
+**Exports:** `register_dataset_routes(server)`
+
+**Purpose:** Flask routes for feeding live process data into a cached
+dataset, so new observations don't require re-uploading the whole series.
+
+**Routes:**
+
+  * `POST /api/datasets/<dataset_key>/append` — JSON body
+    `{"values": [...], "active_rules": [1, 2, ...], "baseline_end": 0}`
+    (only `values` is required). Appends the values through
+    `utils.pipeline.append_observations`: stats are updated with running
+    accumulators and the rules are evaluated over the new points only.
+
+The response has the new `dataset_key` (use it for the next append), the
+total `rows`, the updated control `stats` and the `violations` among the new
+points as `[{"index", "value", "rules": [...]}]`. An unknown or evicted
+dataset gets a 404.
+"""
+
+from flask import jsonify, request
+
+from api.validation import KEY_PATTERN, error, is_number, parse_active_rules
+from utils.pipeline import append_observations, get_stats
+
+
+def violations_of(rows):
+    """List the rows breaking at least one rule, with the rules they break."""
+    rule_columns = [c for c in rows.columns if c.startswith('rule_')]
+    violations = []
+    for row in rows.iter_rows(named=True):
+        broken = [int(c.split('_')[1]) for c in rule_columns if row[c]]
+        if broken:
+            violations.append({'index': row['index'], 'value': row['value'], 'rules': broken})
+    return violations
+
+
+def register_dataset_routes(server):
+
+    @server.route('/api/datasets/<dataset_key>/append', methods=['POST'])
+    def append_to_dataset(dataset_key):
+        """Append observations to a cached dataset"""
+        if not KEY_PATTERN.match(dataset_key):
+            return error("Unknown dataset", 404)
+        body = request.get_json(silent=True) or {}
+        values = body.get('values')
+        if not isinstance(values, list) or not values or not all(is_number(v) for v in values):
+            return error("'values' must be a non-empty list of numbers", 400)
+        try:
+            active_rules = parse_active_rules(body.get('active_rules'))
+        except ValueError as e:
+            return error(str(e), 400)
+        baseline_end = body.get('baseline_end') or 0
+        if not isinstance(baseline_end, int) or baseline_end < 0:
+            return error("'baseline_end' must be a non-negative integer", 400)
+
+        new_key, new_rows = append_observations(dataset_key, values, active_rules, baseline_end)
+        if new_key is None:
+            return error("Unknown dataset", 404)
+        return jsonify({
+            'dataset_key': new_key,
+            'rows': new_rows['index'][-1] + 1,
+            'appended': len(values),
+            'stats': get_stats(new_key, baseline_end),
+            'violations': violations_of(new_rows),
+        }), 200
@@ -0,0 +1,216 @@
+"""
+**`api/evaluate.py`**
+
+**Exports:** `register_evaluate_routes(server)`, `evaluate_series(values, ...)`
+
+**Purpose:** Headless scoring API for machines (e.g. an MES): post one or
+many series, get back their control stats, capability and per-point rule
+flags. It calls the functions of `utils/data_processor.py` directly, without
+the Dash callbacks, the pipeline cache, figures or tables.
+
+**Route:** `POST /api/v1/evaluate`
+
+JSON body, many series per request:
+
+    {"series": [{"id": "line-1", "values": [...], "usl": 12, "lsl": 8, "baseline_end": 0}, ...],
+     "active_rules": [1, 2, 5], "points": true}
+
+or a single series at the top level (`{"values": [...], "usl": ...}`). Only
+`values` (at least 2 numbers) is required; `baseline_end` computes the
+limits over the first points only, and `usl`/`lsl` give the capability.
+`active_rules` defaults to all rules, and `"points": false` leaves out the
+per-point data.
+
+The body can also be an Arrow IPC stream (`Content-Type:
+application/vnd.apache.arrow.stream`) with a `value` column and optionally a
+`series` column; the options are then query parameters (`usl`, `lsl`,
+`baseline_end`, `active_rules=1,2,5`) and apply to every series.
+
+**Response:** `{"results": [{"id", "rows", "stats", "capability",
+"violations", "rule_counts", "points": {"value", "moving_range", "rule_1",
+...}}]}`, one result per series in request order. With `?format=arrow` or
+`Accept: application/vnd.apache.arrow.stream`, the response is an Arrow IPC
+stream instead: the points of all series in one table (`series`, `index`,
+`value`, `moving_range`, `rule_1`..`rule_8`), or with `&table=summary` one
+row per series with its stats, capability and counts.
+"""
+
+import io
+import math
+
+import polars as pl
+from flask import Response, jsonify, request
+
+from api.validation import error, is_number, parse_active_rules
+from utils.data_processor import (add_control_rules, add_moving_range, calculate_capability,
+                                  calculate_control_stats)
+
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+RULE_COLUMNS = [f'rule_{i}' for i in range(1, 9)]
+
+
+class RequestError(ValueError):
+    """A request the API can't evaluate; the message is sent to the client."""
+
+
+def _optional_number(options, name):
+    value = options.get(name)
+    if value is None or is_number(value):
+        return value
+    raise RequestError(f"'{name}' must be a number")
+
+
+def _parse_active_rules(active_rules):
+    try:
+        return parse_active_rules(active_rules)
+    except ValueError as e:
+        raise RequestError(str(e)) from None
+
+
+def evaluate_series(values: pl.Series, active_rules: dict = None, usl=None, lsl=None,
+                    baseline_end: int = 0):
+    """Evaluate one series: control stats (over the first `baseline_end`
+    points, or all of them), capability, and the per-point rule flags and
+    moving ranges.
+
+    Returns:
+        tuple: (stats dict, capability dict or None, DataFrame with
+               'index', 'value', 'rule_1'..'rule_8' and 'moving_range')
+    """
+    df = values.cast(pl.Float64).alias('value').to_frame().with_row_index()
+    baseline = df.lazy().filter(pl.col('index') < baseline_end) if baseline_end else df
+    stats = calculate_control_stats(baseline)
+    capability = calculate_capability(stats['mean'], stats['std_dev'], usl, lsl)
+    points = add_moving_range(add_control_rules(df, stats, active_rules))
+    return stats, capability, points
+
+
+def _series_from_json(body):
+    """The series of a JSON request body, as (id, values, options) tuples."""
+    series = body.get('series')
+    if series is None and 'values' in body:
+        series = [body]
+    if not isinstance(series, list) or not series:
+        raise RequestError("'series' must be a non-empty list")
+    parsed = []
+    for position, item in enumerate(series):
+        if not isinstance(item, dict):
+            raise RequestError("each series must be an object with 'values'")
+        values = item.get('values')
+        if not isinstance(values, list) or not all(is_number(v) for v in values):
+            raise RequestError(f"series {position}: 'values' must be a list of numbers")
+        parsed.append((str(item.get('id', position)), pl.Series(values, dtype=pl.Float64), item))
+    return parsed
+
+
+def _series_from_arrow(stream, options):
+    """The series of an Arrow IPC request body (see module docstring)."""
+    try:
+        df = pl.read_ipc_stream(stream)
+    except Exception as e:  # Polars raises several error types for bad input
+        raise RequestError("The body isn't a readable Arrow IPC stream") from e
+    if 'value' not in df.columns or not df.schema['value'].is_numeric():
+        raise RequestError("The Arrow table needs a numeric 'value' column")
+    if not df['value'].cast(pl.Float64).is_finite().all():
+        raise RequestError("The 'value' column must only hold finite numbers")
+    if 'series' not in df.columns:
+        return [('0', df['value'], options)]
+    parts = df.partition_by('series', maintain_order=True, as_dict=True)
+    return [(str(key), part['value'], options) for (key,), part in parts.items()]
+
+
+def _evaluate_request():
+    """Evaluate every series of the current request.
+
+    Returns:
+        list of (id, stats, capability, points) tuples
+    Raises:
+        RequestError: for invalid requests
+    """
+    if request.mimetype == ARROW_STREAM:
+        options = request.args.to_dict()
+        for name in ('usl', 'lsl', 'baseline_end'):
+            if name in options:
+                try:
+                    options[name] = float(options[name]) if name != 'baseline_end' else int(options[name])
+                except ValueError:
+                    raise RequestError(f"'{name}' must be a number") from None
+                if not math.isfinite(options[name]):
+                    raise RequestError(f"'{name}' must be a number")
+        series = _series_from_arrow(io.BytesIO(request.get_data()), options)
+        active_rules = _parse_active_rules(options.get('active_rules'))
+    else:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            raise RequestError("Send a JSON object or an Arrow IPC stream")
+        series = _series_from_json(body)
+        active_rules = _parse_active_rules(body.get('active_rules'))
+
+    results = []
+    for series_id, values, options in series:
+        if values.len() < 2:
+            raise RequestError(f"series {series_id}: at least 2 values are needed")
+        baseline_end = options.get('baseline_end') or 0
+        if not isinstance(baseline_end, int) or baseline_end < 0 or baseline_end == 1:
+            raise RequestError(f"series {series_id}: 'baseline_end' must be 0 or at least 2")
+        stats, capability, points = evaluate_series(
+            values, active_rules, _optional_number(options, 'usl'), _optional_number(options, 'lsl'),
+            baseline_end)
+        results.append((series_id, stats, capability, points))
+    return results
+
+
+def _rule_counts(points):
+    counts = points.select(pl.any_horizontal(RULE_COLUMNS).sum().alias('violations'),
+                           pl.col(RULE_COLUMNS).sum()).row(0, named=True)
+    return counts.pop('violations'), {c.split('_')[1]: n for c, n in counts.items()}
+
+
+def _summary_table(results):
+    rows = []
+    for series_id, stats, capability, points in results:
+        violations, counts = _rule_counts(points)
+        rows.append({'series': series_id, **stats, **(capability or {}), 'violations': violations,
+                     **{f'rule_{i}': n for i, n in counts.items()}})
+    return pl.DataFrame(rows)
+
+
+def _arrow_response(df):
+    return Response(df.write_ipc_stream(None).getvalue(), mimetype=ARROW_STREAM)
+
+
+def _wants_arrow():
+    if request.args.get('format') == 'arrow':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', ARROW_STREAM]) == ARROW_STREAM
+
+
+def register_evaluate_routes(server):
+
+    @server.route('/api/v1/evaluate', methods=['POST'])
+    def evaluate():
+        """Stats, capability and rule flags of one or many series"""
+        try:
+            results = _evaluate_request()
+        except RequestError as e:
+            return error(str(e), 400)
+
+        if _wants_arrow():
+            if request.args.get('table') == 'summary':
+                return _arrow_response(_summary_table(results))
+            return _arrow_response(pl.concat([
+                points.select(pl.lit(series_id).alias('series'), pl.all())
+                for series_id, _, _, points in results
+            ]))
+
+        include_points = (request.get_json(silent=True) or {}).get('points', True) \
+            if request.mimetype != ARROW_STREAM else True
+        payload = []
+        for series_id, stats, capability, points in results:
+            violations, counts = _rule_counts(points)
+            result = {'id': series_id, 'rows': points.height, 'stats': stats, 'capability': capability,
+                      'violations': violations, 'rule_counts': counts}
+            if include_points:
+                result['points'] = {c: points[c].to_list() for c in ['value', 'moving_range'] + RULE_COLUMNS}
+            payload.append(result)
+        return jsonify({'results': payload}), 200
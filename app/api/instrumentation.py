@@ -0,0 +1,182 @@
+"""
+**`api/instrumentation.py`**
+
+**Exports:** `register_instrumentation(server)`
+
+**Purpose:** Expose the opt-in measurements of `utils/instrumentation.py`
+and profile requests on demand. Nothing is registered unless
+`INSTRUMENTATION` or `PROFILE` is set.
+
+With `INSTRUMENTATION=time` or `on`:
+
+  * Every response gets a `Server-Timing` header with the callbacks and
+    pipeline stages the request ran (e.g. `parse`, `stats`, `rules`,
+    `figure`), shown by the browser's developer tools under the request's
+    Timing tab. For Dash callback requests, `dispatch` is the rest of the
+    request: mostly Dash serializing the outputs (the figure's JSON).
+  * `GET /metrics` returns the duration histograms (and with `on`, peak
+    memory) of requests, callbacks and stages in the Prometheus text format.
+    They are per process: scrape each worker, or run one.
+
+With `PROFILE=on`, a request with a `profile` query parameter is profiled,
+and so are the Dash callback requests of a page opened with it (e.g.
+`http://127.0.0.1:8050/?profile=1`, then use the app); `PROFILE=all`
+profiles every request. Each profile is written to `PROFILE_DIR` and named
+in the response's `X-Profile` header: a cProfile `.prof` file (read it with
+`python -m pstats` or snakeviz), or with `profile=pyinstrument` or
+`PROFILER=pyinstrument`, a pyinstrument HTML report (`pip install
+pyinstrument`). Only the request's own thread is profiled, not Polars'
+thread pool.
+"""
+
+import cProfile
+import logging
+import os
+import re
+import tempfile
+import time
+from urllib.parse import parse_qs, urlparse
+
+from flask import Response, g, request
+
+from utils.instrumentation import (ENABLED, begin_collecting, end_collecting, prometheus_text, record,
+                                   server_timing)
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_TEXT = 'text/plain; version=0.0.4; charset=utf-8'
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'huronspc-profiles'))
+PROFILERS = ('cprofile', 'pyinstrument')
+
+
+def _profile_mode():
+    mode = os.environ.get('PROFILE', 'off').lower()
+    if mode not in ('off', 'on', 'all'):
+        raise ValueError(f"Unknown PROFILE '{mode}' (expected off, on or all)")
+    return mode
+
+
+def _default_profiler():
+    profiler = os.environ.get('PROFILER', 'cprofile').lower()
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown PROFILER '{profiler}' (expected cprofile or pyinstrument)")
+    if profiler == 'pyinstrument':
+        try:
+            import pyinstrument  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("PROFILER=pyinstrument requires the 'pyinstrument' package "
+                               "(pip install pyinstrument)") from e
+    return profiler
+
+
+def _is_dash_update():
+    return request.path.endswith('/_dash-update-component')
+
+
+def _requested_profiler(mode, default):
+    """The profiler to run for this request, or None not to profile it."""
+    if mode == 'all':
+        return default
+    value = request.args.get('profile')
+    if value is None and _is_dash_update() and request.referrer:
+        # Callback requests carry the page's URL, query string included
+        value = parse_qs(urlparse(request.referrer).query, keep_blank_values=True).get('profile', [None])[0]
+    if value is None:
+        return None
+    return value.lower() if value.lower() in PROFILERS else default
+
+
+def _start_profiler(name):
+    if name == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument isn't installed, profiling with cProfile instead")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return name, profiler
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler is already active (one at a time on Python 3.12+)
+        logger.warning("request not profiled: %s", e)
+        return None
+    return 'cprofile', profiler
+
+
+def _stop_profiler(running):
+    """Stop a profiler from `_start_profiler` and write its output.
+
+    Returns:
+        str: the name of the file written
+    """
+    name, profiler = running
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'index'
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns() % 10 ** 6:06d}-{slug}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if name == 'pyinstrument':
+        profiler.stop()
+        filename += '.html'
+        with open(os.path.join(PROFILE_DIR, filename), 'w') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        filename += '.prof'
+        profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+    logger.info("profile of %s written to %s", request.path, os.path.join(PROFILE_DIR, filename))
+    return filename
+
+
+def register_instrumentation(server):
+    profile_mode = _profile_mode()
+    if not ENABLED and profile_mode == 'off':
+        return
+    default_profiler = _default_profiler()
+
+    @server.before_request
+    def start_instrumentation():
+        if ENABLED:
+            g.instrumentation = (begin_collecting(), time.perf_counter())
+        if profile_mode != 'off':
+            profiler = _requested_profiler(profile_mode, default_profiler)
+            if profiler is not None:
+                g.profiler = _start_profiler(profiler)
+
+    @server.after_request
+    def add_instrumentation_headers(response):
+        running = g.pop('profiler', None)
+        if running is not None:
+            response.headers['X-Profile'] = _stop_profiler(running)
+        started = g.pop('instrumentation', None)
+        if started is not None:
+            token, start = started
+            total = time.perf_counter() - start
+            measurements = end_collecting(token)
+            # Record the request itself, under its route rather than its path
+            rule = request.url_rule.rule if request.url_rule else 'unmatched'
+            record(f"{request.method} {rule}", total, 'request')
+            other = ('dispatch', "Dash dispatch and serialization") if _is_dash_update() else None
+            response.headers['Server-Timing'] = server_timing(measurements, total, other)
+        return response
+
+    @server.teardown_request
+    def stop_instrumentation(_):
+        # Not reached by after_request when the request failed
+        running = g.pop('profiler', None)
+        if running is not None:
+            name, profiler = running
+            if name == 'pyinstrument':
+                profiler.stop()
+            else:
+                profiler.disable()
+        started = g.pop('instrumentation', None)
+        if started is not None:
+            end_collecting(started[0])
+
+    if ENABLED:
+        @server.route('/metrics')
+        def metrics():
+            """Request, callback and stage timings in the Prometheus text format"""
+            return Response(prometheus_text(), content_type=PROMETHEUS_TEXT)
@@ -0,0 +1,95 @@
+"""
+**`api/limits.py`**
+
+**Exports:** `register_limits_routes(server)`
+
+**Purpose:** Flask routes for Phase II scoring: freeze the control limits of
+a cached dataset once, then judge new batches of observations against them
+without recomputing any baseline (see `utils/limits.py`).
+
+**Routes:**
+
+  * `POST /api/limits` — JSON body `{"dataset_key", "baseline_end": 0,
+    "chart_type": "individuals", "subgroup_size": 5}` to freeze the limits of
+    a cached dataset (over its first `baseline_end` points, or all of them),
+    or `{"limits": {...}}` with a saved limits object. Returns
+    `{"limits_id", "limits"}`.
+  * `GET /api/limits/<limits_id>` — the limits object.
+  * `POST /api/limits/<limits_id>/score` — JSON body `{"values": [...],
+    "active_rules": [1, 2, ...]}` (only `values` is required). Evaluates
+    the rules of the values against the frozen limits.
+
+The score response has the number of `rows` scored (points, or subgroups
+for subgroup limits), the `counts` of violations per rule and the
+`violations` as `[{"index", "value", "rules": [...]}]`. The rules only see
+the values sent: patterns spanning the end of a previous batch aren't
+detected. Unknown or evicted limits get a 404; send them again with
+`{"limits": {...}}`.
+"""
+
+import polars as pl
+from flask import jsonify, request
+
+from api.datasets import violations_of
+from api.validation import KEY_PATTERN, error, is_number, parse_active_rules
+from utils.limits import freeze_limits, score_against_limits, validate_limits
+from utils.pipeline import chart_from_settings, frozen_limits_id, get_limits, get_stats, store_limits
+
+
+def register_limits_routes(server):
+
+    @server.route('/api/limits', methods=['POST'])
+    def create_limits():
+        """Freeze the limits of a cached dataset, or store saved limits"""
+        body = request.get_json(silent=True) or {}
+        if 'limits' in body:
+            try:
+                limits = validate_limits(body['limits'])
+            except ValueError as e:
+                return error(str(e), 400)
+        else:
+            dataset_key = body.get('dataset_key')
+            if not isinstance(dataset_key, str) or not KEY_PATTERN.match(dataset_key):
+                return error("'dataset_key' or 'limits' is required", 400)
+            baseline_end = body.get('baseline_end') or 0
+            if not isinstance(baseline_end, int) or baseline_end < 0:
+                return error("'baseline_end' must be a non-negative integer", 400)
+            chart = chart_from_settings({'chart_type': body.get('chart_type'),
+                                         'subgroup_size': body.get('subgroup_size')})
+            stats = get_stats(dataset_key, baseline_end, chart)
+            if stats is None:
+                return error("Unknown dataset", 404)
+            limits = freeze_limits(stats, chart, {'dataset_key': dataset_key, 'baseline_end': baseline_end})
+        return jsonify({'limits_id': frozen_limits_id(store_limits(limits)), 'limits': limits}), 201
+
+    @server.route('/api/limits/<limits_id>', methods=['GET'])
+    def read_limits(limits_id):
+        limits = get_limits(limits_id) if KEY_PATTERN.match(limits_id) else None
+        if limits is None:
+            return error("Unknown limits", 404)
+        return jsonify(limits), 200
+
+    @server.route('/api/limits/<limits_id>/score', methods=['POST'])
+    def score_values(limits_id):
+        """Evaluate the rules of new observations against frozen limits"""
+        limits = get_limits(limits_id) if KEY_PATTERN.match(limits_id) else None
+        if limits is None:
+            return error("Unknown limits", 404)
+        body = request.get_json(silent=True) or {}
+        values = body.get('values')
+        if not isinstance(values, list) or not values or not all(is_number(v) for v in values):
+            return error("'values' must be a non-empty list of numbers", 400)
+        try:
+            active_rules = parse_active_rules(body.get('active_rules'))
+        except ValueError as e:
+            return error(str(e), 400)
+
+        df = pl.DataFrame({'value': pl.Series(values, dtype=pl.Float64)})
+        scored = score_against_limits(df, limits, active_rules).collect()
+        rule_columns = [f'rule_{i}' for i in range(1, 9)]
+        counts = scored.select(pl.col(rule_columns).sum()).row(0, named=True)
+        return jsonify({
+            'rows': scored.height,
+            'counts': {c.split('_')[1]: n for c, n in counts.items()},
+            'violations': violations_of(scored),
+        }), 200
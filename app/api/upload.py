@@ -0,0 +1,253 @@
+"""
+**`api/upload.py`**
+
+**Exports:** `register_upload_routes(server)`
+
+**Purpose:** Flask routes for uploading datasets without going through
+`dcc.Upload`, which sends files base64-encoded (33% bigger) inside the Dash
+callback JSON. Files are streamed to disk, parsed into the dataset cache, and
+the caller gets back a small dataset handle. The browser side lives in
+`assets/upload_client.js`, which feeds the handle to the `upload-handle` input.
+
+**Routes:**
+
+  * `POST /upload` — multipart form with a `file` field; one request.
+  * `POST /upload/sessions` — start a resumable upload. JSON body
+    `{"filename": ..., "size": <bytes>}`; returns `{"upload_id", "chunk_size"}`.
+  * `GET /upload/sessions/<upload_id>` — how many bytes were received, to resume.
+  * `PUT /upload/sessions/<upload_id>` — raw chunk with a
+    `Content-Range: bytes <start>-<end>/<size>` header. Chunks must arrive in
+    order; a mismatched start gets a 409 with the expected offset. The last
+    chunk returns the dataset handle.
+
+A finished upload returns `{"dataset_key", "dataset_name", "rows"}`, or for
+a file holding several series (one numeric column per tag, or `tag` and
+`value` columns) `{"batch_key", "dataset_name", "rows", "tags"}`; if its
+series can't be read, a 400 says why rather than falling back to the first
+column. Uploads larger than `MAX_UPLOAD_BYTES` (default 500 MB) are rejected
+with a 413.
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+
+from flask import jsonify, request
+
+from api.validation import error
+from utils.data_loader import load_batch_file, load_uploaded_file
+
+try:
+    import fcntl
+except ImportError:  # Windows: chunks are then only serialized within a worker
+    fcntl = None
+
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 500 * 1024 * 1024))
+CHUNK_SIZE = 8 * 1024 * 1024
+# Room for the multipart envelope around a file of MAX_UPLOAD_BYTES
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+# Partial uploads live on disk so chunks can be received by any worker
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'huronspc-uploads'))
+# Unfinished uploads older than this are deleted
+SESSION_MAX_AGE = 24 * 3600
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+_session_locks = weakref.WeakValueDictionary()
+_session_locks_lock = threading.Lock()
+
+
+def _session_paths(upload_id):
+    return (os.path.join(UPLOAD_DIR, upload_id + '.part'),
+            os.path.join(UPLOAD_DIR, upload_id + '.json'))
+
+
+def _copy_at_most(stream, f, limit):
+    """Copy `stream` to `f`, stopping after `limit` bytes.
+
+    Returns:
+        bool: False if the stream held more than `limit` bytes
+    """
+    remaining = limit
+    while remaining > 0:
+        data = stream.read(min(1024 * 1024, remaining))
+        if not data:
+            return True
+        f.write(data)
+        remaining -= len(data)
+    return not stream.read(1)
+
+
+@contextmanager
+def _locked_session(upload_id):
+    """Hold an upload session's lock, so its chunks are appended one at a
+    time, and yield its metadata (None if there is no such session).
+
+    Within a process a per-session lock serializes the requests; across the
+    workers sharing UPLOAD_DIR, an flock on the session's metadata file
+    (not available on Windows).
+    """
+    with _session_locks_lock:
+        lock = _session_locks.get(upload_id)
+        if lock is None:
+            lock = _session_locks[upload_id] = threading.Lock()
+    part_path, meta_path = _session_paths(upload_id)
+    with lock:
+        try:
+            f = open(meta_path)
+        except FileNotFoundError:
+            yield None
+            return
+        with f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            # The upload may have been finished by the request we waited for
+            meta = json.load(f) if os.path.exists(part_path) else None
+            if fcntl is not None:
+                yield meta
+                return
+        # Without flock, closed first: Windows can't delete an open file
+        yield meta
+
+
+def _remove_stale_sessions():
+    cutoff = time.time() - SESSION_MAX_AGE
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _finish_upload(file_path, filename):
+    """Parse an uploaded file into the dataset cache and build its handle."""
+    try:
+        batch_key, batch = load_batch_file(file_path, filename)
+    except ValueError as e:
+        return error(f"This file holds several series, but {e}.", 400)
+    if batch is not None:
+        return jsonify({'batch_key': batch_key, 'dataset_name': filename, 'rows': batch.height,
+                        'tags': batch['tag'].n_unique()}), 200
+    dataset_key, df = load_uploaded_file(file_path, filename)
+    if df is None:
+        return error("We couldn't read that file. Please upload a CSV, Parquet, Arrow or NDJSON "
+                      "file whose first column holds numeric values (at least 2 data points).", 400)
+    return jsonify({'dataset_key': dataset_key, 'dataset_name': filename, 'rows': df.height}), 200
+
+
+def register_upload_routes(server):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # Also bounds request bodies without a Content-Length (chunked transfer)
+    max_content_length = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+    if (server.config.get('MAX_CONTENT_LENGTH') or 0) < max_content_length:
+        server.config['MAX_CONTENT_LENGTH'] = max_content_length
+
+    @server.route('/upload', methods=['POST'])
+    def upload_file():
+        """Single-request upload of a multipart `file` field"""
+        if request.content_length and request.content_length > MAX_UPLOAD_BYTES:
+            return error("File too large", 413)
+        uploaded = request.files.get('file')
+        if uploaded is None or not uploaded.filename:
+            return error("No file in the 'file' field", 400)
+
+        fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                complete = _copy_at_most(uploaded.stream, f, MAX_UPLOAD_BYTES)
+            if not complete:
+                return error("File too large", 413)
+            return _finish_upload(tmp_path, uploaded.filename)
+        finally:
+            os.remove(tmp_path)
+
+    @server.route('/upload/sessions', methods=['POST'])
+    def create_upload_session():
+        """Start a resumable, chunked upload"""
+        body = request.get_json(silent=True) or {}
+        size = body.get('size')
+        if not isinstance(size, int) or size <= 0:
+            return error("'size' must be a positive number of bytes", 400)
+        if size > MAX_UPLOAD_BYTES:
+            return error("File too large", 413)
+
+        _remove_stale_sessions()
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = _session_paths(upload_id)
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w') as f:
+            json.dump({'filename': str(body.get('filename') or 'upload'), 'size': size}, f)
+        return jsonify({'upload_id': upload_id, 'chunk_size': CHUNK_SIZE}), 201
+
+    @server.route('/upload/sessions/<upload_id>', methods=['GET'])
+    def get_upload_session(upload_id):
+        """Report progress so an interrupted upload can resume"""
+        if not _UPLOAD_ID.match(upload_id):
+            return error("Unknown upload", 404)
+        part_path, meta_path = _session_paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            received = os.path.getsize(part_path)
+        except FileNotFoundError:
+            return error("Unknown upload", 404)
+        return jsonify({'received': received, 'size': meta['size']}), 200
+
+    @server.route('/upload/sessions/<upload_id>', methods=['PUT'])
+    def put_upload_chunk(upload_id):
+        """Append one chunk; the last chunk finishes the upload"""
+        if not _UPLOAD_ID.match(upload_id):
+            return error("Unknown upload", 404)
+        match = _CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+        if not match:
+            return error("Missing or invalid Content-Range header", 400)
+        start, end, total = (int(g) for g in match.groups())
+        length = end - start + 1
+        if request.content_length is not None and request.content_length != length:
+            return error("Chunk length doesn't match Content-Range", 400)
+
+        part_path, meta_path = _session_paths(upload_id)
+        with _locked_session(upload_id) as meta:
+            if meta is None:
+                return error("Unknown upload", 404)
+            if total != meta['size'] or end < start or end >= total:
+                return error("Content-Range doesn't match the upload size", 400)
+            received = os.path.getsize(part_path)
+            if start != received:
+                return jsonify({'error': "Unexpected offset", 'received': received}), 409
+
+            with open(part_path, 'ab') as f:
+                try:
+                    complete = _copy_at_most(request.stream, f, length)
+                except Exception:
+                    # e.g. the body went over MAX_CONTENT_LENGTH
+                    f.truncate(start)
+                    raise
+            received = os.path.getsize(part_path)
+            if not complete or received != end + 1:
+                # Connection dropped mid-chunk, or more data than announced:
+                # drop the chunk so the client can resend it from `start`
+                with open(part_path, 'ab') as f:
+                    f.truncate(start)
+                if not complete:
+                    return error("Chunk longer than its Content-Range", 400)
+                return jsonify({'error': "Incomplete chunk", 'received': start}), 409
+
+            if received < total:
+                return jsonify({'received': received, 'size': total}), 202
+            try:
+                return _finish_upload(part_path, meta['filename'])
+            finally:
+                for path in (part_path, meta_path):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
@@ -0,0 +1,52 @@
+"""
+**`api/validation.py`**
+
+**Exports:** `KEY_PATTERN`, `error(message, status)`, `is_number(value)`,
+`parse_active_rules(active_rules)`
+
+**Purpose:** Checks of request bodies shared by the routes in `api/`, so
+they all accept and reject the same values.
+"""
+
+import math
+import re
+
+from flask import jsonify
+
+# Dataset keys and limits ids are both 32 hex digits
+KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def error(message, status):
+    """JSON error response, `{"error": message}`."""
+    return jsonify({'error': message}), status
+
+
+def is_number(value):
+    """Whether a value of a JSON body is a finite number (Flask's JSON
+    parser accepts NaN and Infinity, and a bool is an int in Python)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def parse_active_rules(active_rules):
+    """The active rules of a request: a list of rule numbers, or a
+    comma-separated string of them (e.g. a query parameter).
+
+    Returns:
+        dict: {1: True, 2: False, ...} as for `add_control_rules()`, or None
+              for all rules when `active_rules` is None
+    Raises:
+        ValueError: with a message for the client
+    """
+    if active_rules is None:
+        return None
+    if isinstance(active_rules, str):
+        try:
+            active_rules = [int(i) for i in active_rules.split(',') if i]
+        except ValueError:
+            raise ValueError("'active_rules' must be a list of rule numbers") from None
+    if not isinstance(active_rules, list):
+        raise ValueError("'active_rules' must be a list of rule numbers")
+    if not all(isinstance(i, int) and not isinstance(i, bool) and 1 <= i <= 8 for i in active_rules):
+        raise ValueError("'active_rules' must be rule numbers from 1 to 8")
+    return {i: i in active_rules for i in range(1, 9)}
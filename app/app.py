@@ -1,3 +1,4 @@
+import logging
 import os
 import sys
 
@@ -13,6 +14,17 @@ from callbacks.data_processing import register_data_processing_callbacks
 from callbacks.download import register_download_callback
 from callbacks.waffle_menu import register_waffle_menu_callbacks
 from callbacks.period_comparison import register_period_comparison_callbacks
+from callbacks.live import register_live_callbacks
+from callbacks.overview import register_overview_callbacks
+from callbacks.limits import register_limits_callbacks
+from api.upload import register_upload_routes
+from api.datasets import register_dataset_routes
+from api.limits import register_limits_routes
+from api.evaluate import register_evaluate_routes
+from api.instrumentation import register_instrumentation
+
+# Pipeline stage timings are logged at INFO level; set LOG_LEVEL=INFO to see them
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING').upper())
 
 # Initialize Flask and Dash
 server = Flask(__name__)
@@ -27,6 +39,14 @@ register_data_processing_callbacks(app)
 register_download_callback(app)
 register_waffle_menu_callbacks(app)
 register_period_comparison_callbacks(app)
+register_live_callbacks(app)
+register_overview_callbacks(app)
+register_limits_callbacks(app)
+register_upload_routes(server)
+register_dataset_routes(server)
+register_limits_routes(server)
+register_evaluate_routes(server)
+register_instrumentation(server)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,131 @@
+// Send uploaded files to the /upload/sessions endpoint (see api/upload.py)
+// instead of letting dcc.Upload base64-encode them into the callback JSON.
+// Files go up in chunks, resuming after a dropped connection, and the Dash
+// callbacks only ever receive the resulting dataset handle through the
+// hidden 'upload-handle' input (and the start of an upload through
+// 'upload-started').
+
+const UPLOAD_COMPONENT_IDS = ['upload-data', 'upload-data-menu'];
+const MAX_CHUNK_RETRIES = 3;
+
+// Which upload component (if any) an element belongs to
+function uploadSourceOf(el) {
+    for (const id of UPLOAD_COMPONENT_IDS) {
+        const component = document.getElementById(id);
+        if (component && component.contains(el)) {
+            return id;
+        }
+    }
+    return null;
+}
+
+// Hand a value to Dash: dcc.Input only picks up changes made through React's
+// value setter followed by an 'input' event
+function sendToDash(value, inputId = 'upload-handle') {
+    const input = document.getElementById(inputId);
+    if (!input) {
+        return;
+    }
+    const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+    setter.call(input, JSON.stringify(value));
+    input.dispatchEvent(new Event('input', {bubbles: true}));
+}
+
+async function readJson(response) {
+    try {
+        return await response.json();
+    } catch (e) {
+        return {};
+    }
+}
+
+async function uploadFile(file) {
+    let response = await fetch('/upload/sessions', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({filename: file.name, size: file.size})
+    });
+    let body = await readJson(response);
+    if (!response.ok) {
+        throw new Error(body.error || 'Upload failed');
+    }
+    const uploadUrl = '/upload/sessions/' + body.upload_id;
+    const chunkSize = body.chunk_size;
+
+    let offset = 0;
+    let retries = 0;
+    while (true) {
+        const end = Math.min(offset + chunkSize, file.size);
+        try {
+            response = await fetch(uploadUrl, {
+                method: 'PUT',
+                headers: {'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`},
+                body: file.slice(offset, end)
+            });
+        } catch (e) {
+            // Network error: ask the server where to resume from
+            if (++retries > MAX_CHUNK_RETRIES) {
+                throw e;
+            }
+            const status = await readJson(await fetch(uploadUrl));
+            offset = status.received || 0;
+            continue;
+        }
+        body = await readJson(response);
+        if (response.status === 409 && retries++ < MAX_CHUNK_RETRIES) {
+            offset = body.received;
+        } else if (response.status === 202) {
+            offset = body.received;
+            retries = 0;
+        } else if (response.ok) {
+            return body;
+        } else {
+            throw new Error(body.error || 'Upload failed');
+        }
+    }
+}
+
+async function handleFile(file, source) {
+    // Cancels the background jobs still processing the previous dataset
+    sendToDash({source: source, nonce: Date.now()}, 'upload-started');
+    try {
+        const handle = await uploadFile(file);
+        sendToDash({...handle, source: source, nonce: Date.now()});
+    } catch (e) {
+        sendToDash({error: e.message, source: source, nonce: Date.now()});
+    }
+}
+
+// Take over the file input before dcc.Upload (react-dropzone) reads the file.
+// Stopping propagation in the capture phase keeps the event away from React,
+// which listens further down; other capture listeners on document (like the
+// card feedback in button_feedback.js) still run.
+document.addEventListener('change', function (e) {
+    const input = e.target;
+    if (!(input instanceof HTMLInputElement) || input.type !== 'file') {
+        return;
+    }
+    const source = uploadSourceOf(input);
+    if (!source || !input.files || !input.files.length) {
+        return;
+    }
+    e.stopPropagation();
+    const file = input.files[0];
+    // Reset so picking the same file again still fires 'change'
+    input.value = '';
+    handleFile(file, source);
+}, true);
+
+document.addEventListener('drop', function (e) {
+    const source = uploadSourceOf(e.target);
+    if (!source || !e.dataTransfer || !e.dataTransfer.files.length) {
+        return;
+    }
+    e.preventDefault();
+    e.stopPropagation();
+    const card = e.target.closest('.option-card');
+    if (card) {
+        card.classList.add('working');
+    }
+    handleFile(e.dataTransfer.files[0], source);
+}, true);
@@ -12,28 +12,67 @@ Major Callbacks:
 
     Purpose: Sync UI state to global app state.
 
-2. Output Update:
+2. Staged output update (see utils/pipeline.py):
 
-    Inputs: Uploads, sample data buttons, settings
+    load_dataset:        upload handle, sample data buttons, overview tags → stored-data, batch-store,
+                         empty state, toolbar, ...
+    update_stats_stage:  stored-data, app-state-store → stats-store (the chart type and subgroup size
+                         are part of the handle: X̄-R/X̄-S charts work on subgroups; time-indexed data
+                         is resampled to the selected period unit, and the handle points at the
+                         resampled dataset; with frozen limits the baseline is the limits' id, and
+                         the chart is the one they were frozen for, see callbacks/limits.py)
+    update_rules_stage:  stats-store, app-state-store → processed-data-store
+    update_capability_stage: stats-store, app-state-store → capability-store
+    update_chart_settings: app-state-store → chart-settings-store
+    update_figure:       processed-data-store, capability-store, chart-settings-store → plot-container
+                         (skipped when live mode already patched the chart to match, see callbacks/live.py),
+                         or a Patch of the USL/LSL lines when only the spec limits changed
+    update_stats_panel:  stats-store, capability-store → stats-panel-container (not rebuilt when only
+                         the spec limits changed)
+    update_capability_values: capability-store → the panel's Cp/Cpk values (stats-cp, stats-cpk)
+    update_table:        processed-data-store → output-data-upload
+    update_row_count:    processed-data-store → table-row-count (kept up to date in live mode, which
+                         keeps the table)
+    update_table_page:   data-table paging/sort/filter, processed-data-store → data-table rows (one page only)
 
-    Outputs: Dataframes, plots, empty state, download options, rule boxes, toolbar
+    Each stage store holds a small handle. A stage callback returns no_update
+    when its handle didn't change, so only the outputs that depend on what
+    actually changed are recomputed (e.g. moving the USL slider never
+    re-evaluates the rules or rebuilds the table).
 
-    Purpose: End-to-end update of all UI/display elements as user interacts.
+    update_rules_stage and update_figure are the CPU-heavy stages: they run as
+    background jobs when enabled (see utils/background.py), reporting their
+    progress in processing-status / chart-status, and are cancelled when a new
+    upload starts (upload-started).
 
 Pattern: Reactive chain — changes in controls or data upload → update app state → recalculate & update outputs/UI.
 """
 
-from dash import Output, Input, State, html, dcc, dash_table, ctx, ALL, no_update
+import json
+import math
+import os
+
+from dash import Output, Input, State, html, dcc, dash_table, ctx, ALL, Patch, no_update
+from dash.exceptions import PreventUpdate
 # Import your utility functions
-from utils.data_loader import parse_csv, load_predefined_dataset
-from utils.data_processor import calculate_capability, calculate_control_stats, add_control_rules, add_moving_range
-from utils.slider_defaults import get_slider_defaults
-from utils.chart_creator import create_control_chart, make_stats_panel
+from utils.data_loader import load_predefined_dataset, load_batch_series, get_cached_dataset
+from utils.pipeline import (get_stats, get_rules, get_capability, get_figure, figure_key, load_processed_data,
+                            stats_handle, rules_handle, capability_handle, handle_active_rules,
+                            spec_limits, baseline_end_from_settings, chart_from_settings,
+                            resample_interval, resampled_key, store_limits)
+from utils.chart_creator import make_stats_panel, patch_spec_limits, capability_values
+from utils.table_query import get_table_page
 from components.settings_toolbar import create_settings_toolbar
+from utils.background import heavy_callback
+from utils.instrumentation import instrumented
 from callbacks.rule_checkbox import get_active_rules
 from components.layout import SAMPLE_DATASETS # Import the dataset config
 
 
+# Rows of the data table sent to the browser at a time
+TABLE_PAGE_SIZE = 100
+
+
 def register_data_processing_callbacks(app):
     # Callback to update the app state when settings change
     @app.callback(
@@ -42,11 +81,16 @@ def register_data_processing_callbacks(app):
         Input('dropdown-period-type', 'value'),
         Input('input-process-change', 'value'),
         Input('checklist-period-comparison', 'value'),
-        Input('input-y-axis-label', 'value')],
+        Input('input-y-axis-label', 'value'),
+        Input('checklist-full-resolution', 'value'),
+        Input('dropdown-chart-type', 'value'),
+        Input('input-subgroup-size', 'value')],
         [State('app-state-store', 'data')],
         prevent_initial_call=True
     )
-    def update_app_state_settings(range_slider, period_type, process_change, period_comparison, y_axis_label, current_data):
+    @instrumented
+    def update_app_state_settings(range_slider, period_type, process_change, period_comparison, y_axis_label,
+                                  full_resolution, chart_type, subgroup_size, current_data):
         """Update the app state with settings values"""
         # Initialize app state if None
         if current_data is None:
@@ -69,56 +113,52 @@ def register_data_processing_callbacks(app):
             current_data['settings']['period_comparison_enabled'] = 'period_comparison' in (period_comparison or [])
         elif triggered_id == 'input-y-axis-label' and y_axis_label is not None:
             current_data['settings']['y_axis_label'] = y_axis_label
+        elif triggered_id == 'checklist-full-resolution':
+            current_data['settings']['full_resolution'] = 'full_resolution' in (full_resolution or [])
+        elif triggered_id == 'dropdown-chart-type' and chart_type is not None:
+            current_data['settings']['chart_type'] = chart_type
+        elif triggered_id == 'input-subgroup-size' and subgroup_size is not None:
+            current_data['settings']['subgroup_size'] = subgroup_size
         
         return current_data
     
     @app.callback(
-        [Output('stats-panel-container', 'children'),
-        Output('plot-container', 'children'),
-        Output('output-data-upload', 'children'),
-        Output('stored-data', 'data'),
+        [Output('stored-data', 'data'),
+        Output('load-message', 'children'),
         Output('empty-state', 'style'),
-        Output('processed-data-store', 'data'),
         Output('download-container', 'style'),
-        Output('rule-boxes-container', 'children'),
         Output('upload-card', 'className'),
         Output({'type': 'sample-data-btn', 'index': ALL}, 'className'),
         Output('settings-toolbar-container', 'children'),
         Output('settings-toolbar-container', 'style'),
-        Output('dataset-selector', 'style')],
-        [Input('upload-data', 'contents'),
-         Input('upload-data-menu', 'contents'),
+        Output('dataset-selector', 'style'),
+        Output('batch-store', 'data')],
+        [Input('upload-handle', 'value'),
          Input({'type': 'sample-data-btn', 'index': ALL}, 'n_clicks'),
          Input({'type': 'sample-data-menu-btn', 'index': ALL}, 'n_clicks'),
-         Input('app-state-store', 'data')],
-        [State('upload-data', 'filename'),
-         State('upload-data-menu', 'filename'),
-         State('stored-data', 'data')]
+         Input({'type': 'overview-tag-btn', 'index': ALL}, 'n_clicks')],
+        [State('batch-store', 'data')],
+        prevent_initial_call=True
     )
-    def update_output(contents, menu_contents, sample_clicks, menu_clicks, app_state,
-                      filename, menu_filename, stored_data):
-        """Update the output based on user interactions"""
-        active_rules = get_active_rules(app_state)
-
+    @instrumented
+    def load_dataset(upload_handle, sample_clicks, menu_clicks, tag_clicks, batch):
+        """Load stage: parse the uploaded or sample dataset (or a tag of a
+        multi-series upload) into the cache and show the UI that goes with
+        having data loaded"""
         # 1. Initialize all output variables with their default values
         num_sample_btns = len(SAMPLE_DATASETS)
         outputs = {
-            'stats_panel': html.Div(style={'display': 'none'}),
-            'plot_component': html.Div(style={'display': 'none'}),
-            'data_info': None,
-            'stored_data': stored_data,
+            # Clearing the dataset also clears the downstream outputs
+            'stored_data': None,
+            'load_message': None,
             'empty_state_style': {'margin': '40px auto', 'maxWidth': '800px'},
-            'processed_data': None,
             'download_container_style': {'display': 'none'},
-            # Rule boxes are static (their content never changes; styling is
-            # handled by update_rule_boxes), so never re-render the container —
-            # replacing it would also drop the section title from the layout
-            'rule_boxes': no_update,
             'upload_class': 'option-card upload-card',
             'sample_btn_classes': ['option-card'] * num_sample_btns,
             'settings_toolbar': None,
             'settings_toolbar_style': {'display': 'none'},
-            'dataset_selector_style': {'display': 'flex'}
+            'dataset_selector_style': {'display': 'flex'},
+            'batch': None
         }
 
         if not ctx.triggered:
@@ -127,79 +167,245 @@ def register_data_processing_callbacks(app):
         trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
         df = None
         dataset_name = None
+        dataset_key = None
         
         # Helper to find dataset config by id
         def find_dataset_by_id(dataset_id):
             return next((ds for ds in SAMPLE_DATASETS if ds['id'] == dataset_id), None)
 
         # 2. Determine which dataset to load based on the trigger
-        if trigger_id in ('upload-data', 'upload-data-menu'):
-            uploaded = contents if trigger_id == 'upload-data' else menu_contents
-            if uploaded:
-                outputs['upload_class'] += ' active'
-                df = parse_csv(uploaded)
-                dataset_name = filename if trigger_id == 'upload-data' else menu_filename
+        if trigger_id == 'upload-handle':
+            # Uploads go to the /upload endpoint (api/upload.py), which has
+            # already parsed the file into the cache; we only get its handle
+            handle = json.loads(upload_handle) if upload_handle else {}
+            if not handle:
+                return list(outputs.values())
+            outputs['upload_class'] += ' active'
+            if handle.get('error'):
+                outputs['load_message'] = html.Div(html.P(handle['error'], className="warning-text"))
+                return list(outputs.values())
+            if handle.get('batch_key'):
+                # Several series: show the overview (callbacks/overview.py)
+                # and wait for a tag to be picked
+                outputs['batch'] = {'batch_key': handle['batch_key'], 'dataset_name': handle['dataset_name']}
+                outputs['empty_state_style'] = {'display': 'none'}
+                outputs['dataset_selector_style'] = {'display': 'none'}
+                return list(outputs.values())
+            dataset_key = handle['dataset_key']
+            dataset_name = handle['dataset_name']
+            df = get_cached_dataset(dataset_key)
+            if df is None:
+                # Parsed by a worker that doesn't share the cache backend
+                outputs['load_message'] = html.Div(html.P(
+                    "Your upload is no longer available, please upload it again.", className="warning-text"))
+                return list(outputs.values())
         elif 'sample-data-btn' in trigger_id or 'sample-data-menu-btn' in trigger_id:
             clicked_index_str = ctx.triggered_id['index']
             dataset_config = find_dataset_by_id(clicked_index_str)
             if dataset_config:
-                df = load_predefined_dataset(dataset_config['filename'])
+                dataset_key, df = load_predefined_dataset(dataset_config['filename'])
                 dataset_name = dataset_config['filename']
                 # Update class for the clicked button
                 btn_idx_in_layout = [i for i, ds in enumerate(SAMPLE_DATASETS) if ds['id'] == clicked_index_str][0]
                 outputs['sample_btn_classes'][btn_idx_in_layout] = 'option-card active'
-        elif trigger_id == 'app-state-store' and stored_data and 'dataset_name' in stored_data:
-            dataset_name = stored_data['dataset_name']
-            
-            # Find which predefined dataset it corresponds to, if any
-            dataset_config = next((ds for ds in SAMPLE_DATASETS if ds['filename'] == dataset_name), None)
-            if dataset_config:
-                df = load_predefined_dataset(dataset_config['filename'])
-            else:
-                # Handle custom data case: ask user to re-upload
-                outputs['plot_component'] = html.Div([
-                    html.P("To apply rule changes to your custom data, please re-upload your file.", className="warning-text")
-                ])
-                outputs['empty_state_style'] = {'display': 'none'}
-                outputs['dataset_selector_style'] = {'display': 'none'}
+        elif isinstance(ctx.triggered_id, dict) and ctx.triggered_id['type'] == 'overview-tag-btn':
+            # (not from trigger_id: tags often contain dots, e.g. FIC-101.PV)
+            # Rendering the overview adds the buttons without a click
+            if not ctx.triggered[0]['value'] or not batch:
+                raise PreventUpdate
+            tag = ctx.triggered_id['index']
+            dataset_key, df = load_batch_series(batch['batch_key'], tag)
+            dataset_name = f"{os.path.splitext(batch['dataset_name'])[0]}_{tag}.csv"
+            outputs['upload_class'] += ' active'
+            outputs['batch'] = no_update
+            if df is None:
+                outputs['load_message'] = html.Div(html.P(
+                    "Your upload is no longer available, please upload it again.", className="warning-text"))
                 return list(outputs.values())
 
         # 3. If no data was loaded, return the defaults
         if df is None:
-            if trigger_id in ('upload-data', 'upload-data-menu'): # Handle upload error
-                outputs['plot_component'] = html.Div(
-                    html.P("We couldn't read that file. Please upload a .csv file "
-                           "with a single column of numeric values (at least 2 data points).",
+            if trigger_id == 'upload-handle': # Handle upload error
+                outputs['load_message'] = html.Div(
+                    html.P("We couldn't read that file. Please upload a CSV, Parquet, Arrow or NDJSON "
+                           "file whose first column holds numeric values (at least 2 data points).",
                            className="warning-text"))
             return list(outputs.values())
 
-        # 4. Process data and generate outputs
-        df = df.with_row_index()
-        stats = calculate_control_stats(df)
-        defaults = get_slider_defaults((stats['min'], stats['max']))
-        settings = app_state.get('settings', {}) if app_state else {}
-        period_comparison_enabled = settings.get('period_comparison_enabled', False)
-        process_change_point = settings.get('process_change', 0)
+        # 4. Show the data-loaded UI; the downstream stages take it from here
+        stats = get_stats(dataset_key)
+        time_indexed = 'timestamp' in df.columns
+        outputs['stored_data'] = {'dataset_name': dataset_name, 'dataset_key': dataset_key,
+                                  'time_indexed': time_indexed}
+        outputs['empty_state_style'] = {'display': 'none'}
+        outputs['dataset_selector_style'] = {'display': 'none'}
+        outputs['download_container_style'] = {'display': 'block', 'marginBottom': '10px'}
+        outputs['settings_toolbar'] = create_settings_toolbar((stats['min'], stats['max']), time_indexed)
+        outputs['settings_toolbar_style'] = {'display': 'block'}
 
-        df_for_stats = df
-        if period_comparison_enabled and process_change_point > 0:
-            df_for_stats = df.filter(pl.col("index") < process_change_point)
+        return list(outputs.values())
 
-        stats = calculate_control_stats(df_for_stats)
-        defaults = get_slider_defaults((stats['min'], stats['max']))
-        
-        lsl_value = settings.get('lsl', defaults['lsl'])
-        usl_value = settings.get('usl', defaults['usl'])
-        capability = calculate_capability(stats['mean'], stats['std_dev'], usl_value, lsl_value)
-        df_with_rules = add_control_rules(df, stats, active_rules)
-        df_with_mr = add_moving_range(df_with_rules)
-        
-        process_change_value = process_change_point if process_change_point > 0 else None
-        fig = create_control_chart(df_with_mr, stats, capability or {}, active_rules, settings, usl_value, lsl_value, process_change_value)
+    def ensure_dataset(stored_data):
+        """Return the dataset key from `stored-data` if the dataset is still
+        cached, reloading predefined datasets if needed; None otherwise."""
+        dataset_key = stored_data.get('dataset_key')
+        if get_cached_dataset(dataset_key) is not None:
+            return dataset_key
+        # Not cached (evicted, or loaded by a worker that doesn't share the
+        # cache). Predefined datasets can simply be loaded again
+        dataset_config = next((ds for ds in SAMPLE_DATASETS if ds['filename'] == stored_data.get('dataset_name')), None)
+        if dataset_config:
+            dataset_key, _ = load_predefined_dataset(dataset_config['filename'])
+            return dataset_key
+        return None
+
+    @app.callback(
+        Output('stats-store', 'data'),
+        [Input('stored-data', 'data'),
+         Input('app-state-store', 'data')],
+        [State('stats-store', 'data')]
+    )
+    @instrumented
+    def update_stats_stage(stored_data, app_state, current):
+        """Stats stage: recompute only when the dataset or baseline changes"""
+        if not stored_data or 'dataset_key' not in stored_data:
+            return no_update if current is None else None
+        settings = (app_state or {}).get('settings', {})
+        # Frozen limits only apply to the chart they were computed for
+        limits = settings.get('limits')
+        chart = limits['chart'] if limits else chart_from_settings(settings)
+        # Time-indexed data is charted per period unit, unless 'Observations' is selected
+        every = resample_interval(settings) if stored_data.get('time_indexed') else None
+
+        def charted_key(dataset_key):
+            return resampled_key(dataset_key, every) if every else dataset_key
+
+        handle = stats_handle(charted_key(stored_data['dataset_key']), baseline_end_from_settings(settings), chart)
+        if current and current.get('key') == handle['key'] and not current.get('missing'):
+            return no_update
+
+        dataset_key = ensure_dataset(stored_data)
+        if dataset_key is None:
+            return {'missing': True}
+        dataset_key = charted_key(dataset_key)
+        handle = stats_handle(dataset_key, handle['baseline_end'], chart)
+        if limits:
+            store_limits(limits)
+        get_stats(dataset_key, handle['baseline_end'], chart)
+        return handle
 
-        # 5. Update the 'outputs' dictionary with the new components
-        outputs['stats_panel'] = make_stats_panel(stats, capability)
-        outputs['plot_component'] = dcc.Graph(figure=fig,
+    @heavy_callback(
+        app,
+        Output('processed-data-store', 'data'),
+        [Input('stats-store', 'data'),
+         Input('app-state-store', 'data')],
+        [State('processed-data-store', 'data')],
+        progress=Output('processing-status', 'children'),
+        running=[(Output('processing-status', 'className'), 'processing-status', 'hidden')],
+        cancel=[Input('upload-started', 'value')]
+    )
+    @instrumented
+    def update_rules_stage(set_progress, stats_store, app_state, current):
+        """Rules stage: recompute only when the stats or active rules change"""
+        if not stats_store:
+            return no_update if current is None else None
+        if stats_store.get('missing'):
+            return {'missing': True}
+        active_rules = get_active_rules(app_state)
+        dataset_key, baseline_end = stats_store['dataset_key'], stats_store['baseline_end']
+        chart = stats_store.get('chart')
+        set_progress("Evaluating the Nelson rules…")
+        df_with_rules = get_rules(dataset_key, baseline_end, active_rules, chart)
+        if df_with_rules is None:
+            return {'missing': True}
+        handle = rules_handle(dataset_key, baseline_end, active_rules, df_with_rules.height, chart)
+        if current == handle:
+            return no_update
+        return handle
+
+    @app.callback(
+        Output('capability-store', 'data'),
+        [Input('stats-store', 'data'),
+         Input('app-state-store', 'data')],
+        [State('capability-store', 'data')]
+    )
+    @instrumented
+    def update_capability_stage(stats_store, app_state, current):
+        """Capability stage: recompute only when the stats or spec limits change"""
+        if not stats_store or stats_store.get('missing'):
+            return no_update if current is None else None
+        dataset_key, baseline_end = stats_store['dataset_key'], stats_store['baseline_end']
+        chart = stats_store.get('chart')
+        stats = get_stats(dataset_key, baseline_end, chart)
+        if stats is None:
+            return None
+        settings = (app_state or {}).get('settings', {})
+        usl_value, lsl_value = spec_limits(stats, settings)
+        handle = capability_handle(dataset_key, baseline_end, usl_value, lsl_value,
+                                   get_capability(dataset_key, baseline_end, usl_value, lsl_value, chart),
+                                   chart)
+        if current == handle:
+            return no_update
+        return handle
+
+    @app.callback(
+        Output('chart-settings-store', 'data'),
+        [Input('app-state-store', 'data')],
+        [State('chart-settings-store', 'data')]
+    )
+    @instrumented
+    def update_chart_settings(app_state, current):
+        """Extract the settings that only affect how the chart is drawn"""
+        settings = (app_state or {}).get('settings', {})
+        process_change_point = settings.get('process_change', 0) or 0
+        chart_settings = {
+            'period_type': settings.get('period_type', 'Observation'),
+            'y_axis_label': settings.get('y_axis_label', 'Individual Values'),
+            'process_change': process_change_point if process_change_point > 0 else None,
+            'full_resolution': settings.get('full_resolution', False),
+        }
+        if current == chart_settings:
+            return no_update
+        return chart_settings
+
+    @heavy_callback(
+        app,
+        [Output('plot-container', 'children'),
+         Output('control-chart', 'figure', allow_duplicate=True)],
+        [Input('processed-data-store', 'data'),
+         Input('capability-store', 'data'),
+         Input('chart-settings-store', 'data')],
+        [State('live-store', 'data')],
+        prevent_initial_call=True,
+        progress=Output('chart-status', 'children'),
+        running=[(Output('chart-status', 'className'), 'processing-status', 'hidden')],
+        cancel=[Input('upload-started', 'value')]
+    )
+    @instrumented
+    def update_figure(set_progress, processed_data, capability, chart_settings, live_store):
+        """Figure stage"""
+        if processed_data and processed_data.get('missing'):
+            # Handle custom data case: ask user to re-upload
+            return html.Div([
+                html.P("To apply rule changes to your custom data, please re-upload your file.", className="warning-text")
+            ]), no_update
+        if not processed_data or not capability:
+            return html.Div(style={'display': 'none'}), no_update
+        if live_store and live_store.get('figure') == figure_key(processed_data, capability, chart_settings or {}):
+            # Live mode already brought the chart to this state
+            return no_update, no_update
+        if ctx.triggered_prop_ids.keys() == {'capability-store.data'}:
+            # Only the spec limits moved: the chart on screen is for the
+            # same data and settings, so just move the USL/LSL lines
+            patched = Patch()
+            patch_spec_limits(patched, capability['usl'], capability['lsl'])
+            return no_update, patched
+
+        set_progress(f"Drawing the control chart ({processed_data['rows']:,} points)…")
+        fig = get_figure(processed_data, capability, chart_settings or {})
+        if fig is None:
+            return html.Div(style={'display': 'none'}), no_update
+        return dcc.Graph(id='control-chart', figure=fig,
             config={
                     "displayModeBar": "hover",
                     "modeBarButtonsToRemove": ["zoom2d","pan2d","select2d","lasso2d",
@@ -212,24 +418,61 @@ def register_data_processing_callbacks(app):
                         "filename": "process_control_chart",
                         "scale": 3    # 3x resolution
                     }
-                })
-        outputs['stored_data'] = {'dataset_name': dataset_name}
-        outputs['processed_data'] = df_with_rules.to_dicts()
-        outputs['empty_state_style'] = {'display': 'none'}
-        outputs['dataset_selector_style'] = {'display': 'none'}
-        outputs['download_container_style'] = {'display': 'block', 'marginBottom': '10px'}
-        if trigger_id == 'app-state-store':
-            # The toolbar is already on screen and triggered this update;
-            # re-rendering it would reset the control the user is interacting with
-            outputs['settings_toolbar'] = no_update
-            outputs['settings_toolbar_style'] = no_update
-        else:
-            outputs['settings_toolbar'] = create_settings_toolbar((stats['min'], stats['max']))
-            outputs['settings_toolbar_style'] = {'display': 'block'}
-        
-        # Create the data table and assign to data_info
-        # Extract data and columns
-        table_data = df_with_rules.drop("index").to_dicts()
+                }), no_update
+
+    @app.callback(
+        Output('stats-panel-container', 'children'),
+        [Input('stats-store', 'data'),
+         Input('capability-store', 'data')]
+    )
+    @instrumented
+    def update_stats_panel(stats_store, capability):
+        """Stats panel, refreshed when the stats or capability change"""
+        if not stats_store or stats_store.get('missing') or not capability:
+            return html.Div(style={'display': 'none'})
+        if ctx.triggered_prop_ids.keys() == {'capability-store.data'}:
+            # Only the spec limits moved: update_capability_values updates Cp/Cpk
+            return no_update
+        stats = get_stats(stats_store['dataset_key'], stats_store['baseline_end'], stats_store.get('chart'))
+        if stats is None:
+            return html.Div(style={'display': 'none'})
+        return make_stats_panel(stats, capability['capability'])
+
+    @app.callback(
+        [Output('stats-cp', 'children'),
+         Output('stats-cpk', 'children')],
+        [Input('capability-store', 'data')],
+        prevent_initial_call=True
+    )
+    @instrumented
+    def update_capability_values(capability):
+        """Cp/Cpk of the stats panel, for changes of the spec limits alone"""
+        if not capability:
+            return no_update, no_update
+        return capability_values(capability['capability'])
+
+    @app.callback(
+        Output('output-data-upload', 'children'),
+        [Input('processed-data-store', 'data')],
+        [State('stored-data', 'data'),
+         State('live-store', 'data')]
+    )
+    @instrumented
+    def update_table(processed_data, stored_data, live_store):
+        """Data table, refreshed only when the rule results change"""
+        if live_store and processed_data and live_store.get('rules_key') == processed_data.get('key'):
+            # Rows appended in live mode: keep the table (and its paging,
+            # sorting and filters); update_table_page refreshes the rows and
+            # update_row_count their number
+            return no_update
+        df_with_rules = load_processed_data(processed_data)
+        if df_with_rules is None:
+            return None
+        dataset_name = (stored_data or {}).get('dataset_name')
+        active_rules = handle_active_rules(processed_data)
+
+        # Create the data table. Rows are served a page at a time by
+        # update_table_page, so none are sent here
         table_columns = [
             {"name": i, "id": i} for i in df_with_rules.drop("index").columns
             if not i.startswith('rule_') or active_rules.get(int(i.split('_')[1]), True)
@@ -263,15 +506,32 @@ def register_data_processing_callbacks(app):
             for col in active_rule_cols
         ]
         
-        outputs['data_info'] = html.Div([
+        return html.Div([
             html.Div([
                 html.Img(src='/assets/csv_icon.svg', className='data-source-icon'),
                 html.H5(f'Data source: {dataset_name}')
             ], className='data-source-header'),
-            html.H6(f'Number of observations: {df_with_rules.shape[0]}'),
+            html.H6(f'Number of observations: {df_with_rules.shape[0]}', id='table-row-count'),
+            dcc.Checklist(
+                options=[{'label': 'Show only rule violations', 'value': 'only_violations'}],
+                value=[],
+                id='checklist-only-violations',
+                className='table-filter-checklist',
+                persistence=True,
+                persistence_type='memory'
+            ),
             dash_table.DataTable(
-                data=table_data,
+                id='data-table',
+                data=[],
                 columns=table_columns,
+                page_action='custom',
+                page_current=0,
+                page_size=TABLE_PAGE_SIZE,
+                sort_action='custom',
+                sort_mode='single',
+                sort_by=[],
+                filter_action='custom',
+                filter_query='',
                 style_table=style_table,
                 cell_selectable=False,
                 style_cell_conditional=style_cell_conditional,
@@ -282,5 +542,47 @@ def register_data_processing_callbacks(app):
             )
         ], className='data-info-container')
 
-        # 6. The single return point
-        return list(outputs.values())
+    @app.callback(
+        Output('table-row-count', 'children'),
+        [Input('processed-data-store', 'data')],
+        prevent_initial_call=True
+    )
+    @instrumented
+    def update_row_count(processed_data):
+        """Number of observations above the table"""
+        if not processed_data or 'rows' not in processed_data:
+            return no_update
+        return f"Number of observations: {processed_data['rows']}"
+
+    @app.callback(
+        [Output('data-table', 'data'),
+         Output('data-table', 'page_count'),
+         Output('data-table', 'page_current')],
+        [Input('data-table', 'page_current'),
+         Input('data-table', 'page_size'),
+         Input('data-table', 'sort_by'),
+         Input('data-table', 'filter_query'),
+         Input('checklist-only-violations', 'value'),
+         Input('processed-data-store', 'data')]
+    )
+    @instrumented
+    def update_table_page(page_current, page_size, sort_by, filter_query, only_violations, processed_data):
+        """Serve the visible page of the data table, sorted and filtered server-side"""
+        df_with_rules = load_processed_data(processed_data)
+        if df_with_rules is None:
+            return [], 1, 0
+        active_rules = handle_active_rules(processed_data)
+        # Sorting or filtering starts over from the first page; new data
+        # (e.g. in live mode) keeps the current one
+        paging = ctx.triggered_id == 'data-table' and 'page_current' in ctx.triggered[0]['prop_id']
+        if not paging and ctx.triggered_id != 'processed-data-store':
+            page_current = 0
+
+        violation_cols = None
+        if 'only_violations' in (only_violations or []):
+            violation_cols = [c for c in df_with_rules.columns
+                              if c.startswith('rule_') and active_rules.get(int(c.split('_')[1]), True)]
+        page_size = page_size or TABLE_PAGE_SIZE
+        rows, total_rows, page_current = get_table_page(df_with_rules.drop("index"), page_current, page_size,
+                                                        sort_by, filter_query, violation_cols)
+        return rows, max(math.ceil(total_rows / page_size), 1), page_current
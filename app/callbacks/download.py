@@ -1,6 +1,8 @@
 import io
-import polars as pl
 from dash import callback, Output, Input, State
+from utils.data_processor import rule_flag_labels
+from utils.pipeline import load_processed_data
+from utils.instrumentation import instrumented
 
 def register_download_callback(app):
     @app.callback(
@@ -10,13 +12,16 @@ def register_download_callback(app):
         State('stored-data', 'data'),
         prevent_initial_call=True,
     )
+    @instrumented
     def download_csv(n_clicks, processed_data, stored_data):
         """Download the dataset with rules as a CSV file"""
         if n_clicks is None or processed_data is None:
             return None
         
-        # Convert the stored data back to a polars DataFrame
-        df = pl.DataFrame(processed_data)
+        # The store only holds a handle; the DataFrame itself is server-side
+        df = load_processed_data(processed_data)
+        if df is None:
+            return None
         
         # Generate filename based on the original dataset name
         dataset_name = (stored_data or {}).get('dataset_name') or 'dataset'
@@ -26,7 +31,7 @@ def register_download_callback(app):
         
         # Use StringIO to capture the CSV output
         csv_buffer = io.StringIO()
-        df.write_csv(csv_buffer)
+        rule_flag_labels(df).write_csv(csv_buffer)
         csv_string = csv_buffer.getvalue()
         
         # Return CSV data directly
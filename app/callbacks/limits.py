@@ -0,0 +1,100 @@
+"""
+**`callbacks/limits.py`**
+
+**Purpose:** Phase I / Phase II control limits. Freezing keeps the limits of
+the current chart (computed over its baseline period, or all points) in
+`app-state-store['settings']['limits']`; from then on every dataset loaded
+is judged against them instead of its own limits (see
+`pipeline.frozen_baseline`), until they are released. Frozen limits can be
+saved as a JSON file and loaded again later (`utils/limits.py`).
+
+**Callback Signatures:**
+1. **Input:** `btn-freeze-limits.n_clicks`, `btn-release-limits.n_clicks`, `upload-limits.contents`
+   **State:** `app-state-store.data`, `stats-store.data`, `stored-data.data`
+   **Output:** `app-state-store.data`, `limits-status.children` / `className`
+2. **Input:** `app-state-store.data`
+   **Output:** `limits-status` and the enabled state of the buttons
+3. **Input:** `btn-save-limits.n_clicks`
+   **Output:** `download-limits.data`
+"""
+
+import base64
+
+from dash import Input, Output, State, ctx, no_update
+from dash.exceptions import PreventUpdate
+
+from utils.instrumentation import instrumented
+from utils.limits import dumps_limits, freeze_limits, limits_label, loads_limits
+from utils.pipeline import frozen_limits_id, get_stats
+
+
+def register_limits_callbacks(app):
+    @app.callback(
+        [Output('app-state-store', 'data', allow_duplicate=True),
+         Output('limits-status', 'children', allow_duplicate=True),
+         Output('limits-status', 'className', allow_duplicate=True)],
+        [Input('btn-freeze-limits', 'n_clicks'),
+         Input('btn-release-limits', 'n_clicks'),
+         Input('upload-limits', 'contents')],
+        [State('app-state-store', 'data'),
+         State('stats-store', 'data'),
+         State('stored-data', 'data')],
+        prevent_initial_call=True
+    )
+    @instrumented
+    def update_limits(freeze_clicks, release_clicks, upload_contents, app_state, stats_store, stored_data):
+        """Freeze, release or load the control limits"""
+        if not ctx.triggered or not ctx.triggered[0]['value']:
+            raise PreventUpdate
+        app_state = app_state or {}
+        settings = app_state.setdefault('settings', {})
+
+        if ctx.triggered_id == 'btn-release-limits':
+            settings.pop('limits', None)
+        elif ctx.triggered_id == 'upload-limits':
+            try:
+                settings['limits'] = loads_limits(base64.b64decode(upload_contents.split(',', 1)[1]))
+            except (ValueError, IndexError) as e:
+                return no_update, str(e), 'limits-status warning-text'
+        else:
+            if not stats_store or stats_store.get('missing') or frozen_limits_id(stats_store['baseline_end']):
+                raise PreventUpdate
+            stats = get_stats(stats_store['dataset_key'], stats_store['baseline_end'], stats_store.get('chart'))
+            if stats is None:
+                raise PreventUpdate
+            source = {'dataset_name': (stored_data or {}).get('dataset_name'),
+                      'dataset_key': stats_store['dataset_key'],
+                      'baseline_end': stats_store['baseline_end']}
+            settings['limits'] = freeze_limits(stats, stats_store.get('chart'), source)
+        # The status is shown by show_limits
+        return app_state, no_update, no_update
+
+    @app.callback(
+        [Output('limits-status', 'children'),
+         Output('limits-status', 'className'),
+         Output('btn-freeze-limits', 'disabled'),
+         Output('btn-release-limits', 'disabled'),
+         Output('btn-save-limits', 'disabled')],
+        [Input('app-state-store', 'data')]
+    )
+    @instrumented
+    def show_limits(app_state):
+        """Show the frozen limits, if any, and which actions apply"""
+        limits = (app_state or {}).get('settings', {}).get('limits')
+        if not limits:
+            return "computed from the data", 'limits-status', False, True, True
+        return f"frozen: {limits_label(limits)}", 'limits-status frozen', True, False, False
+
+    @app.callback(
+        Output('download-limits', 'data'),
+        Input('btn-save-limits', 'n_clicks'),
+        State('app-state-store', 'data'),
+        prevent_initial_call=True
+    )
+    @instrumented
+    def save_limits(n_clicks, app_state):
+        """Download the frozen limits as a JSON file"""
+        limits = (app_state or {}).get('settings', {}).get('limits')
+        if not n_clicks or not limits:
+            return None
+        return dict(content=dumps_limits(limits), filename='control_limits.json', type='application/json')
@@ -0,0 +1,107 @@
+"""
+**`callbacks/live.py`**
+
+**Purpose:** Live mode (individuals chart of raw observations only). While the toolbar's "Live" box is checked, polls for
+observations appended to the current dataset (see `utils/live.py`) and adds
+them to the chart with a `dash.Patch` instead of rebuilding the figure: the
+new points, moving ranges and violation markers are appended to the traces,
+and the limit lines are only moved when the limits changed.
+
+`stored-data` then switches to the new dataset version, so the stats panel,
+table and downloads follow through the usual stage callbacks; `live-store`
+records which figure the patched chart now corresponds to, so
+`update_figure` doesn't rebuild it.
+
+**Callback Signatures:**
+1. **Input:** `checklist-live.value`
+   **Output:** `live-interval.disabled`
+2. **Input:** `live-interval.n_intervals`
+   **State:** `stored-data`, `processed-data-store`, `capability-store`, `chart-settings-store`, `app-state-store`, `live-store`
+   **Output:** `control-chart.figure` (Patch), `stored-data.data`, `live-store.data`
+"""
+
+from dash import Input, Output, State, Patch, no_update
+
+from utils.chart_creator import (WEBGL_THRESHOLD, CONTROL_LINE_SPECS, MR_LINE_SPECS, rule_violation_markers,
+                                 extend_control_chart, patch_control_limits, patch_spec_limits)
+from utils.data_processor import add_moving_range
+from utils.instrumentation import instrumented
+from utils.live import latest_version, poll_source_file
+from utils.pipeline import (get_stats, get_rules, extend_rules, get_capability, spec_limits, figure_key,
+                            rules_handle, capability_handle, handle_active_rules, is_resampled)
+
+_LIMIT_KEYS = [key for key, _, _ in CONTROL_LINE_SPECS] + [key for key, _, _ in MR_LINE_SPECS]
+
+
+def register_live_callbacks(app):
+    @app.callback(
+        Output('live-interval', 'disabled'),
+        Input('checklist-live', 'value')
+    )
+    @instrumented
+    def toggle_live(value):
+        return 'live' not in (value or [])
+
+    @app.callback(
+        [Output('control-chart', 'figure', allow_duplicate=True),
+         Output('stored-data', 'data', allow_duplicate=True),
+         Output('live-store', 'data')],
+        [Input('live-interval', 'n_intervals')],
+        [State('stored-data', 'data'),
+         State('processed-data-store', 'data'),
+         State('capability-store', 'data'),
+         State('chart-settings-store', 'data'),
+         State('app-state-store', 'data'),
+         State('live-store', 'data')],
+        prevent_initial_call=True
+    )
+    @instrumented
+    def extend_live_chart(_, stored_data, processed_data, capability, chart_settings, app_state, live_store):
+        """Append new observations to the chart"""
+        if not stored_data or not processed_data or processed_data.get('missing') or not capability:
+            return no_update, no_update, no_update
+        if processed_data.get('chart') or is_resampled(processed_data['dataset_key']):
+            # Only the individuals chart of raw observations is extended point by point
+            return no_update, no_update, no_update
+        chart_settings = chart_settings or {}
+        settings = (app_state or {}).get('settings', {})
+        # Extend from what the chart currently shows
+        dataset_key, baseline_end = processed_data['dataset_key'], processed_data['baseline_end']
+        active_rules = handle_active_rules(processed_data)
+
+        new_key = poll_source_file(latest_version(dataset_key), active_rules, baseline_end)
+        if new_key == dataset_key:
+            return no_update, no_update, no_update
+        rules = extend_rules(dataset_key, new_key, baseline_end, active_rules)
+        stats, new_stats = get_stats(dataset_key, baseline_end), get_stats(new_key, baseline_end)
+        if rules is None or stats is None or new_stats is None:
+            return no_update, no_update, no_update
+
+        # Trace layout of the chart as it is now
+        if live_store and live_store.get('figure') == figure_key(processed_data, capability, chart_settings):
+            has_violations_trace, large = live_store['violations_trace'], live_store['large']
+        else:
+            old_rules = get_rules(dataset_key, baseline_end, active_rules)
+            has_violations_trace = rule_violation_markers(old_rules, active_rules).height > 0
+            large = processed_data['rows'] > WEBGL_THRESHOLD
+
+        patched = Patch()
+        # One row before the new ones for the first moving range
+        new_rows = add_moving_range(rules.slice(processed_data['rows'] - 1)).slice(1)
+        has_violations_trace = extend_control_chart(patched, new_rows, active_rules, has_violations_trace, large)
+        if any(stats[key] != new_stats[key] for key in _LIMIT_KEYS):
+            patch_control_limits(patched, new_stats, chart_settings.get('process_change'))
+        usl_value, lsl_value = spec_limits(new_stats, settings)
+        if (usl_value, lsl_value) != (capability['usl'], capability['lsl']):
+            patch_spec_limits(patched, usl_value, lsl_value)
+
+        new_processed = rules_handle(new_key, baseline_end, active_rules, rules.height)
+        new_capability = capability_handle(new_key, baseline_end, usl_value, lsl_value,
+                                           get_capability(new_key, baseline_end, usl_value, lsl_value))
+        live_store = {
+            'figure': figure_key(new_processed, new_capability, chart_settings),
+            'rules_key': new_processed['key'],
+            'violations_trace': has_violations_trace,
+            'large': large,
+        }
+        return patched, {**stored_data, 'dataset_key': new_key}, live_store
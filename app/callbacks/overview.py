@@ -0,0 +1,44 @@
+"""
+**`callbacks/overview.py`**
+
+**Purpose:** The overview of a multi-series upload (several numeric columns, or `tag` and `value`
+columns): every tag is evaluated at once with `utils.pipeline.get_batch_summary()` and listed by
+number of rule violations. Clicking a tag loads it as a regular dataset (see `load_dataset` in
+`callbacks/data_processing.py`), so the chart, stats panel and table work as for any upload.
+
+**Callback Signatures:**
+1. **Input:** `batch-store.data`, `app-state-store.data` (active rules)
+   **State:** `overview-store.data`
+   **Output:** `overview-container.children`, `overview-store.data`
+"""
+
+from dash import Input, Output, State, no_update
+
+from callbacks.rule_checkbox import get_active_rules
+from components.overview import create_overview
+from utils.instrumentation import instrumented
+from utils.pipeline import get_batch_summary, rules_signature
+
+
+def register_overview_callbacks(app):
+    @app.callback(
+        [Output('overview-container', 'children'),
+         Output('overview-store', 'data')],
+        [Input('batch-store', 'data'),
+         Input('app-state-store', 'data')],
+        [State('overview-store', 'data')]
+    )
+    @instrumented
+    def update_overview(batch, app_state, current):
+        """Overview table, refreshed only when the batch or the active rules change"""
+        if not batch:
+            return (None, None) if current else (no_update, no_update)
+        active_rules = get_active_rules(app_state)
+        handle = {'batch_key': batch['batch_key'], 'rules': rules_signature(active_rules)}
+        if handle == current:
+            return no_update, no_update
+
+        summary = get_batch_summary(batch['batch_key'], active_rules)
+        if summary is None:
+            return None, None
+        return create_overview(summary, batch['dataset_name'], active_rules), handle
@@ -10,7 +10,7 @@ and its corresponding input field.
 - It updates the slider's range and marks based on the length of the uploaded data.
 
 **Callback Signatures:**
-1. **Input:** `checklist-period-comparison.value`, `data-store.data`
+1. **Input:** `checklist-period-comparison.value`, `processed-data-store.data` (handle with the row count)
    **Output:** `input-process-change.disabled`, `input-process-change-input.disabled`, `input-process-change.max`, `input-process-change-input.max`, `input-process-change.marks`
 2. **Input:** `input-process-change.value`
    **Output:** `input-process-change-input.value`
@@ -20,6 +20,8 @@ and its corresponding input field.
 
 from dash import Input, Output, State
 
+from utils.instrumentation import instrumented
+
 def register_period_comparison_callbacks(app):
     @app.callback(
         Output('input-process-change', 'disabled'),
@@ -28,13 +30,14 @@ def register_period_comparison_callbacks(app):
         Output('input-process-change', 'min'),
         Output('input-process-change', 'max'),
         Input('checklist-period-comparison', 'value'),
-        State('processed-data-store', 'data'),
-        State('app-state-store', 'data')
+        State('processed-data-store', 'data')
         )
+    @instrumented
     def toggle_slider_enabled_state(checklist_value, data):
       slider_min = 0
       enabled = bool(checklist_value) and 'period_comparison' in checklist_value
-      if not enabled or not data:
+      # A 'missing' handle (dataset evicted or on another worker) has no rows
+      if not enabled or not data or data.get('missing') or 'rows' not in data:
         disabled = True
         tooltip = {"placement": "top", "always_visible": False}
         value = 0
@@ -42,7 +45,8 @@ def register_period_comparison_callbacks(app):
       else:
         disabled = False
         tooltip = {"placement": "top", "always_visible": True}
-        slider_max = len(data)
+        # The processed-data-store handle carries the row count
+        slider_max = data['rows']
         # Default to the midpoint, clamped to the dataset size
         value = min(50, slider_max // 2)
       return disabled, tooltip, value, slider_min, slider_max
\ No newline at end of file
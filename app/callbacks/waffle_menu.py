@@ -1,17 +1,20 @@
 from dash import Input, Output, State, ALL, ctx
 
+from utils.instrumentation import instrumented
+
 def register_waffle_menu_callbacks(app):
     @app.callback(
         Output('waffle-menu', 'className'),
         [
             Input('waffle-menu-button', 'n_clicks'),
-            Input('upload-data-menu', 'contents'),
+            Input('upload-handle', 'value'),
             Input({'type': 'sample-data-menu-btn', 'index': ALL}, 'n_clicks')
         ],
         [State('waffle-menu', 'className')],
         prevent_initial_call=True
     )
-    def toggle_waffle_menu(menu_clicks, upload_contents, sample_clicks, current_class):
+    @instrumented
+    def toggle_waffle_menu(menu_clicks, upload_handle, sample_clicks, current_class):
         """
         Toggles the visibility of the waffle menu.
         It opens on button click and closes if an item is selected.
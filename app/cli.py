@@ -0,0 +1,153 @@
+"""
+Command line tools for HuronSPC. Run from the repo root:
+
+    python -m app.cli build-sidecars [directory]
+    python -m app.cli evaluate <directory> [-o report.parquet] [--rules-dir DIR]
+
+`build-sidecars` parses every dataset file in `directory` (the predefined
+datasets' DATA_DIR by default) into an Arrow IPC sidecar, so the app
+memory-maps them instead of parsing them on first use.
+
+`evaluate` runs the Nelson rules over every dataset file in `directory`,
+in parallel, and writes one Parquet report with the stats, capability and
+violation counts of each file (see utils/report.py); with `--rules-dir`,
+also each file's rows with their rule flags as `rules_<name>.csv`.
+"""
+
+import argparse
+import os
+import sys
+
+# Same import setup as app.py: the app's modules import each other as
+# top-level packages (utils, callbacks, ...), ahead of any installed ones.
+# The repo root goes before the app directory, so `app` still names this
+# package and not app/app.py when the worker processes of `evaluate`
+# import `app.cli`
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _APP_DIR)
+sys.path.insert(0, os.path.dirname(_APP_DIR))
+
+from utils.data_loader import DATA_DIR, DATASET_EXTENSIONS, SIDECAR_SUFFIX, build_sidecar
+
+
+def dataset_files(directory, exclude=()):
+    """Paths of the dataset files in `directory` (not its sidecars), sorted."""
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if (name.endswith(SIDECAR_SUFFIX) or not os.path.isfile(path)
+                or not name.lower().endswith(DATASET_EXTENSIONS)
+                or os.path.abspath(path) in exclude):
+            continue
+        paths.append(path)
+    return paths
+
+
+def build_sidecars(args):
+    built = 0
+    for path in dataset_files(args.directory):
+        name = os.path.basename(path)
+        try:
+            sidecar = build_sidecar(path)
+        except Exception as e:
+            print(f"{name}: failed ({e})", file=sys.stderr)
+            continue
+        if sidecar is None:
+            print(f"{name}: skipped, no numeric data in the first column", file=sys.stderr)
+            continue
+        print(f"{name} -> {os.path.basename(sidecar)}")
+        built += 1
+    print(f"Built {built} sidecar(s) in {args.directory}")
+    return 0
+
+
+def _rule_numbers(text):
+    try:
+        rules = [int(i) for i in text.split(',') if i.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected rule numbers like 1,2,5") from None
+    if not all(1 <= i <= 8 for i in rules):
+        raise argparse.ArgumentTypeError("rules are numbered 1 to 8")
+    return rules
+
+
+def evaluate(args):
+    # Imported here so build-sidecars doesn't load the rule engine
+    from utils.limits import load_limits
+    from utils.report import build_report, evaluate_files
+
+    output = os.path.abspath(args.output)
+    # Don't evaluate our own outputs when they are written into the directory
+    files = dataset_files(args.directory, exclude={output})
+    if args.rules_dir:
+        rules_dir = os.path.abspath(args.rules_dir)
+        files = [p for p in files if os.path.dirname(os.path.abspath(p)) != rules_dir
+                 or not os.path.basename(p).startswith('rules_')]
+        os.makedirs(rules_dir, exist_ok=True)
+    if not files:
+        print(f"No dataset files in {args.directory}", file=sys.stderr)
+        return 1
+
+    limits = None
+    if args.limits:
+        try:
+            limits = load_limits(args.limits)
+        except (OSError, ValueError) as e:
+            print(f"{args.limits}: {e}", file=sys.stderr)
+            return 1
+        if limits['chart']:
+            print(f"{args.limits}: only individuals chart limits can be used", file=sys.stderr)
+            return 1
+    active_rules = None if args.rules is None else {i: i in args.rules for i in range(1, 9)}
+
+    rows = []
+    for row in evaluate_files(files, workers=args.workers, active_rules=active_rules, usl=args.usl,
+                              lsl=args.lsl, baseline_end=args.baseline_end, limits=limits,
+                              rules_dir=args.rules_dir):
+        rows.append(row)
+        if row['error']:
+            print(f"{os.path.basename(row['file'])}: {row['error']}", file=sys.stderr)
+        elif args.verbose:
+            print(f"{os.path.basename(row['file'])}: {row['rows']:,} rows, {row['violations']:,} violations")
+    report = build_report(rows)
+    report.write_parquet(output)
+    failed = report['error'].is_not_null().sum()
+    print(f"Evaluated {len(rows) - failed} file(s), {failed} failed -> {args.output}")
+    return 0 if not failed else 2
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.cli', description="HuronSPC command line tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sidecars = commands.add_parser(
+        'build-sidecars', help="Pre-build memory-mappable Arrow IPC sidecars for dataset files")
+    sidecars.add_argument('directory', nargs='?', default=DATA_DIR,
+                          help="Directory of dataset files (default: the predefined datasets)")
+    sidecars.set_defaults(func=build_sidecars)
+
+    evaluator = commands.add_parser(
+        'evaluate', help="Evaluate the Nelson rules over every dataset file in a directory")
+    evaluator.add_argument('directory', help="Directory of CSV, Parquet, Arrow or NDJSON files")
+    evaluator.add_argument('-o', '--output', default='spc_report.parquet',
+                           help="Parquet report to write (default: spc_report.parquet)")
+    evaluator.add_argument('--rules-dir', help="Also write each file's rows with their rule flags "
+                                               "as rules_<name>.csv in this directory")
+    evaluator.add_argument('--rules', type=_rule_numbers, help="Active rules, e.g. 1,2,5 (default: all)")
+    evaluator.add_argument('--usl', type=float, help="Upper specification limit, for Cp/Cpk")
+    evaluator.add_argument('--lsl', type=float, help="Lower specification limit, for Cp/Cpk")
+    evaluator.add_argument('--baseline-end', type=int, default=0,
+                           help="Compute each file's limits over its first N points (default: all)")
+    evaluator.add_argument('--limits', help="Judge every file against these frozen limits "
+                                            "(a JSON file saved from the app) instead of its own")
+    evaluator.add_argument('-j', '--workers', type=int,
+                           help="Worker processes (default: one per core)")
+    evaluator.add_argument('-v', '--verbose', action='store_true', help="Print a line per file")
+    evaluator.set_defaults(func=evaluate)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
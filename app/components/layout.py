@@ -1,6 +1,11 @@
+import os
+
 from dash import html, dcc
 from components.rule_boxes import create_rule_boxes
 
+# How often live mode polls for new observations
+LIVE_INTERVAL_MS = int(os.environ.get('LIVE_INTERVAL_MS', 2000))
+
 # Define sample datasets in a data structure for easy extension
 SAMPLE_DATASETS = [
     {
@@ -112,7 +117,8 @@ def create_layout():
                     ], className='card-content'),
                     className='upload-component'
                 ),
-                html.P("Upload a .csv file with a single column of numerical data.", className='option-card-description')
+                html.P("Upload a CSV, Parquet, Arrow or NDJSON file with numerical data in the first column, "
+                       "or one column per tag for an overview of many series.", className='option-card-description')
             ], id='upload-card', className='option-card upload-card'),
             
             # Dynamically generated sample data cards
@@ -161,9 +167,20 @@ def create_layout():
             create_rule_boxes()
         ], id='rule-boxes-container', className='rule-boxes-container'),
         
+        # Messages from loading a dataset (e.g. unreadable uploads)
+        html.Div(id='load-message'),
+
+        # Overview of a multi-series upload (see callbacks/overview.py)
+        html.Div(id='overview-container'),
+
+        # Progress of the background jobs evaluating the rules and drawing
+        # the chart (see utils/background.py); shown while they run
+        html.Div(id='processing-status', className='hidden'),
+
         # Plot container
         html.Div(id="stats-panel-container"),
         
+        html.Div(id='chart-status', className='hidden'),
         html.Div(id='plot-container'),
 
         # Display the uploaded data info
@@ -184,11 +201,33 @@ def create_layout():
                 className='action-button'
             ),
             dcc.Download(id='download-dataframe-csv'),
+            dcc.Download(id='download-limits'),
         ], id='download-container', className='download-container'),
         
         # Store for the current data
         dcc.Store(id='stored-data'),
         dcc.Store(id='processed-data-store'),
+
+        # Multi-series upload: its batch key, and a handle for the overview shown
+        dcc.Store(id='batch-store'),
+        dcc.Store(id='overview-store'),
+
+        # Receives the dataset handle of finished uploads from
+        # assets/upload_client.js (files are sent to /upload, not through Dash)
+        html.Div(dcc.Input(id='upload-handle', type='text', value=''), style={'display': 'none'}),
+        # Set by assets/upload_client.js when an upload starts; cancels the
+        # background jobs still working on the previous dataset
+        html.Div(dcc.Input(id='upload-started', type='text', value=''), style={'display': 'none'}),
+
+        # Handles for the intermediate pipeline stages (see utils/pipeline.py)
+        dcc.Store(id='stats-store'),
+        dcc.Store(id='capability-store'),
+        dcc.Store(id='chart-settings-store'),
+
+        # Live mode (see callbacks/live.py): polls for new observations while
+        # enabled; live-store describes the figure as patched by the last poll
+        dcc.Interval(id='live-interval', interval=LIVE_INTERVAL_MS, disabled=True),
+        dcc.Store(id='live-store'),
         
         # Store for UI state and settings
         dcc.Store(
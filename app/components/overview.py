@@ -0,0 +1,53 @@
+"""
+**`components/overview.py`**
+
+**Exports:** `create_overview(summary, dataset_name, active_rules)`
+**Purpose:** Returns the *overview* of a multi-series upload: one row per tag, ranked by number of rule
+violations, with its points, limits and violations per active rule.
+
+**Major Elements:**
+
+  * `html.Button` (id: `{'type': 'overview-tag-btn', 'index': <tag>}`): the tag's name; clicking it
+    opens the tag in the single-series chart below
+* **Pattern:** UI factory; the rows come from `utils.pipeline.get_batch_summary()`.
+
+"""
+
+from dash import html
+
+
+def _fmt(value):
+    return '' if value is None else f"{value:.4g}"
+
+
+def create_overview(summary, dataset_name, active_rules):
+    """Create the table of tags of a multi-series upload, most violations first"""
+    rule_cols = [f'rule_{i}' for i in range(1, 9) if active_rules.get(i, True)]
+    header = html.Tr(
+        [html.Th("Tag"), html.Th("Points"), html.Th("Violations")]
+        + [html.Th(f"Rule {c.split('_')[1]}") for c in rule_cols]
+        + [html.Th("Mean"), html.Th("LCL"), html.Th("UCL")]
+    )
+    rows = [
+        html.Tr(
+            [html.Td(html.Button(row['tag'], id={'type': 'overview-tag-btn', 'index': row['tag']},
+                                 className='overview-tag-link')),
+             html.Td(f"{row['count']:,}"),
+             html.Td(f"{row['violations']:,}", className='overview-violations')]
+            + [html.Td(f"{row[c]:,}" if row[c] else '') for c in rule_cols]
+            + [html.Td(_fmt(row['mean'])), html.Td(_fmt(row['lcl'])), html.Td(_fmt(row['ucl']))],
+            className='overview-row-broken' if row['violations'] else 'overview-row'
+        )
+        for row in summary.iter_rows(named=True)
+    ]
+
+    return html.Div([
+        html.Div([
+            html.Img(src='/assets/csv_icon.svg', className='data-source-icon'),
+            html.H5(f'Data source: {dataset_name}')
+        ], className='data-source-header'),
+        html.H6(f'{summary.height} series, ranked by number of rule violations. '
+                f'Click a tag to open its control chart.'),
+        html.Div(html.Table([html.Thead(header), html.Tbody(rows)], className='overview-table'),
+                 className='overview-table-container'),
+    ], className='data-info-container')
@@ -1,14 +1,20 @@
 """ 
 **`components/settings_toolbar.py`**
 
-**Exports:** `create_settings_toolbar(range_data=None)`
+**Exports:** `create_settings_toolbar(range_data=None, time_indexed=False)`
 **Purpose:** Returns a Div containing the *settings toolbar* UI (controls for upper/lower limits, period type, process change, y-label).
 
 **Major Elements:**
 
   * `dcc.RangeSlider` (id: `sl-range-slider`): sets USL/LSL, min/max optionally set via `range_data`
-  * `dcc.Dropdown` (id: `dropdown-period-type`)
+  * `dcc.Dropdown` (id: `dropdown-chart-type`): individuals (X-mR), X̄-R or X̄-S chart
+  * `dcc.Input` (id: `input-subgroup-size`): subgroup size of the X̄-R and X̄-S charts
+  * `dcc.Checklist` (id: `checklist-full-resolution`): plot every point of large series
+  * `dcc.Checklist` (id: `checklist-live`): follow new observations as they arrive (live mode)
+  * `dcc.Dropdown` (id: `dropdown-period-type`): x-axis unit; resamples time-indexed data
   * `dcc.Input` (id: `input-process-change`)
+  * Control limits (Phase II): `btn-freeze-limits`, `btn-release-limits`, `upload-limits` (load a
+    saved limits file), `btn-save-limits`, and `limits-status` (see `callbacks/limits.py`)
   * `dcc.Input` (id: `input-y-axis-label`)
 * **Pattern:** UI factory; most are hardcoded, but `range_data` is dynamic.
 
@@ -16,10 +22,16 @@
 
 from dash import html, dcc
 from utils.slider_defaults import get_slider_defaults, make_marks
+from utils.data_processor import MAX_SUBGROUP_SIZE
+from utils.pipeline import DEFAULT_SUBGROUP_SIZE
 
 
-def create_settings_toolbar(range_data = None):
-    """Create a horizontal toolbar for settings with labels to the left of their controls"""
+def create_settings_toolbar(range_data = None, time_indexed = False):
+    """Create a horizontal toolbar for settings with labels to the left of their controls
+
+    For time-indexed data the period unit resamples the series (see
+    `pipeline.get_resampled`), so it starts at "Observations": the data as uploaded.
+    """
     
     # Assume you always have range_data = (min, max)
     defaults = get_slider_defaults(range_data)
@@ -43,6 +55,42 @@ def create_settings_toolbar(range_data = None):
                 persistence_type='memory')
         ], className="toolbar-item"),
         
+        # Chart type: individuals, or subgroup means with their ranges or standard deviations
+        html.Div([
+            html.Label("Chart:", className="toolbar-label"),
+            dcc.Dropdown(
+            id="dropdown-chart-type",
+            options=[
+                {"label": "Individuals (X-mR)", "value": "individuals"},
+                {"label": "X̄-R (subgroup means and ranges)", "value": "xbar_r"},
+                {"label": "X̄-S (subgroup means and std devs)", "value": "xbar_s"}
+            ],
+            value="individuals",
+            clearable=False,
+            className="toolbar-dropdown",
+            persistence=True,
+            persistence_type='memory'
+            )
+        ], className="toolbar-item"),
+
+        # Subgroup size of the X̄-R and X̄-S charts (consecutive points per subgroup)
+        html.Div([
+            html.Label("Subgroup Size:", className="toolbar-label"),
+            dcc.Input(
+                id="input-subgroup-size",
+                type="number",
+                min=2,
+                max=MAX_SUBGROUP_SIZE,
+                step=1,
+                value=DEFAULT_SUBGROUP_SIZE,
+                debounce=True,
+                className="toolbar-textbox-input",
+                style={"width": "60px"},
+                persistence=True,
+                persistence_type='memory'
+            )
+        ], className="toolbar-item", title="Consecutive points averaged into each point of the X̄-R and X̄-S charts"),
+
         # Checkbox - enable Period Comparison
         html.Div([
             dcc.Checklist(
@@ -58,6 +106,36 @@ def create_settings_toolbar(range_data = None):
         ], className="toolbar-item"),
         
         
+        # Checkbox - draw every point of large series instead of a downsampled line
+        html.Div([
+            dcc.Checklist(
+                options=[
+                    {'label': 'Full Resolution',
+                     'value': 'full_resolution'}
+                ],
+                id='checklist-full-resolution',
+                className='toolbar-item',
+                persistence=True,
+                persistence_type='memory'
+            )
+        ], className="toolbar-item", title="Large datasets are downsampled for display; "
+                                           "check to plot every point (rule violations are always shown)"),
+
+        # Checkbox - live mode: poll for appended observations and extend the chart
+        html.Div([
+            dcc.Checklist(
+                options=[
+                    {'label': 'Live',
+                     'value': 'live'}
+                ],
+                id='checklist-live',
+                className='toolbar-item',
+                persistence=True,
+                persistence_type='memory'
+            )
+        ], className="toolbar-item", title="Add new observations to the chart as they arrive "
+                                           "(appended through the API or to the dataset's file)"),
+
         # Process change point
         html.Div([
             html.Label("Process Change at:", className="toolbar-label"),
@@ -71,6 +149,21 @@ def create_settings_toolbar(range_data = None):
             )
         ], className="toolbar-item"),
         
+        # Control limits: freeze the current ones (Phase II), or load/save a limits file
+        html.Div([
+            html.Label("Control Limits:", className="toolbar-label"),
+            html.Button("Freeze", id="btn-freeze-limits", className="toolbar-button",
+                        title="Keep the current limits and judge any data loaded next against them"),
+            html.Button("Release", id="btn-release-limits", className="toolbar-button", disabled=True,
+                        title="Go back to limits computed from the data"),
+            dcc.Upload(html.Button("Load…", className="toolbar-button"), id="upload-limits",
+                       accept=".json", multiple=False,
+                       className="toolbar-upload"),
+            html.Button("Save", id="btn-save-limits", className="toolbar-button", disabled=True,
+                        title="Download the frozen limits as a JSON file"),
+            html.Span(id="limits-status", className="limits-status"),
+        ], className="toolbar-item"),
+
         # Periods naming dropdown
         html.Div([
             html.Label("Period Units:", className="toolbar-label"),
@@ -83,7 +176,7 @@ def create_settings_toolbar(range_data = None):
                 {"label": "Months", "value": "Months"},
                 {"label": "Observations", "value": "Observations"}
             ],
-            value="Days",
+            value="Observations" if time_indexed else "Days",
             clearable=False,
             className="toolbar-dropdown",
             searchable=True,
@@ -0,0 +1,122 @@
+"""
+Dash background callbacks for the CPU-heavy stages.
+
+Evaluating the rules and building the chart of a large series can take
+seconds. Registered with `heavy_callback()`, those callbacks run as Dash
+background callbacks: each call is a job in its own process, so the web
+worker stays free to answer other requests, the browser shows the job's
+progress, and a job is terminated when the user uploads another file (or
+the inputs change again) before it finishes.
+
+Selected with the `BACKGROUND_CALLBACKS` environment variable:
+
+  * `auto` (default): on when `diskcache`, `multiprocess` and `psutil` are
+    installed and the cache backend is shared (`CACHE_BACKEND` is `arrow`
+    or `redis`). Jobs store their results in the cache like any other
+    stage, so with the per-process `memory` backend they would be lost.
+  * `on`: always (fails if the packages are missing).
+  * `off`: plain callbacks, run by the web worker.
+
+Job results and progress go through a diskcache directory
+(`BACKGROUND_CACHE_DIR`), and the browser polls for them every
+`BACKGROUND_INTERVAL_MS` milliseconds. Jobs are started from a fork server
+rather than forked from the web worker, whose Polars thread pool doesn't
+survive a fork.
+"""
+
+import logging
+import os
+import tempfile
+
+from dash import DiskcacheManager
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_INTERVAL_MS = int(os.environ.get('BACKGROUND_INTERVAL_MS', 250))
+# Modules imported once by the fork server, so jobs start without importing
+# them ('__main__' keeps each job from importing the main script again)
+_PRELOAD = ['__main__', 'polars', 'plotly.graph_objects', 'utils.pipeline']
+
+_manager = None
+
+
+def background_enabled():
+    """Whether heavy callbacks run as background jobs (see module docstring)."""
+    mode = os.environ.get('BACKGROUND_CALLBACKS', 'auto').lower()
+    if mode == 'off':
+        return False
+    if mode == 'auto':
+        if os.environ.get('CACHE_BACKEND', 'memory').lower() == 'memory':
+            return False
+        try:
+            import diskcache, multiprocess, psutil  # noqa: F401
+        except ImportError:
+            return False
+    elif mode != 'on':
+        raise ValueError(f"Unknown BACKGROUND_CALLBACKS '{mode}' (expected auto, on or off)")
+    return True
+
+
+class ForkserverDiskcacheManager(DiskcacheManager):
+    """DiskcacheManager that starts its jobs from a fork server instead of
+    forking the web worker."""
+
+    def __init__(self, cache):
+        super().__init__(cache)
+        import multiprocess
+        self._context = multiprocess.get_context('forkserver')
+        self._context.set_forkserver_preload(_PRELOAD)
+
+    def call_job_fn(self, key, job_fn, args, context):
+        proc = self._context.Process(target=job_fn, args=(key, self._make_progress_key(key), args, context))
+        proc.start()
+        return proc.pid
+
+
+def get_background_manager():
+    """Return the process-wide background callback manager, or None if
+    background callbacks are disabled."""
+    global _manager
+    if _manager is None and background_enabled():
+        try:
+            import diskcache
+        except ImportError as e:
+            raise RuntimeError(
+                "BACKGROUND_CALLBACKS=on requires the 'diskcache', 'multiprocess' and 'psutil' "
+                "packages (pip install dash[diskcache])") from e
+        directory = os.environ.get(
+            'BACKGROUND_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'huronspc-background'))
+        _manager = ForkserverDiskcacheManager(diskcache.Cache(directory))
+        logger.info("background callbacks enabled (results in %s)", directory)
+    return _manager
+
+
+def _no_progress(*_):
+    pass
+
+
+def heavy_callback(app, *dependencies, progress=None, running=None, cancel=None, **kwargs):
+    """Register a CPU-heavy callback: like `app.callback(*dependencies, **kwargs)`,
+    but run as a background job when background callbacks are enabled.
+
+    As with Dash background callbacks, the decorated function gets a
+    `set_progress` function as its first argument when `progress` is given;
+    it does nothing when the callback runs in the foreground. `running` and
+    `cancel` only apply to background jobs.
+    """
+    manager = get_background_manager()
+
+    def decorator(func):
+        if manager is not None:
+            return app.callback(*dependencies, background=True, manager=manager,
+                                progress=progress, running=running, cancel=cancel,
+                                interval=BACKGROUND_INTERVAL_MS, **kwargs)(func)
+        if progress is None:
+            return app.callback(*dependencies, **kwargs)(func)
+
+        def foreground(*args):
+            return func(_no_progress, *args)
+        foreground.__name__ = func.__name__
+        return app.callback(*dependencies, **kwargs)(foreground)
+
+    return decorator
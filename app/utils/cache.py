@@ -0,0 +1,395 @@
+"""
+Server-side cache for parsed datasets and computed statistics.
+
+gunicorn runs several worker processes, so anything kept in a plain dict is
+only visible to the worker that created it. The backend is picked with the
+`CACHE_BACKEND` environment variable:
+
+  * `memory` (default): process-local LRU cache, fastest, not shared.
+  * `arrow`: a directory of Arrow IPC files (`CACHE_DIR`), shared by all
+    workers on the same machine. Frames are memory-mapped on read.
+  * `redis`: any server speaking the Redis protocol (`CACHE_REDIS_URL`),
+    shared across machines. Needs the `redis` package.
+
+All backends store two kinds of values: DataFrames (`get_frame`/`set_frame`)
+and small JSON-serializable objects like stats dicts (`get_json`/`set_json`),
+and count hits and misses.
+
+A frame that extends a cached one with a few rows (an append, see
+`pipeline.append_observations`) is stored with `set_extended_frame`: the
+`arrow` and `redis` backends then only write the new rows and a link to the
+earlier frame, and `get_frame` joins the chain back together. A full copy is
+written once a chain is `CACHE_MAX_APPEND_CHAIN` links long, so reads stay
+bounded.
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import polars as pl
+
+DEFAULT_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 256 * 1024 * 1024))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 256))
+MAX_APPEND_CHAIN = int(os.environ.get('CACHE_MAX_APPEND_CHAIN', 32))
+# Suffixes of the keys of an extended frame's new rows and of its link
+_APPENDED_ROWS = '#rows'
+_APPEND_LINK = '#link'
+
+
+def content_hasher():
+    """Return an incremental hasher producing the same keys as
+    `content_key()`: feed it chunks with .update(), then call .hexdigest()."""
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_key(raw: bytes) -> str:
+    """Return a stable key for a dataset based on its raw file content.
+
+    The same file uploaded twice (or a sample dataset clicked again) maps to
+    the same key, so it's parsed only once.
+    """
+    hasher = content_hasher()
+    hasher.update(raw)
+    return hasher.hexdigest()
+
+
+def _frame_to_bytes(df: pl.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    df.write_ipc(buffer)
+    return buffer.getvalue()
+
+
+class CacheBackend:
+    """Base class for cache backends.
+
+    Subclasses store raw values through `_get`, `_set` and `_delete`; this
+    class takes care of (de)serialization and of the hit/miss counters.
+    """
+
+    name = 'base'
+    # Whether values come back from `_get` serialized (Arrow IPC/JSON bytes)
+    # rather than as the Python objects that were stored
+    serialized = True
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _to_frame(value):
+        if value is None or isinstance(value, pl.DataFrame):
+            return value
+        return pl.read_ipc(io.BytesIO(value))
+
+    def get_frame(self, key):
+        """Return the DataFrame stored under `key`, or None on a miss."""
+        if key is None:
+            return None
+        df = self._to_frame(self._get('frame:' + key))
+        if df is None and self.serialized:
+            df = self._get_extended_frame(key)
+        self._count(df is not None)
+        return df
+
+    def set_frame(self, key, df: pl.DataFrame):
+        self._set('frame:' + key, df)
+
+    def set_extended_frame(self, key, df: pl.DataFrame, base_key, base_rows):
+        """Store `df`, the frame under `base_key` (of `base_rows` rows) with
+        rows appended, under `key`.
+
+        Serialized backends only write the appended rows and a link to
+        `base_key`, unless the chain of links is already MAX_APPEND_CHAIN
+        long. `key` is then a miss once `base_key` is evicted.
+        """
+        if not self.serialized:
+            self.set_frame(key, df)
+            return
+        link = self._get('json:' + base_key + _APPEND_LINK)
+        length = json.loads(link)['length'] + 1 if link is not None else 1
+        if length > MAX_APPEND_CHAIN:
+            self.set_frame(key, df)
+            return
+        self._set('frame:' + key + _APPENDED_ROWS, df.slice(base_rows))
+        self._set('json:' + key + _APPEND_LINK, {'base': base_key, 'length': length})
+
+    def _get_extended_frame(self, key):
+        """Join a frame stored by `set_extended_frame` back together, or
+        return None if a part of it is missing."""
+        parts = []
+        for _ in range(MAX_APPEND_CHAIN + 1):
+            link = self._get('json:' + key + _APPEND_LINK)
+            rows = self._to_frame(self._get('frame:' + key + _APPENDED_ROWS))
+            if link is None or rows is None:
+                return None
+            parts.append(rows)
+            key = json.loads(link)['base']
+            base = self._to_frame(self._get('frame:' + key))
+            if base is not None:
+                parts.append(base)
+                return pl.concat(parts[::-1], rechunk=False)
+        return None
+
+    def get_json(self, key):
+        """Return the JSON object stored under `key`, or None on a miss."""
+        if key is None:
+            return None
+        value = self._get('json:' + key)
+        self._count(value is not None)
+        if value is None or not self.serialized:
+            return value
+        return json.loads(value)
+
+    def set_json(self, key, value):
+        self._set('json:' + key, value)
+
+    def delete(self, key):
+        self._delete('frame:' + key)
+        self._delete('json:' + key)
+        self._delete('frame:' + key + _APPENDED_ROWS)
+        self._delete('json:' + key + _APPEND_LINK)
+
+    def stats(self):
+        """Return the hit/miss counters, e.g. for logging or monitoring."""
+        with self._counter_lock:
+            return {'backend': self.name, 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        raise NotImplementedError
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Thread-safe LRU cache with an entry limit and a total size budget.
+
+    Values are kept as Python objects, so nothing is serialized. Entries are
+    evicted least-recently-used first whenever either limit is exceeded.
+    """
+
+    name = 'memory'
+    serialized = False
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, size in bytes)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(value):
+        if isinstance(value, pl.DataFrame):
+            return value.estimated_size()
+        return sys.getsizeof(json.dumps(value))
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _set(self, key, value):
+        size = self._size(value)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            # A dataset bigger than the whole budget is still cached on its
+            # own, otherwise it would have to be re-parsed on every change
+            self._entries[key] = (value, size)
+            self._total_bytes += size
+            while len(self._entries) > 1 and (
+                    len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def _delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+
+class ArrowDirectoryBackend(CacheBackend):
+    """Cache stored as files in a directory shared by all worker processes.
+
+    Frames are written as Arrow IPC files and memory-mapped when read, JSON
+    values as .json files. When the directory grows over `max_bytes`, the
+    least recently used files are removed.
+    """
+
+    name = 'arrow'
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        kind, name = key.split(':', 1)
+        extension = '.arrow' if kind == 'frame' else '.json'
+        return os.path.join(self.directory, name.replace(':', '_') + extension)
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            if path.endswith('.arrow'):
+                value = pl.read_ipc(path, memory_map=True)
+            else:
+                with open(path, 'rb') as f:
+                    value = f.read()
+            # Reads count as use for the eviction order
+            os.utime(path)
+            return value
+        except (FileNotFoundError, pl.exceptions.ComputeError):
+            return None
+
+    def _set(self, key, value):
+        path = self._path(key)
+        # Write to a temp file and rename, so other workers never see a
+        # partially written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(value, pl.DataFrame):
+                value.write_ipc(f)
+            else:
+                f.write(json.dumps(value).encode('utf-8'))
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _files(self):
+        # Only cache entries: other workers' '.tmp' files are still being written
+        return (glob.glob(os.path.join(self.directory, '*.arrow'))
+                + glob.glob(os.path.join(self.directory, '*.json')))
+
+    def _evict(self):
+        files = []
+        for path in self._files():
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files)[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for path in self._files():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class RedisBackend(CacheBackend):
+    """Cache stored in a Redis-compatible server, shared across machines.
+
+    Frames are stored as Arrow IPC bytes. Entries expire after `ttl` seconds
+    so abandoned uploads don't pile up.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url, ttl=24 * 3600, prefix='huronspc:'):
+        super().__init__()
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "CACHE_BACKEND=redis requires the 'redis' package (pip install redis)") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def _set(self, key, value):
+        if isinstance(value, pl.DataFrame):
+            data = _frame_to_bytes(value)
+        else:
+            data = json.dumps(value).encode('utf-8')
+        self.client.set(self.prefix + key, data, ex=self.ttl)
+
+    def _delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+def create_backend(kind=None):
+    """Create the cache backend selected by `kind` or the CACHE_BACKEND
+    environment variable."""
+    kind = (kind or os.environ.get('CACHE_BACKEND', 'memory')).lower()
+    if kind == 'memory':
+        return MemoryBackend()
+    if kind == 'arrow':
+        directory = os.environ.get(
+            'CACHE_DIR', os.path.join(tempfile.gettempdir(), 'huronspc-cache'))
+        return ArrowDirectoryBackend(directory)
+    if kind == 'redis':
+        url = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+        ttl = int(os.environ.get('CACHE_TTL', 24 * 3600))
+        return RedisBackend(url, ttl=ttl)
+    raise ValueError(f"Unknown CACHE_BACKEND '{kind}' (expected memory, arrow or redis)")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> CacheBackend:
+    """Return the process-wide cache backend, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_backend()
+    return _cache
@@ -1,9 +1,137 @@
+import math
+import os
+
 import polars as pl
 from plotly.graph_objects import Figure
 import plotly.graph_objects as go
 from dash import html
 from plotly.subplots import make_subplots
 
+# Above this many points the chart switches to WebGL traces and (unless the
+# user asks for full resolution) downsamples each trace to about
+# CHART_MAX_POINTS points
+WEBGL_THRESHOLD = int(os.environ.get('CHART_WEBGL_THRESHOLD', 20_000))
+MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', 5_000))
+
+# Rule descriptions for tooltips
+RULE_DESCRIPTIONS = {
+    'rule_1': "<b>Rule 1</b>: Point beyond 3 sigma",
+    'rule_2': "<b>Rule 2</b>: 9 points on same side of centerline",
+    'rule_3': "<b>Rule 3</b>: 6 points steadily increasing/decreasing",
+    'rule_4': "<b>Rule 4</b>: 14 points alternating up and down", 
+    'rule_5': "<b>Rule 5</b>: 2 of 3 points in Zone A or beyond",
+    'rule_6': "<b>Rule 6</b>: 4 of 5 points in Zone B or beyond",
+    'rule_7': "<b>Rule 7</b>: 15 points in Zone C",
+    'rule_8': "<b>Rule 8</b>: 8 points with none in Zone C"
+}
+
+
+# Limit lines of the X-chart (stats key, color, label; only one line of each
+# pair is labelled), zone labels and limit lines of the mR-chart, in the order
+# create_control_chart adds them
+CONTROL_LINE_SPECS = [
+    ("mean", "grey",   "Mean"), ("uwl",  "orange", "2σ"),
+    ("lwl",  "orange", None),   ("uzl",  "green",  "1σ"),
+    ("lzl",  "green",  None),   ("ucl",  "red",    "3σ"),
+    ("lcl",  "red",    None),
+]
+ZONE_SPECS = [
+    ("C", '1', 'uzl', "green"),
+    ("B", '2', 'uwl', "orange"),
+    ("A", '3', 'ucl', "red"),
+]
+MR_LINE_SPECS = [
+    ("mr_avg", "grey", "Mean"),
+    ("mr_ucl", "red", "Upper limit for differences between values"),
+]
+# Lower chart of subgroup charts (X̄-R, X̄-S), which plots the stats['dispersion'] column
+DISPERSION_LINE_SPECS = [
+    ("dispersion_avg", "grey", "Mean"),
+    ("dispersion_ucl", "red", "UCL"),
+    ("dispersion_lcl", "red", "LCL"),
+]
+# Subplot titles and lower y-axis title by chart type
+CHART_TITLES = {
+    None: ("X-Chart: Individual Values", "mR-Chart: Moving Range", "Moving Range"),
+    'xbar_r': ("X̄-Chart: Subgroup Means", "R-Chart: Subgroup Ranges", "Range"),
+    'xbar_s': ("X̄-Chart: Subgroup Means", "S-Chart: Subgroup Standard Deviations", "Standard Deviation"),
+}
+
+
+def rule_violation_markers(df: pl.DataFrame, active_rules: dict = None) -> pl.DataFrame:
+    """Build the rule-violation markers for the X-chart, one row per point
+    that breaks at least one active rule.
+
+    Everything is computed as Polars expressions; only the violating rows
+    are materialized.
+
+    Args:
+        df: DataFrame with 'index', 'value' and the Boolean 'rule_N' flag columns
+        active_rules: Dictionary with active rules {1: True/False, 2: True/False, ...}
+                      If None, all rules are active
+    Returns:
+        DataFrame with 'index', 'value', 'hover_text' and 'color' columns
+    """
+    if active_rules is None:
+        active_rules = {i: True for i in range(1, 9)}
+    rule_cols = [f'rule_{i}' for i in range(1, 9) if active_rules.get(i, True)]
+    if not rule_cols:
+        return pl.DataFrame(schema={'index': pl.UInt32, 'value': pl.Float64,
+                                    'hover_text': pl.Utf8, 'color': pl.Utf8})
+    max_rules = len(rule_cols)
+    num_broken = pl.sum_horizontal(rule_cols)
+
+    # Make red more intense (darker) as more rules are broken
+    intensity = 1 - (pl.col('num_broken') - 1) / max_rules * 0.7
+    return (
+        df.lazy()
+        .select('index', 'value', *rule_cols, num_broken.alias('num_broken'))
+        .filter(pl.col('num_broken') > 0)
+        .select(
+            'index',
+            'value',
+            pl.concat_str(
+                [pl.when(r).then(pl.lit(RULE_DESCRIPTIONS[r])) for r in rule_cols],
+                separator="<br>", ignore_nulls=True).alias('hover_text'),
+            pl.format("rgb({}, 0, 0)", (255 * intensity).cast(pl.Int64)).alias('color'),
+        )
+        .collect()
+    )
+
+
+def downsample_min_max(df: pl.DataFrame, column: str, max_points: int = MAX_POINTS,
+                       keep: pl.Expr = None) -> pl.DataFrame:
+    """Reduce `df` to about `max_points` rows for plotting, keeping the
+    shape of `column`.
+
+    Rows are split into equal buckets and the minimum and maximum of each
+    bucket are kept (so spikes are never lost), along with the first and last
+    rows and every row where `keep` is true (e.g. rule violations).
+
+    Args:
+        df: DataFrame sorted by 'index'
+        column: Column whose extremes are kept
+        max_points: Approximate number of rows to keep
+        keep: Optional boolean expression for rows that must always be kept
+    Returns:
+        The filtered DataFrame, or `df` itself if it's already small enough
+    """
+    if df.height <= max_points:
+        return df
+    bucket_size = math.ceil(df.height / max(max_points // 2, 1))
+    row = pl.int_range(pl.len())
+    bucket = row // bucket_size
+    position = pl.int_range(pl.len()).over(bucket)
+    mask = (
+        (position == pl.col(column).arg_min().over(bucket))
+        | (position == pl.col(column).arg_max().over(bucket))
+        | (row == 0) | (row == pl.len() - 1)
+    )
+    if keep is not None:
+        mask = mask | keep.fill_null(False)
+    return df.filter(mask)
+
+
 def create_control_chart(
     df: pl.DataFrame,
     stats: dict,
@@ -21,24 +149,25 @@ def create_control_chart(
         capability_stats: Dictionary with capability statistics (Cp, Cpk)
         active_rules: Dictionary with active rules {1: True/False, 2: True/False, ...}
                       If None, all rules are active
-        settings: Dictionary with chart settings (period_type, y_axis_label, etc.)
+        settings: Dictionary with chart settings (period_type, y_axis_label,
+                  full_resolution, etc.)
         usl_value: Upper Specification Limit value (optional, user-configured)
         lsl_value: Lower Specification Limit value (optional, user-configured)
         process_change_point: X-axis index for a vertical line indicating a process change.
+
+    Series longer than WEBGL_THRESHOLD are drawn with WebGL traces and, unless
+    settings['full_resolution'] is set, downsampled on the server. Rule
+    violations are always plotted.
+
+    With the stats of a subgroup chart (`calculate_subgroup_stats()`), `df`
+    holds one row per subgroup, and the lower chart plots the subgroup
+    ranges or standard deviations instead of the moving range.
     """
-    # Define rule descriptions for tooltips
-    rule_descriptions = {
-        'rule_1': "<b>Rule 1</b>: Point beyond 3 sigma",
-        'rule_2': "<b>Rule 2</b>: 9 points on same side of centerline",
-        'rule_3': "<b>Rule 3</b>: 6 points steadily increasing/decreasing",
-        'rule_4': "<b>Rule 4</b>: 14 points alternating up and down", 
-        'rule_5': "<b>Rule 5</b>: 2 of 3 points in Zone A or beyond",
-        'rule_6': "<b>Rule 6</b>: 4 of 5 points in Zone B or beyond",
-        'rule_7': "<b>Rule 7</b>: 15 points in Zone C",
-        'rule_8': "<b>Rule 8</b>: 8 points with none in Zone C"
-    }
-    
     settings = settings or {}
+    chart_type = stats.get('chart_type')
+    lower_column = stats['dispersion'] if chart_type else 'moving_range'
+    lower_lines = DISPERSION_LINE_SPECS if chart_type else MR_LINE_SPECS
+    upper_title, lower_title, lower_axis_title = CHART_TITLES[chart_type]
                 
     # If active_rules is None, assume all rules are active
     if active_rules is None:
@@ -54,20 +183,25 @@ def create_control_chart(
     
     # --- X-Chart (Top Subplot) ---
     
+    # Large series: WebGL traces, and downsampling unless the user wants every point
+    large = df.height > WEBGL_THRESHOLD
+    scatter = go.Scattergl if large else go.Scatter
+    line_mode = 'lines' if large else 'lines+markers'
+    downsample = large and not settings.get('full_resolution', False)
+    violations = rule_violation_markers(df, active_rules)
+
     # Add main data trace
+    df_values = df
+    if downsample:
+        df_values = downsample_min_max(df.select('index', 'value'), 'value',
+                                       keep=pl.col('index').is_in(violations['index']))
     fig.add_trace(
-        go.Scatter(x=df['index'], y=df['value'], mode='lines+markers', name='Value'),
+        scatter(x=df_values['index'], y=df_values['value'], mode=line_mode, name='Value'),
         row=1, col=1
     )
     
-    # Define and add control lines
-    control_line_specs = [
-        ("mean", "grey",   "Mean"), ("uwl",  "orange", "2σ"),
-        ("lwl",  "orange", None),   ("uzl",  "green",  "1σ"),
-        ("lzl",  "green",  None),   ("ucl",  "red",    "3σ"),
-        ("lcl",  "red",    None),
-    ]
-    for key, color, text in control_line_specs:
+    # Add control lines
+    for key, color, text in CONTROL_LINE_SPECS:
         fig.add_hline(y=stats[key], line_dash="dash", line_color=color,
                   annotation=dict(
                   font=dict(color=color, size=9.5),
@@ -98,62 +232,42 @@ def create_control_chart(
                       line_color="purple", row=2, col=1)
 
     # Add Zone annotations
-    zone_specs = [
-        ("C", '1', stats['uzl'], "green"),
-        ("B", '2', stats['uwl'], "orange"),
-        ("A", '3', stats['ucl'], "red"),
-    ]
-    for name, sd, y_val, color in zone_specs:
-        fig.add_annotation(x=df['index'].min() - 2, y=y_val, text=f"Zone {name}: up to {sd} σ",
+    for name, sd, key, color in ZONE_SPECS:
+        fig.add_annotation(x=df['index'].min() - 2, y=stats[key], text=f"Zone {name}: up to {sd} σ",
                            showarrow=False, xref="x1", yref="y1", yshift=-13,
                            font=dict(size=11, color=color), bgcolor="rgba(255, 255, 255, 0.88)",
                            bordercolor=color, borderwidth=0.5, borderpad=1)
 
     # Highlight points with rule violations
-    indices, values, hover_texts, marker_colors = [], [], [], []
-    rule_cols = [f'rule_{i}' for i in range(1, 9) if active_rules.get(i, True)]
-    max_rules = len(rule_cols) if rule_cols else 1
-
-    for row in df.iter_rows(named=True):
-        broken = [rule_descriptions[r] for r in rule_cols if row[r] == "Broken"]
-        if broken:
-            num_broken = len(broken)
-            indices.append(row['index'])
-            values.append(row['value'])
-            hover_texts.append("<br>".join(broken))
-            
-            # Make red more intense (darker) as more rules are broken
-            intensity = 1 - (num_broken - 1) / max_rules * 0.7
-            red_val = int(255 * intensity)
-            marker_colors.append(f'rgb({red_val}, 0, 0)')
-
-    if indices:
-        fig.add_trace(go.Scatter(
-            x=indices, y=values, mode='markers',
-            marker=dict(color=marker_colors, size=10, line=dict(color='black', width=1)),
-            text=hover_texts, hoverinfo='text', name='Rule Violations'
+    if violations.height:
+        fig.add_trace(scatter(
+            x=violations['index'], y=violations['value'], mode='markers',
+            marker=dict(color=violations['color'].to_list(), size=10, line=dict(color='black', width=1)),
+            text=violations['hover_text'].to_list(), hoverinfo='text', name='Rule Violations'
         ), row=1, col=1)
 
-    # --- mR-Chart (Bottom Subplot) ---
+    # --- mR-Chart, or R/S-Chart of subgroups (Bottom Subplot) ---
     
     # Add moving range trace
+    df_mr = df
+    if downsample:
+        df_mr = downsample_min_max(df.select('index', lower_column), lower_column)
     fig.add_trace(
-        go.Scatter(x=df['index'], y=df['moving_range'], mode='lines+markers', name='Moving Range'),
+        scatter(x=df_mr['index'], y=df_mr[lower_column], mode=line_mode, name=lower_axis_title),
         row=2, col=1
     )
     
-    fig.add_hline(y=stats['mr_avg'], line_dash="dash", line_color="grey",
-                  annotation=dict(font_color="grey", text=f"{stats['mr_avg']:.2f}: Mean"), row=2, col=1)
-    fig.add_hline(y=stats['mr_ucl'], line_dash="dash", line_color="red",
-                  annotation=dict(font_color="red", text=f"{stats['mr_ucl']:.2f}: Upper limit for differences between values"), row=2, col=1)
+    for key, color, text in lower_lines:
+        fig.add_hline(y=stats[key], line_dash="dash", line_color=color,
+                      annotation=dict(font_color=color, text=f"{stats[key]:.2f}: {text}"), row=2, col=1)
 
     # --- Titles and Layout ---
     
     # Add subplot titles
-    fig.add_annotation(text="<i>X-Chart: Individual Values</i>",
+    fig.add_annotation(text=f"<i>{upper_title}</i>",
                        xref="paper", yref="paper", x=1, y=1.0,
                        xanchor="right", yanchor="bottom", showarrow=False, font=dict(size=14))
-    fig.add_annotation(text="<i>mR-Chart: Moving Range</i>",
+    fig.add_annotation(text=f"<i>{lower_title}</i>",
                        xref="paper", yref="paper", x=1, y=0.28,
                        xanchor="right", yanchor="bottom", showarrow=False, font=dict(size=14))
 
@@ -165,36 +279,163 @@ def create_control_chart(
         xaxis_title=None,
         xaxis2_title=settings.get('period_type', 'Observation'),
         yaxis_title=settings.get('y_axis_label', 'Individual Values'),
-        yaxis2_title="Moving Range"
+        yaxis2_title=lower_axis_title
     )
         
     return fig
 
+def _layout_indices(spec_limits=True, process_change_point=None):
+    """Positions of the limit lines and labels in `layout.shapes` and
+    `layout.annotations` of a figure made by `create_control_chart()`.
+
+    Follows the order in which create_control_chart adds them. The process
+    change adds one shape: its mR-chart line is skipped by Plotly because
+    that subplot is still empty when it's added.
+    """
+    shapes, annotations = {}, {}
+    for key, _, text in CONTROL_LINE_SPECS:
+        shapes[key] = len(shapes)
+        if text:
+            annotations[key] = len(annotations)
+    if spec_limits:
+        shapes['lsl'], shapes['usl'] = len(shapes), len(shapes) + 1
+        annotations['lsl'], annotations['usl'] = len(annotations), len(annotations) + 1
+    offset = 1 if process_change_point is not None else 0
+    for _, _, key, _ in ZONE_SPECS:
+        annotations['zone_' + key] = len(annotations) + offset
+    for key, _, _ in MR_LINE_SPECS:
+        shapes[key] = len(shapes) + offset
+        annotations[key] = len(annotations) + offset
+    return shapes, annotations
+
+
+def patch_control_limits(patched, stats: dict, process_change_point=None):
+    """Move the control limit lines, their labels and the zone labels of a
+    figure made by `create_control_chart()` to new `stats`, in place.
+
+    Args:
+        patched: a `dash.Patch()` of the figure (or the figure dict itself)
+        stats: Dictionary with data-driven statistics
+        process_change_point: as passed to create_control_chart
+    """
+    shapes, annotations = _layout_indices(True, process_change_point)
+    for key, _, text in CONTROL_LINE_SPECS:
+        patched['layout']['shapes'][shapes[key]]['y0'] = stats[key]
+        patched['layout']['shapes'][shapes[key]]['y1'] = stats[key]
+        if text:
+            patched['layout']['annotations'][annotations[key]]['y'] = stats[key]
+            patched['layout']['annotations'][annotations[key]]['text'] = f"{text}: {round(stats[key],2)}"
+    for _, _, key, _ in ZONE_SPECS:
+        patched['layout']['annotations'][annotations['zone_' + key]]['y'] = stats[key]
+    for key, _, text in MR_LINE_SPECS:
+        patched['layout']['shapes'][shapes[key]]['y0'] = stats[key]
+        patched['layout']['shapes'][shapes[key]]['y1'] = stats[key]
+        patched['layout']['annotations'][annotations[key]]['y'] = stats[key]
+        patched['layout']['annotations'][annotations[key]]['text'] = f"{stats[key]:.2f}: {text}"
+
+
+def patch_spec_limits(patched, usl_value, lsl_value):
+    """Move the USL/LSL lines and labels of a figure made by
+    `create_control_chart()` (with specification limits), in place."""
+    shapes, annotations = _layout_indices(True)
+    for key, value in (('usl', usl_value), ('lsl', lsl_value)):
+        patched['layout']['shapes'][shapes[key]]['y0'] = value
+        patched['layout']['shapes'][shapes[key]]['y1'] = value
+        patched['layout']['annotations'][annotations[key]]['y'] = value
+
+
+def extend_control_chart(patched, new_rows: pl.DataFrame, active_rules: dict = None,
+                         has_violations_trace=False, large=False):
+    """Append new points to a figure made by `create_control_chart()`, in place.
+
+    Args:
+        patched: a `dash.Patch()` of the figure
+        new_rows: the new rows, with 'index', 'value', 'moving_range' and
+                  the 'rule_N' flag columns
+        active_rules: as for create_control_chart
+        has_violations_trace: whether the figure already has a 'Rule
+                              Violations' trace
+        large: whether the figure uses WebGL traces (more than
+               WEBGL_THRESHOLD points when it was built)
+    Returns:
+        bool: whether the figure has a 'Rule Violations' trace afterwards
+    """
+    # Traces: Value, Rule Violations (only if there are any), Moving Range
+    mr_trace = 2 if has_violations_trace else 1
+    index = new_rows['index'].to_list()
+    patched['data'][0]['x'].extend(index)
+    patched['data'][0]['y'].extend(new_rows['value'].to_list())
+    patched['data'][mr_trace]['x'].extend(index)
+    patched['data'][mr_trace]['y'].extend(new_rows['moving_range'].to_list())
+
+    violations = rule_violation_markers(new_rows, active_rules)
+    if not violations.height:
+        return has_violations_trace
+    if has_violations_trace:
+        patched['data'][1]['x'].extend(violations['index'].to_list())
+        patched['data'][1]['y'].extend(violations['value'].to_list())
+        patched['data'][1]['marker']['color'].extend(violations['color'].to_list())
+        patched['data'][1]['text'].extend(violations['hover_text'].to_list())
+    else:
+        scatter = go.Scattergl if large else go.Scatter
+        trace = scatter(
+            x=violations['index'].to_list(), y=violations['value'].to_list(), mode='markers',
+            marker=dict(color=violations['color'].to_list(), size=10, line=dict(color='black', width=1)),
+            text=violations['hover_text'].to_list(), hoverinfo='text', name='Rule Violations',
+            xaxis='x', yaxis='y')
+        patched['data'].insert(1, trace.to_plotly_json())
+    return True
+
+
+def _fmt(val, precision=3):
+    return f"{val:.{precision}f}" if val is not None else "N/A"
+
+
+# Ids of the stats panel's Cp/Cpk values, updated on their own when only the
+# spec limits change (see `capability_values`)
+CAPABILITY_VALUE_IDS = {'cp': 'stats-cp', 'cpk': 'stats-cpk'}
+
+
 def make_stats_panel(stats, capability_stats):
     # capability_stats is None when capability can't be computed (e.g. zero std dev)
     capability_stats = capability_stats or {}
 
-    def fmt(val, precision=3):
-        return f"{val:.{precision}f}" if val is not None else "N/A"
-
     items = [
-        ("Mean", fmt(stats.get('mean'))),
-        ("Std Dev", fmt(stats.get('std_dev'))),
-        ("UCL", fmt(stats.get('ucl'))),
-        ("LCL", fmt(stats.get('lcl'))),
-        ("Range", fmt(stats.get('range'))),
-        ("Min", fmt(stats.get('min'))),
-        ("Max", fmt(stats.get('max'))),
+        ("Mean", _fmt(stats.get('mean'))),
+        ("Std Dev", _fmt(stats.get('std_dev'))),
+        ("UCL", _fmt(stats.get('ucl'))),
+        ("LCL", _fmt(stats.get('lcl'))),
+        ("Range", _fmt(stats.get('range'))),
+        ("Min", _fmt(stats.get('min'))),
+        ("Max", _fmt(stats.get('max'))),
         ("Sample Count", stats.get('count', 'N/A')),
-        ("Cp", fmt(capability_stats.get('cp'))),
-        ("Cpk", fmt(capability_stats.get('cpk'))),
+    ]
+    rows = [
+        html.Div([
+            html.Span(k + ":", className="stat-key"),
+            html.Span(v, className="stat-value"),
+        ], className="stat-row") for k, v in items
+    ] + [
+        html.Div([
+            html.Span(label + ":", className="stat-key"),
+            html.Span(value, id=CAPABILITY_VALUE_IDS[key], className="stat-value"),
+        ], className="stat-row")
+        for (key, label), value in zip((('cp', "Cp"), ('cpk', "Cpk")), capability_values(capability_stats))
     ]
     return html.Div([
         html.Div("Process Statistics", className="stats-panel-title"),
-        html.Div([
-            html.Div([
-                html.Span(k + ":", className="stat-key"),
-                html.Span(v, className="stat-value"),
-            ], className="stat-row") for k, v in items
-        ], className="stats-panel-grid")
+        html.Div(rows, className="stats-panel-grid")
     ], className="stats-panel")
+
+
+def capability_values(capability_stats):
+    """The Cp and Cpk values shown by the stats panel (see
+    CAPABILITY_VALUE_IDS).
+
+    Args:
+        capability_stats: Dictionary with capability statistics, or None
+    Returns:
+        tuple: (Cp, Cpk) as displayed
+    """
+    capability_stats = capability_stats or {}
+    return _fmt(capability_stats.get('cp')), _fmt(capability_stats.get('cpk'))
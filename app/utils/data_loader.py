@@ -1,17 +1,50 @@
-import base64
+import binascii
 import io
 import os
+import tempfile
 import polars as pl
 
+from utils.cache import content_hasher, content_key, get_cache
+from utils.data_processor import to_long_format
+from utils.instrumentation import measure
+
 # Resolve the data directory relative to the repo root so loading works
 # regardless of the current working directory (python app/app.py, gunicorn, etc.)
 _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DATA_DIR = os.path.join(_REPO_ROOT, 'data', 'test')
 
+# Uploads larger than this (once decoded) are spooled to a temporary file and
+# scanned lazily instead of being decoded into memory
+SPOOL_TO_DISK_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', 64 * 1024 * 1024))
+
+# Base64 characters decoded at a time; a multiple of 4 so chunks decode independently
+_BASE64_CHUNK_CHARS = 4 * 1024 * 1024
+
+# Predefined datasets are parsed once into an Arrow IPC file next to the
+# source (e.g. in_control.csv.sidecar.arrow), which is memory-mapped on load
+SIDECAR_SUFFIX = '.sidecar.arrow'
+
+# Input formats, detected from the file's first bytes and, failing that,
+# its extension. Anything unrecognized is read as CSV.
+_EXTENSION_FORMATS = {
+    '.csv': 'csv',
+    '.txt': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'ipc',
+    '.feather': 'ipc',
+    '.ipc': 'ipc',
+    '.arrows': 'ipc_stream',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+DATASET_EXTENSIONS = tuple(_EXTENSION_FORMATS)
+
 
 def _prepare(df):
-    """Validate and normalize a raw DataFrame: keep the first column as a
-    numeric 'value' column, dropping rows that aren't numbers.
+    """Validate and normalize a raw DataFrame (see `_read_dataset`): the
+    first column becomes a numeric 'value' column, dropping rows that
+    aren't numbers.
 
     Returns None if the data is unusable (no numeric values or fewer than
     2 data points, which is the minimum to compute control statistics).
@@ -25,29 +58,335 @@ def _prepare(df):
     return df
 
 
+def _load_cached(key, read):
+    """Return (dataset_key, df) for a dataset's content key, calling `read()`
+    to parse it only if it isn't already in the dataset cache.
+
+    Returns (None, None) if the data is unusable.
+    """
+    cache = get_cache()
+    df = cache.get_frame(key)
+    if df is None:
+        with measure('parse'):
+            df = _prepare(read())
+        if df is None:
+            return None, None
+        cache.set_frame(key, df)
+    return key, df
+
+
+def detect_format(head, filename=None):
+    """Guess the format of a dataset from its first bytes.
+
+    Parquet and Arrow IPC files start with a magic number; the extension of
+    `filename` breaks the tie for the rest, and text starting with '{' is
+    taken as NDJSON.
+
+    Returns:
+        str: 'csv', 'parquet', 'ipc', 'ipc_stream' or 'ndjson'.
+    """
+    if head.startswith(b'PAR1'):
+        return 'parquet'
+    if head.startswith(b'ARROW1'):
+        return 'ipc'
+    if head.startswith(b'\xff\xff\xff\xff'):
+        return 'ipc_stream'
+    if filename:
+        fmt = _EXTENSION_FORMATS.get(os.path.splitext(filename)[1].lower())
+        if fmt is not None:
+            return fmt
+    if head.lstrip().startswith(b'{'):
+        return 'ndjson'
+    return 'csv'
+
+
+def _sniff_format(file_path, filename=None):
+    with open(file_path, 'rb') as f:
+        head = f.read(64)
+    return detect_format(head, filename or file_path)
+
+
+def _scan(source, fmt='csv'):
+    """LazyFrame over a whole file (a path or an in-memory buffer). Dates
+    and times in CSV files are parsed as such."""
+    if fmt == 'parquet':
+        return pl.scan_parquet(source)
+    if fmt == 'ipc':
+        return pl.scan_ipc(source)
+    if fmt == 'ndjson':
+        return pl.scan_ndjson(source)
+    if fmt == 'ipc_stream':
+        # The streaming IPC format can't be scanned, only read
+        return pl.read_ipc_stream(source).lazy()
+    return pl.scan_csv(source, try_parse_dates=True)
+
+
+def _dataset_columns(schema):
+    """The columns a dataset keeps from a file with this schema: the first
+    one, which holds the values; or, if the file has a date/time column,
+    the first other column as the values and the date/time column as
+    'timestamp' (see `pipeline.get_resampled`)."""
+    timestamp = next((name for name, dtype in schema.items() if dtype in (pl.Datetime, pl.Date)), None)
+    if timestamp is None:
+        return [pl.nth(0)]
+    value = next((name for name in schema if name != timestamp), None)
+    if value is None:
+        return []
+    column = pl.col(timestamp)
+    if schema[timestamp] == pl.Date:
+        column = column.cast(pl.Datetime)
+    return [pl.col(value), column.alias('timestamp')]
+
+
+def _read_dataset(source, fmt='csv'):
+    """Read only the columns a dataset keeps (see `_dataset_columns`) of a
+    file path or in-memory buffer, letting Polars stream them."""
+    lf = _scan(source, fmt)
+    return lf.select(_dataset_columns(lf.collect_schema())).collect()
+
+
+# path -> (mtime_ns, size, key), so unchanged predefined datasets aren't re-hashed.
+# Only files under DATA_DIR are kept: every upload has a new temporary path
+_file_keys = {}
+
+
+def _is_predefined(file_path):
+    return os.path.commonpath([os.path.abspath(file_path), DATA_DIR]) == DATA_DIR
+
+
+def _file_key(file_path):
+    st = os.stat(file_path)
+    known = _file_keys.get(file_path)
+    if known is not None and known[:2] == (st.st_mtime_ns, st.st_size):
+        return known[2]
+    hasher = content_hasher()
+    with open(file_path, 'rb') as f:
+        # Only hash up to the size we stat'ed, in case the file is growing
+        remaining = st.st_size
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    key = hasher.hexdigest()
+    if _is_predefined(file_path):
+        _file_keys[file_path] = (st.st_mtime_ns, st.st_size, key)
+    return key
+
+
+def sidecar_path(file_path):
+    return file_path + SIDECAR_SUFFIX
+
+
+def read_dataset_file(file_path):
+    """Parse a dataset file into its prepared columns, without caching it
+    (for batch jobs that read every file once, see utils/report.py).
+
+    Returns:
+        DataFrame, or None if the file holds no usable data.
+    """
+    return _prepare(_read_dataset(file_path, _sniff_format(file_path)))
+
+
+def build_sidecar(file_path):
+    """Parse a dataset file and write the prepared columns next to it as an
+    Arrow IPC file, which later loads are memory-mapped from.
+
+    Returns:
+        str: the sidecar path, or None if the file holds no usable data.
+    """
+    df = read_dataset_file(file_path)
+    if df is None:
+        return None
+    path = sidecar_path(file_path)
+    tmp_path = path + '.tmp'
+    df.write_ipc(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _remember_source(dataset_key, file_path):
+    """Record which CSV file a dataset was read from and up to which byte,
+    so live mode (utils/live.py) can pick up rows appended to it later."""
+    cache = get_cache()
+    if cache.get_json(f"source:{dataset_key}") is not None or _sniff_format(file_path) != 'csv':
+        return
+    cache.set_json(f"source:{dataset_key}", {'path': file_path, 'offset': _file_keys[file_path][1]})
+
+
+def _read_predefined(file_path):
+    """Read a predefined dataset through its sidecar, (re)building the
+    sidecar first if it's missing or older than the source file."""
+    sidecar = sidecar_path(file_path)
+    try:
+        fresh = os.path.getmtime(sidecar) >= os.path.getmtime(file_path)
+    except OSError:
+        fresh = False
+    if not fresh:
+        try:
+            if build_sidecar(file_path) is None:
+                return None
+        except OSError:
+            # Read-only data directory: parse the source every time instead
+            return _read_dataset(file_path, _sniff_format(file_path))
+    return pl.read_ipc(sidecar, memory_map=True)
+
+
+def _decode_base64(contents, start, sink, hasher):
+    """Decode the base64 payload of `contents` (from index `start`) into the
+    file-like `sink` chunk by chunk, hashing it on the way, so the decoded
+    file never exists as one extra `bytes`/`str` copy."""
+    for pos in range(start, len(contents), _BASE64_CHUNK_CHARS):
+        chunk = binascii.a2b_base64(contents[pos:pos + _BASE64_CHUNK_CHARS])
+        hasher.update(chunk)
+        sink.write(chunk)
+
+
 # Function to read predefined datasets
 def load_predefined_dataset(filename):
-    """Load a predefined dataset from the data/test directory"""
+    """Load a predefined dataset from the data/test directory
+
+    The file is parsed once into an Arrow IPC sidecar (see `build_sidecar`)
+    and memory-mapped from there on.
+
+    Returns:
+        tuple: (dataset_key, df), or (None, None) if it can't be loaded.
+    """
     file_path = os.path.join(DATA_DIR, filename)
     try:
-        df = pl.read_csv(file_path, columns=[0])
-        return _prepare(df)
+        dataset_key, df = _load_cached(_file_key(file_path), lambda: _read_predefined(file_path))
+        # Live mode only follows files of plain values
+        if dataset_key is not None and 'timestamp' not in df.columns:
+            _remember_source(dataset_key, file_path)
+        return dataset_key, df
     except Exception as e:
         print(f"Error loading predefined dataset: {e}")
-        return None
+        return None, None
+
+
+def load_uploaded_file(file_path, filename=None):
+    """Load a file that was uploaded to disk (see api/upload.py)
+
+    CSV, Parquet, Arrow IPC/Feather and NDJSON files are accepted; the format
+    is detected from the content, with `filename`'s extension as a hint. A
+    date/time column is kept as 'timestamp' (see `_dataset_columns`).
+
+    Returns:
+        tuple: (dataset_key, df), or (None, None) if it can't be parsed.
+    """
+    try:
+        fmt = _sniff_format(file_path, filename)
+        return _load_cached(_file_key(file_path), lambda: _read_dataset(file_path, fmt))
+    except Exception as e:
+        print(f"Error parsing uploaded file: {e}")
+        return None, None
+
+
+def is_multi_series(schema, tag_column='tag'):
+    """Whether a file holds several series: long format (`tag_column` and
+    'value' columns) or more than one numeric column."""
+    if tag_column in schema and 'value' in schema:
+        return True
+    return sum(1 for dtype in schema.values() if dtype.is_numeric()) > 1
+
+
+def load_batch_file(file_path, filename=None):
+    """Load a file holding several series (see `is_multi_series`) in long
+    format, for `data_processor.batch_control_summary()`.
+
+    Only the file's schema is read when it turns out to hold a single
+    series, so trying this first costs little for ordinary uploads.
+
+    Returns:
+        tuple: (batch_key, df) with 'tag' and 'value' columns, or
+               (None, None) if the file holds a single series or its
+               schema can't be read (it is then tried as a single series).
+    Raises:
+        ValueError: the file holds several series but they can't be read
+    """
+    try:
+        fmt = _sniff_format(file_path, filename)
+        lf = _scan(file_path, fmt)
+        schema = lf.collect_schema()
+    except Exception as e:
+        print(f"Error parsing uploaded file: {e}")
+        return None, None
+    if not is_multi_series(schema):
+        return None, None
+    key = f"batch:{_file_key(file_path)}"
+    cache = get_cache()
+    df = cache.get_frame(key)
+    if df is None:
+        try:
+            df = to_long_format(lf).collect()
+        except Exception as e:
+            raise ValueError(f"couldn't read its series ({e})") from e
+        if df.is_empty():
+            return None, None
+        cache.set_frame(key, df)
+    return key, df
+
+
+def load_batch_series(batch_key, tag):
+    """Load one series of a batch as a regular dataset, so it can be charted
+    like any upload.
+
+    Returns:
+        tuple: (dataset_key, df), or (None, None) if the batch is no longer
+               cached or has no such tag.
+    """
+    batch = get_cached_dataset(batch_key)
+    if batch is None:
+        return None, None
+    key = content_key(f"{batch_key}:{tag}".encode())
+    return _load_cached(key, lambda: batch.filter(pl.col('tag') == tag).select('value'))
 
 
 def parse_csv(contents):
-    """Parse uploaded CSV file contents from Dash Upload component"""
+    """Parse uploaded file contents from Dash Upload component
+
+    Despite the name, any format `detect_format` recognizes is accepted.
+    The base64 payload is decoded in chunks straight into a bytes buffer that
+    Polars parses directly; uploads over SPOOL_TO_DISK_BYTES are decoded to a
+    temporary file and scanned lazily instead.
+
+    Returns:
+        tuple: (dataset_key, df), or (None, None) if it can't be parsed.
+    """
     if contents is None:
-        return None
+        return None, None
 
+    tmp_path = None
     try:
-        # Remove the data URI prefix (e.g., 'data:text/csv;base64,')
-        content_string = contents.split(',')[1]
-        # Decode base64 and convert to DataFrame
-        decoded = base64.b64decode(content_string).decode('utf-8')
-        return _prepare(pl.read_csv(io.StringIO(decoded), columns=[0]))
+        # Skip the data URI prefix (e.g., 'data:text/csv;base64,') without
+        # copying the payload
+        start = contents.index(',') + 1
+        hasher = content_hasher()
+        if (len(contents) - start) * 3 // 4 > SPOOL_TO_DISK_BYTES:
+            with tempfile.NamedTemporaryFile(suffix='.upload', delete=False) as tmp:
+                tmp_path = tmp.name
+                _decode_base64(contents, start, tmp, hasher)
+            # From the content alone, as below: the temporary name says nothing
+            with open(tmp_path, 'rb') as f:
+                fmt = detect_format(f.read(64))
+            return _load_cached(hasher.hexdigest(), lambda: _read_dataset(tmp_path, fmt))
+
+        buffer = io.BytesIO()
+        _decode_base64(contents, start, buffer, hasher)
+        fmt = detect_format(buffer.getbuffer()[:64].tobytes())
+        buffer.seek(0)
+        return _load_cached(hasher.hexdigest(), lambda: _read_dataset(buffer, fmt))
     except Exception as e:
         print(f"Error parsing CSV: {e}")
-        return None
+        return None, None
+    finally:
+        if tmp_path is not None:
+            os.remove(tmp_path)
+
+
+def get_cached_dataset(dataset_key):
+    """Return the parsed dataset for a key from `stored-data`, or None if it
+    is no longer cached (evicted, or parsed by a worker that doesn't share
+    the cache backend)."""
+    return get_cache().get_frame(dataset_key)
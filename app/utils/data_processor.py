@@ -1,10 +1,15 @@
+import math
+from functools import lru_cache
+
 import polars as pl
 
-def calculate_control_stats(df: pl.DataFrame) -> dict:
+def calculate_control_stats(df: pl.DataFrame | pl.LazyFrame) -> dict:
     """
     Calculates stats that can be computed without user input
     Parameters:
-        df (pl.DataFrame): Input DataFrame with a numeric 'value' column representing the process data.
+        df (pl.DataFrame | pl.LazyFrame): Input data with a numeric 'value' column representing the process data.
+            A LazyFrame (e.g. a baseline period from `filter(index < change_point)`) is collected as part
+            of the same query, without materializing the filtered rows first.
     Returns:
         dict: A dictionary containing:
             - 'mean': Mean of the 'value' column.
@@ -17,13 +22,26 @@ def calculate_control_stats(df: pl.DataFrame) -> dict:
             - 'lzl': Lower Zone A Limit (mean - 1 * std_dev).
     Notes:
         Assumes the 'value' column exists and contains numeric data.
+        All reductions run as a single query, so the data is scanned once
+        rather than once per statistic.
     """
-    mean = df['value'].mean()
-    std_dev = df['value'].std()
-    min_value = df['value'].min()
-    max_value = df['value'].max()
-    count = df['value'].count()
-    mr_avg = df['value'].diff().abs().mean()
+    summary = df.lazy().select(_summary_expressions()).collect()
+    return _control_stats(**summary.row(0, named=True))
+
+def _summary_expressions() -> list:
+    """The reductions `_control_stats()` is built from."""
+    value = pl.col('value')
+    return [
+        value.mean().alias('mean'),
+        value.std().alias('std_dev'),
+        value.min().alias('min_value'),
+        value.max().alias('max_value'),
+        value.count().alias('count'),
+        value.diff().abs().mean().alias('mr_avg'),
+    ]
+
+def _control_stats(mean, std_dev, min_value, max_value, count, mr_avg):
+    """Build the `calculate_control_stats()` dict from the summary values."""
     mr_ucl = mr_avg * 3.267
     
     return {
@@ -43,107 +61,121 @@ def calculate_control_stats(df: pl.DataFrame) -> dict:
         'mr_ucl': mr_ucl
     }
 
-def add_control_rules(df: pl.DataFrame, stats: dict, active_rules: dict = None) -> pl.DataFrame:
-    """Add flag columns indicating if each data point (row) breaks any of the active control chart rules.
-    
+# How rule flags are shown to users (the flags themselves are Boolean)
+RULE_FLAG_LABELS = {True: "Broken", False: "OK"}
+
+# Stats the rule expressions depend on
+_RULE_STATS = ('mean', 'ucl', 'lcl', 'uwl', 'lwl', 'uzl', 'lzl')
+
+@lru_cache(maxsize=64)
+def _rule_expressions(active: tuple, limits: tuple) -> tuple:
+    """Build the flag expressions of the active rules, one boolean
+    expression per rule (True = broken).
+
+    Cached by the active rules and the limits they are evaluated against, so
+    re-evaluating (e.g. for another dataset version with the same limits)
+    doesn't rebuild them. Subexpressions used by several rules are built once
+    and shared, so Polars' common subexpression elimination computes them
+    once per query.
+
     Args:
-        df: Polars DataFrame
-        stats: output of `calculate_control_stats()`
-        active_rules: Dictionary with active rules {1: True/False, 2: True/False, ...}
-                      If None, all rules are active
-    Returns:
-        df: a Polars Dataframe with the flag columns added
+        active: the numbers of the active rules, e.g. (1, 2, 5)
+        limits: the values of _RULE_STATS
     """
-    # If active_rules is None, assume all rules are active
-    if active_rules is None:
-        active_rules = {i: True for i in range(1, 9)}
-    
-    val_diff = pl.col('value').diff()
-    in_zone_c = pl.col('value').is_between(stats['lzl'], stats['uzl'])
+    s = dict(zip(_RULE_STATS, limits))
+    value = pl.col('value')
+
+    # Shared by rules 3 and 4
+    diff_sign = value.diff().sign()
+    # Shared by rules 6, 7 and 8
+    above_zone_c = value > s['uzl']
+    below_zone_c = value < s['lzl']
+    in_zone_c = value.is_between(s['lzl'], s['uzl'])
 
+    def count(flag, window_size):
+        return flag.cast(pl.Int32).rolling_sum(window_size=window_size)
 
-    rule_1_counter = pl.when(pl.col("value").is_between(stats['lcl'], stats['ucl'])).then(0).otherwise(1)
+    rules = {}
+    # Rule 1: a point beyond 3 sigma
+    rules[1] = lambda: ~value.is_between(s['lcl'], s['ucl'])
 
-    # Rule 2: 9 consecutive points on the same 
-    mean_diff = (pl.col("value") - stats['mean'])
-    mean_diff_sign = mean_diff.sign()
-    rule_2_counter = mean_diff_sign.rolling_sum(window_size=9)
+    # Rule 2: 9 consecutive points on the same side of the centerline
+    rules[2] = lambda: (value - s['mean']).sign().rolling_sum(window_size=9).abs() == 9
 
     # Rule 3: six points in a row steadily increasing or decreasing
     # (6 monotonic points = 5 consecutive differences with the same sign)
-    rule_3_counter = val_diff.sign().rolling_sum(window_size=5).abs()
+    rules[3] = lambda: diff_sign.rolling_sum(window_size=5).abs() == 5
 
     # Rule 4 - alternating pattern - 14 points in a row alternating up and down
     # (14 points = 13 differences = 12 sign changes; each contributes |Δsign| = 2)
-    rule_4_counter = pl.col('value') \
-        .diff() \
-        .sign() \
-        .diff() \
-        .abs() \
-        .rolling_sum(window_size=12) \
-        .truediv(2)
-    
-    # Rule 5: Two out of three points in a row in Zone A (2 sigma) or beyond 
+    rules[4] = lambda: diff_sign.diff().abs().rolling_sum(window_size=12) == 24
+
+    # Rule 5: Two out of three points in a row in Zone A (2 sigma) or beyond
     # They have to be on the same side of the centerline!!
-    flag_zone_a_upper = pl.when(pl.col("value") > stats['uwl']).then(1).otherwise(0)
-    flag_zone_a_lower = pl.when(pl.col("value") < stats['lwl']).then(1).otherwise(0)
-    rule_5_counter_upper = flag_zone_a_upper.rolling_sum(window_size=3)
-    rule_5_counter_lower = flag_zone_a_lower.rolling_sum(window_size=3)
+    rules[5] = lambda: ((count(value > s['uwl'], 3) >= 2)
+                        | (count(value < s['lwl'], 3) >= 2))
 
     # Rule 6: Four out of five points in a row in Zone B or beyond
     # They have to be on the same side of the centerline (like rule 5)
-    rule_6_flag_upper = pl.when(pl.col("value") > stats['uzl']).then(1).otherwise(0)
-    rule_6_flag_lower = pl.when(pl.col("value") < stats['lzl']).then(1).otherwise(0)
-    rule_6_counter_upper = rule_6_flag_upper.rolling_sum(window_size=5)
-    rule_6_counter_lower = rule_6_flag_lower.rolling_sum(window_size=5)
+    rules[6] = lambda: (count(above_zone_c, 5) >= 4) | (count(below_zone_c, 5) >= 4)
 
-    # Rule 7: Fifteen points in a row within Zone C (the one closest to the centreline) 
-    rule_7_flag = pl.when(pl.col("value").is_between(stats['lzl'], stats['uzl'])).then(1).otherwise(0)
-    rule_7_counter = rule_7_flag.rolling_sum(window_size=15)
+    # Rule 7: Fifteen points in a row within Zone C (the one closest to the centreline)
+    rules[7] = lambda: count(in_zone_c, 15) == 15
 
     # Rule 8: Eight points in a row with none in Zone C (that is, 8 points beyond 1 sigma)
     # either side of the centerline (unlike rule 5)
-    rule_8_flag = pl.when(~in_zone_c).then(1).otherwise(0)
-    rule_8_counter = rule_8_flag.rolling_sum(window_size=8)
-
-    # Base columns with all rules set to OK
-    rule_columns = {
-        'rule_1': pl.lit("OK"),
-        'rule_2': pl.lit("OK"),
-        'rule_3': pl.lit("OK"),
-        'rule_4': pl.lit("OK"),
-        'rule_5': pl.lit("OK"),
-        'rule_6': pl.lit("OK"),
-        'rule_7': pl.lit("OK"),
-        'rule_8': pl.lit("OK")
-    }
-    
-    # Only apply active rules
-    if active_rules.get(1, True):
-        rule_columns['rule_1'] = pl.when(rule_1_counter > 0).then(pl.lit("Broken")).otherwise(pl.lit("OK"))
-    
-    if active_rules.get(2, True):
-        rule_columns['rule_2'] = pl.when((rule_2_counter.abs() == 9)).then(pl.lit("Broken")).otherwise(pl.lit("OK"))
-    
-    if active_rules.get(3, True):
-        rule_columns['rule_3'] = pl.when(rule_3_counter == 5).then(pl.lit("Broken")).otherwise(pl.lit("OK"))
+    rules[8] = lambda: count(~in_zone_c, 8) == 8
 
-    if active_rules.get(4, True):
-        rule_columns['rule_4'] = pl.when(rule_4_counter == 12).then(pl.lit("Broken")).otherwise(pl.lit("OK"))
-    
-    if active_rules.get(5, True):
-        rule_columns['rule_5'] = pl.when((rule_5_counter_upper >= 2) | (rule_5_counter_lower >= 2)).then(pl.lit("Broken")).otherwise(pl.lit("OK"))
-    
-    if active_rules.get(6, True):
-        rule_columns['rule_6'] = pl.when((rule_6_counter_upper >= 4) | (rule_6_counter_lower >= 4)).then(pl.lit("Broken")).otherwise(pl.lit("OK"))
-    
-    if active_rules.get(7, True):
-        rule_columns['rule_7'] = pl.when(rule_7_counter == 15).then(pl.lit("Broken")).otherwise(pl.lit("OK"))
+    # Incomplete windows at the start of the series give nulls: not broken
+    return tuple(rules[i]().fill_null(False).alias(f'rule_{i}') for i in active)
+
+def control_rule_columns(stats: dict, active_rules: dict = None) -> list:
+    """The Boolean flag expressions 'rule_1' to 'rule_8' for `stats`: the
+    active rules' flags, and a constant False for the inactive ones.
+
+    Args:
+        stats: output of `calculate_control_stats()`, or any dict with the
+               limits the rules use (e.g. frozen limits, see utils/limits.py)
+        active_rules: Dictionary with active rules {1: True/False, 2: True/False, ...}
+                      If None, all rules are active
+    """
+    # If active_rules is None, assume all rules are active
+    if active_rules is None:
+        active_rules = {i: True for i in range(1, 9)}
+    active = tuple(i for i in range(1, 9) if active_rules.get(i, True))
+    flags = dict(zip(active, _rule_expressions(active, tuple(stats[k] for k in _RULE_STATS))))
+    return [flags[i] if i in flags else pl.lit(False).alias(f'rule_{i}') for i in range(1, 9)]
+
+def add_control_rules(df: pl.DataFrame, stats: dict, active_rules: dict = None) -> pl.DataFrame:
+    """Add flag columns indicating if each data point (row) breaks any of the active control chart rules.
+
+    Only the active rules are computed, in one lazy query; inactive rules
+    get a constant False column. The flags are Boolean (True = broken),
+    which Polars stores as bits: 8 flags take one byte per row. Use
+    `rule_flag_labels()` to show them as "Broken"/"OK".
     
-    if active_rules.get(8, True):
-        rule_columns['rule_8'] = pl.when(rule_8_counter == 8).then(pl.lit("Broken")).otherwise(pl.lit("OK"))
+    Args:
+        df: Polars DataFrame
+        stats: output of `calculate_control_stats()`
+        active_rules: Dictionary with active rules {1: True/False, 2: True/False, ...}
+                      If None, all rules are active
+    Returns:
+        df: a Polars Dataframe with the Boolean flag columns 'rule_1' to 'rule_8' added
+    """
+    return df.lazy().with_columns(control_rule_columns(stats, active_rules)).collect()
 
-    return df.with_columns(**rule_columns)
+def rule_flag_label(flag: pl.Expr) -> pl.Expr:
+    """The "Broken"/"OK" label of a Boolean rule flag expression."""
+    return pl.when(flag).then(pl.lit(RULE_FLAG_LABELS[True])).otherwise(pl.lit(RULE_FLAG_LABELS[False]))
+
+def rule_flag_labels(df: pl.DataFrame) -> pl.DataFrame:
+    """Return `df` with its Boolean 'rule_N' flag columns as "Broken"/"OK"
+    strings, for the table and downloads. Only convert what is shown: a
+    page of the table, or a file being written."""
+    return df.with_columns(
+        rule_flag_label(pl.col(c)).alias(c)
+        for c, dtype in df.schema.items() if c.startswith('rule_') and dtype == pl.Boolean
+    )
 
 def calculate_capability(mu, sigma, USL=None, LSL=None):
     """
@@ -185,4 +217,351 @@ def add_moving_range(df: pl.DataFrame) -> pl.DataFrame:
     df = df.with_columns(
         (pl.col('value').diff().abs()).alias('moving_range')
     )
-    return df
\ No newline at end of file
+    return df
+
+# Longest look-back of any Nelson rule (rule 7: 15 points in a row), so the
+# flags of a new point only depend on the RULE_LOOKBACK - 1 points before it
+RULE_LOOKBACK = 15
+
+def running_stats(values: pl.Series) -> dict:
+    """Compute running accumulators for a series, to be updated with
+    `update_running_stats()` as new observations arrive.
+
+    Args:
+        values: the observations (at least one).
+    Returns:
+        dict: count, mean, sum of squared deviations (m2), min, max, last
+              value and the sum/count of moving ranges.
+    """
+    n = values.len()
+    return {
+        'n': n,
+        'mean': values.mean(),
+        'm2': (values.var() or 0.0) * (n - 1),
+        'min': values.min(),
+        'max': values.max(),
+        'last': values[-1],
+        'mr_sum': values.diff().abs().sum(),
+        'mr_n': n - 1,
+    }
+
+def update_running_stats(acc: dict, new_values: pl.Series) -> dict:
+    """Fold new observations into running accumulators.
+
+    Uses the parallel form of Welford's algorithm (Chan et al.): the new
+    values are summarized on their own, then merged, so the cost depends on
+    the number of new values only.
+
+    Args:
+        acc: output of `running_stats()` or of a previous update.
+        new_values: the new observations (at least one).
+    Returns:
+        dict: the updated accumulators.
+    """
+    batch = running_stats(new_values)
+    n = acc['n'] + batch['n']
+    delta = batch['mean'] - acc['mean']
+    return {
+        'n': n,
+        'mean': acc['mean'] + delta * batch['n'] / n,
+        'm2': acc['m2'] + batch['m2'] + delta * delta * acc['n'] * batch['n'] / n,
+        'min': min(acc['min'], batch['min']),
+        'max': max(acc['max'], batch['max']),
+        'last': batch['last'],
+        # The first new value also closes a moving range with the old last one
+        'mr_sum': acc['mr_sum'] + batch['mr_sum'] + abs(new_values[0] - acc['last']),
+        'mr_n': acc['mr_n'] + batch['n'],
+    }
+
+def stats_from_running(acc: dict) -> dict:
+    """Same output as `calculate_control_stats()`, from running accumulators
+    (of at least 2 observations)."""
+    std_dev = (acc['m2'] / (acc['n'] - 1)) ** 0.5
+    mr_avg = acc['mr_sum'] / acc['mr_n']
+    return _control_stats(acc['mean'], std_dev, acc['min'], acc['max'], acc['n'], mr_avg)
+
+def append_control_rules(df_with_rules: pl.DataFrame, new_values: pl.Series, stats: dict,
+                         active_rules: dict = None) -> pl.DataFrame:
+    """Append new observations to the output of `add_control_rules()`,
+    evaluating the rules only for the new rows.
+
+    Each new row is evaluated together with the RULE_LOOKBACK - 1 rows before
+    it, so the cost doesn't depend on the length of the series. The flags of
+    the existing rows are kept as they are.
+
+    Args:
+        df_with_rules: output of `add_control_rules()` with an 'index' column
+        new_values: the new observations
+        stats: the stats to evaluate the new rows against
+        active_rules: as for `add_control_rules()`
+    Returns:
+        df: `df_with_rules` with the new rows appended
+    """
+    new_rows = pl.DataFrame({'value': new_values.cast(pl.Float64)}).with_row_index(offset=df_with_rules.height)
+    window = pl.concat([df_with_rules.select('index', 'value').tail(RULE_LOOKBACK - 1), new_rows])
+    evaluated = add_control_rules(window, stats, active_rules).tail(new_rows.height)
+    return pl.concat([df_with_rules, evaluated], how='diagonal', rechunk=False)
+
+def to_long_format(df: pl.DataFrame | pl.LazyFrame, tag_column: str = 'tag') -> pl.LazyFrame:
+    """Bring a multi-series table into long format, one (tag, value) row per
+    observation.
+
+    Data that already has `tag_column` and 'value' columns is taken as long
+    format. Otherwise every numeric column is a series, named after the
+    column (e.g. a historian export with one column per sensor tag).
+
+    Returns:
+        LazyFrame with `tag_column` (String) and 'value' (Float64) columns,
+        each series in its original order.
+    """
+    lf = df.lazy()
+    schema = lf.collect_schema()
+    if tag_column in schema and 'value' in schema:
+        lf = lf.select(pl.col(tag_column).cast(pl.Utf8), 'value')
+    else:
+        numeric = [name for name, dtype in schema.items() if dtype.is_numeric()]
+        # Unpivot to placeholder names, so a series can itself be called
+        # 'value' (or `tag_column`) without clashing with the output columns
+        lf = (lf.select(numeric)
+              .unpivot(on=numeric, variable_name='__tag__', value_name='__value__')
+              .rename({'__tag__': tag_column, '__value__': 'value'}))
+    return lf.with_columns(pl.col('value').cast(pl.Float64, strict=False)).drop_nulls()
+
+def batch_control_summary(df: pl.DataFrame | pl.LazyFrame, active_rules: dict = None,
+                          tag_column: str = 'tag') -> pl.DataFrame:
+    """Control stats and rule violation counts for many series at once.
+
+    The data is split by tag (`partition_by`) and every series gets the
+    queries `calculate_control_stats()` and `add_control_rules()` would run
+    for it, against its own limits, reduced to counts. The queries of all
+    the series are run together with `pl.collect_all`, which spreads them
+    over all cores: once for the stats, once for the rules.
+
+    Args:
+        df: long format (tag, value) or wide (one numeric column per series)
+            data, see `to_long_format()`
+        active_rules: Dictionary with active rules {1: True/False, 2: True/False, ...}
+                      If None, all rules are active
+        tag_column: name of the tag column in long format data
+    Returns:
+        DataFrame with one row per tag with at least 2 points: `tag_column`,
+        'count', 'mean', 'std_dev', 'lcl', 'ucl', 'mr_avg', 'violations'
+        (points breaking at least one active rule) and 'rule_1' to 'rule_8'
+        (points breaking each rule, 0 for inactive ones), most violations
+        first.
+    """
+    if active_rules is None:
+        active_rules = {i: True for i in range(1, 9)}
+    active = tuple(i for i in range(1, 9) if active_rules.get(i, True))
+
+    series = to_long_format(df, tag_column).collect().partition_by(tag_column, maintain_order=True, as_dict=True)
+    # Control limits need at least 2 points
+    series = {tag: part for (tag,), part in series.items() if part.height >= 2}
+    summaries = pl.collect_all([part.lazy().select(_summary_expressions()) for part in series.values()])
+    stats = [_control_stats(**summary.row(0, named=True)) for summary in summaries]
+
+    counts = [
+        part.lazy()
+        .select(_rule_expressions(active, tuple(st[k] for k in _RULE_STATS)))
+        .select(pl.any_horizontal(pl.all()).sum().alias('violations'), pl.all().sum())
+        for part, st in zip(series.values(), stats)
+    ] if active else []
+    counts = pl.collect_all(counts) if counts else [None] * len(stats)
+
+    rows = []
+    for tag, st, count in zip(series, stats, counts):
+        count = count.row(0, named=True) if count is not None else {}
+        rows.append({
+            tag_column: tag, 'count': st['count'], 'mean': st['mean'], 'std_dev': st['std_dev'],
+            'lcl': st['lcl'], 'ucl': st['ucl'], 'mr_avg': st['mr_avg'],
+            'violations': count.get('violations', 0),
+            **{f'rule_{i}': count.get(f'rule_{i}', 0) for i in range(1, 9)},
+        })
+    schema = {tag_column: pl.Utf8, 'count': pl.UInt32, 'mean': pl.Float64, 'std_dev': pl.Float64,
+              'lcl': pl.Float64, 'ucl': pl.Float64, 'mr_avg': pl.Float64, 'violations': pl.UInt32,
+              **{f'rule_{i}': pl.UInt32 for i in range(1, 9)}}
+    return pl.DataFrame(rows, schema=schema, orient='row').sort(['violations', tag_column], descending=[True, False])
+
+# Control chart constants for subgroups of n observations (ASTM E2587):
+# A2, D3 and D4 for the limits of X̄-R charts, and d2 to estimate sigma as R̄ / d2
+_RANGE_CONSTANTS = {
+    2: (1.880, 0.000, 3.267, 1.128),
+    3: (1.023, 0.000, 2.574, 1.693),
+    4: (0.729, 0.000, 2.282, 2.059),
+    5: (0.577, 0.000, 2.114, 2.326),
+    6: (0.483, 0.000, 2.004, 2.534),
+    7: (0.419, 0.076, 1.924, 2.704),
+    8: (0.373, 0.136, 1.864, 2.847),
+    9: (0.337, 0.184, 1.816, 2.970),
+    10: (0.308, 0.223, 1.777, 3.078),
+    11: (0.285, 0.256, 1.744, 3.173),
+    12: (0.266, 0.283, 1.717, 3.258),
+    13: (0.249, 0.307, 1.693, 3.336),
+    14: (0.235, 0.328, 1.672, 3.407),
+    15: (0.223, 0.347, 1.653, 3.472),
+    16: (0.212, 0.363, 1.637, 3.532),
+    17: (0.203, 0.378, 1.622, 3.588),
+    18: (0.194, 0.391, 1.608, 3.640),
+    19: (0.187, 0.403, 1.597, 3.689),
+    20: (0.180, 0.415, 1.585, 3.735),
+    21: (0.173, 0.425, 1.575, 3.778),
+    22: (0.167, 0.434, 1.566, 3.819),
+    23: (0.162, 0.443, 1.557, 3.858),
+    24: (0.157, 0.451, 1.548, 3.895),
+    25: (0.153, 0.459, 1.541, 3.931),
+}
+MAX_SUBGROUP_SIZE = max(_RANGE_CONSTANTS)
+
+# Chart types plotting subgroup means, by the dispersion chart below them
+SUBGROUP_CHART_TYPES = {'xbar_r': 'range', 'xbar_s': 'std_dev'}
+
+def subgroup_constants(n: int) -> dict:
+    """Control chart constants for subgroups of `n` observations.
+
+    Returns:
+        dict: 'A2', 'D3', 'D4' and 'd2' (X̄-R charts), and 'A3', 'B3', 'B4'
+              and 'c4' (X̄-S charts). c4 and the constants derived from it
+              are computed exactly; the others come from the usual tables.
+    Raises:
+        ValueError: if `n` is not between 2 and MAX_SUBGROUP_SIZE.
+    """
+    if n not in _RANGE_CONSTANTS:
+        raise ValueError(f"Subgroup size must be between 2 and {MAX_SUBGROUP_SIZE}, got {n}")
+    a2, d3, d4, d2 = _RANGE_CONSTANTS[n]
+    c4 = math.sqrt(2 / (n - 1)) * math.exp(math.lgamma(n / 2) - math.lgamma((n - 1) / 2))
+    b = 3 * math.sqrt(1 - c4 * c4) / c4
+    return {'A2': a2, 'D3': d3, 'D4': d4, 'd2': d2,
+            'A3': 3 / (c4 * math.sqrt(n)), 'B3': max(1 - b, 0.0), 'B4': 1 + b, 'c4': c4}
+
+def subgroup_summary(df: pl.DataFrame | pl.LazyFrame, subgroup_size: int = None,
+                     subgroup_column: str = None) -> pl.DataFrame:
+    """Reduce individual observations to one row per rational subgroup, in a
+    single `group_by` aggregation.
+
+    Subgroups are either runs of `subgroup_size` consecutive points (an
+    incomplete last subgroup is dropped) or the rows sharing a value of
+    `subgroup_column`, in order of first appearance (subgroups of a single
+    point are dropped, since they have no spread).
+
+    The result has a 'value' column, the subgroup means, so the Nelson rules
+    (`add_control_rules()`) and chart markers work on it as on individual
+    values.
+
+    Returns:
+        DataFrame with 'index' (subgroup number), `subgroup_column` (if
+        given), 'value', 'min', 'max', 'range', 'std_dev' and 'size'.
+    """
+    if subgroup_column is None:
+        key = (pl.int_range(pl.len(), dtype=pl.UInt32) // subgroup_size).alias('subgroup')
+        min_size = subgroup_size
+    else:
+        key = pl.col(subgroup_column)
+        min_size = 2
+    value = pl.col('value')
+    return (
+        df.lazy()
+        .group_by(key, maintain_order=True)
+        .agg(value.mean().alias('value'), value.min().alias('min'), value.max().alias('max'),
+             value.std().alias('std_dev'), pl.len().alias('size'))
+        .filter(pl.col('size') >= min_size)
+        .select(pl.exclude('subgroup'), (pl.col('max') - pl.col('min')).alias('range'))
+        .select(pl.exclude('std_dev', 'size'), 'std_dev', 'size')
+        .with_row_index()
+        .collect()
+    )
+
+def calculate_subgroup_stats(subgroups: pl.DataFrame | pl.LazyFrame, chart_type: str = 'xbar_r') -> dict:
+    """Control stats of an X̄-R or X̄-S chart, from `subgroup_summary()`.
+
+    The limits of the means are the grand mean ± A2·R̄ (X̄-R) or ± A3·S̄
+    (X̄-S); the warning and zone limits split that distance in thirds, as
+    for individual values. The subgroup size used for the constants is the
+    median size of the subgroups, at most MAX_SUBGROUP_SIZE.
+
+    Args:
+        subgroups: output of `subgroup_summary()`, e.g. filtered to a
+            baseline period
+        chart_type: 'xbar_r' or 'xbar_s'
+    Returns:
+        dict: the keys of `calculate_control_stats()` except the moving
+        range ones, with 'std_dev' the within-subgroup sigma (R̄/d2 or
+        S̄/c4) and 'count' the number of observations, plus 'chart_type',
+        'subgroup_size', 'subgroups', 'dispersion' (the column shown on
+        the lower chart: 'range' or 'std_dev') and its center line and
+        limits 'dispersion_avg', 'dispersion_lcl' and 'dispersion_ucl'.
+        None if there are no subgroups.
+    """
+    summary = subgroups.lazy().select(
+        pl.col('value').mean().alias('mean'),
+        pl.col('min').min().alias('min_value'),
+        pl.col('max').max().alias('max_value'),
+        pl.col('size').sum().alias('count'),
+        pl.len().alias('subgroups'),
+        pl.col('size').median().alias('subgroup_size'),
+        pl.col('range').mean().alias('r_bar'),
+        pl.col('std_dev').mean().alias('s_bar'),
+    ).collect().row(0, named=True)
+    if not summary['subgroups']:
+        return None
+
+    n = min(max(round(summary['subgroup_size']), 2), MAX_SUBGROUP_SIZE)
+    k = subgroup_constants(n)
+    if chart_type == 'xbar_r':
+        center = summary['r_bar']
+        std_dev, limit = center / k['d2'], k['A2'] * center
+        dispersion_lcl, dispersion_ucl = k['D3'] * center, k['D4'] * center
+    else:
+        center = summary['s_bar']
+        std_dev, limit = center / k['c4'], k['A3'] * center
+        dispersion_lcl, dispersion_ucl = k['B3'] * center, k['B4'] * center
+
+    mean, zone = summary['mean'], limit / 3
+    return {
+        'mean': mean,
+        'std_dev': std_dev,
+        'min': summary['min_value'],
+        'max': summary['max_value'],
+        'count': summary['count'],
+        'range': summary['max_value'] - summary['min_value'],
+        'ucl': mean + limit,
+        'lcl': mean - limit,
+        'uwl': mean + 2 * zone,
+        'lwl': mean - 2 * zone,
+        'uzl': mean + zone,
+        'lzl': mean - zone,
+        'chart_type': chart_type,
+        'subgroup_size': n,
+        'subgroups': summary['subgroups'],
+        'dispersion': SUBGROUP_CHART_TYPES[chart_type],
+        'dispersion_avg': center,
+        'dispersion_lcl': dispersion_lcl,
+        'dispersion_ucl': dispersion_ucl,
+    }
+
+def resample(df: pl.DataFrame | pl.LazyFrame, every: str) -> pl.DataFrame:
+    """Aggregate a time-indexed series into periods with `group_by_dynamic`.
+
+    Args:
+        df: data with 'timestamp' and 'value' columns, in any order (rows
+            without a timestamp are dropped)
+        every: period length as a Polars duration, e.g. '1h', '1d', '1w'
+               (starting on Mondays) or '1mo'
+    Returns:
+        DataFrame with one row per period holding observations: 'timestamp'
+        (start of the period), 'value' (their mean), and 'min', 'max',
+        'range', 'std_dev' and 'size' as for `subgroup_summary()`, so the
+        periods can also be used as subgroups.
+    """
+    value = pl.col('value')
+    return (
+        df.lazy()
+        .select('timestamp', 'value')
+        .drop_nulls('timestamp')
+        .sort('timestamp')
+        .group_by_dynamic('timestamp', every=every, start_by='monday' if every.endswith('w') else 'window')
+        .agg(value.mean().alias('value'), value.min().alias('min'), value.max().alias('max'),
+             value.std().alias('std_dev'), pl.len().alias('size'))
+        .select('timestamp', 'value', 'min', 'max', (pl.col('max') - pl.col('min')).alias('range'),
+                'std_dev', 'size')
+        .collect()
+    )
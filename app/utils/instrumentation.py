@@ -0,0 +1,204 @@
+"""
+Opt-in timing and memory instrumentation of the callbacks and pipeline stages.
+
+Selected with the `INSTRUMENTATION` environment variable:
+
+  * `off` (default): `measure()` and `instrumented` do nothing.
+  * `time`: record the wall time of each measured block.
+  * `on`: also record its peak memory, with `tracemalloc`. That is the
+    memory allocated by Python objects (Plotly figures, JSON, dicts...);
+    Polars' own buffers aren't traced. Tracing slows allocation-heavy code
+    down, so timings are best read with `time`.
+
+Measurements are aggregated per process, for `prometheus_text()` (the
+`/metrics` route, see api/instrumentation.py), and collected per request
+between `begin_collecting()` and `end_collecting()` for the request's
+`Server-Timing` header. Callbacks run as background jobs (utils/background.py)
+measure in the job's process, so they are only reported with
+BACKGROUND_CALLBACKS=off.
+
+Peak memory is process-wide: with concurrent requests, a stage's peak
+includes what other threads allocated meanwhile.
+"""
+
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+def instrumentation_mode():
+    """'off', 'time' or 'on' (see module docstring)."""
+    mode = os.environ.get('INSTRUMENTATION', 'off').lower()
+    if mode not in ('off', 'time', 'on'):
+        raise ValueError(f"Unknown INSTRUMENTATION '{mode}' (expected off, time or on)")
+    return mode
+
+
+MODE = instrumentation_mode()
+ENABLED = MODE != 'off'
+TRACE_MEMORY = MODE == 'on'
+
+# Upper bounds of the duration histogram buckets, in seconds (Prometheus' defaults)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = 'huronspc'
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+# Measurements of the current request, as (kind, name, seconds, peak bytes)
+_collected = ContextVar('instrumentation_collected', default=None)
+# Blocks being measured in this thread, innermost last, for nested peaks
+_local = threading.local()
+
+
+def record(name, seconds, kind='stage', peak=None):
+    """Add a measurement taken elsewhere (e.g. a request's wall time)."""
+    with _metrics_lock:
+        metric = _metrics.get((kind, name))
+        if metric is None:
+            metric = _metrics[(kind, name)] = {
+                'count': 0, 'sum': 0.0, 'buckets': [0] * len(DURATION_BUCKETS), 'peak': None}
+        metric['count'] += 1
+        metric['sum'] += seconds
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                metric['buckets'][i] += 1
+        if peak is not None:
+            metric['peak'] = max(metric['peak'] or 0, peak)
+    collected = _collected.get()
+    if collected is not None:
+        collected.append((kind, name, seconds, peak))
+
+
+@contextmanager
+def measure(name, kind='stage'):
+    """Measure the wall time (and, with INSTRUMENTATION=on, the peak memory)
+    of a block.
+
+    Args:
+        name: what is measured, e.g. a stage or callback name
+        kind: 'stage', 'callback' or 'request'
+    """
+    if not ENABLED:
+        yield
+        return
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    frame = {'base': 0, 'peak': 0}
+    if TRACE_MEMORY:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        current, peak = tracemalloc.get_traced_memory()
+        # Keep the enclosing block's peak so far before resetting it for this one
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame = {'base': current, 'peak': current}
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        peak = None
+        if TRACE_MEMORY and tracemalloc.is_tracing():
+            absolute = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], absolute)
+            peak = absolute - frame['base']
+        record(name, seconds, kind, peak)
+
+
+def instrumented(func):
+    """Decorator measuring each call of a callback, under its function name.
+
+    Returns `func` itself when instrumentation is off.
+    """
+    if not ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with measure(func.__name__, 'callback'):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def begin_collecting():
+    """Start collecting the measurements made in this context (a request).
+
+    Returns:
+        a token for `end_collecting()`
+    """
+    return _collected.set([])
+
+
+def end_collecting(token):
+    """Stop collecting and return the measurements since `begin_collecting()`,
+    as (kind, name, seconds, peak bytes or None) tuples in the order the
+    blocks finished."""
+    collected = _collected.get() or []
+    _collected.reset(token)
+    return collected
+
+
+def server_timing(measurements, total=None, other=None):
+    """Value of a `Server-Timing` header for a request's measurements.
+
+    Args:
+        measurements: as returned by `end_collecting()`
+        total: the request's wall time in seconds, added as 'total'
+        other: (name, description) of an entry for the part of `total` not
+            spent in callbacks (e.g. Dash serializing their outputs)
+    """
+    entries = []
+    for kind, name, seconds, peak in measurements:
+        entry = f"{name};dur={seconds * 1000:.1f}"
+        if peak is not None:
+            entry += f';desc="{kind}, peak {peak / 1024 ** 2:.1f} MB"'
+        elif kind == 'callback':
+            entry += ';desc="callback"'
+        entries.append(entry)
+    if total is not None:
+        if other is not None:
+            callbacks = sum(seconds for kind, _, seconds, _ in measurements if kind == 'callback')
+            if callbacks:
+                name, description = other
+                entries.append(f'{name};dur={max(total - callbacks, 0) * 1000:.1f};desc="{description}"')
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(entries)
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """The metrics of this process in the Prometheus text exposition format."""
+    with _metrics_lock:
+        metrics = sorted((key, {**m, 'buckets': list(m['buckets'])}) for key, m in _metrics.items())
+
+    duration = f"{METRIC_PREFIX}_duration_seconds"
+    memory = f"{METRIC_PREFIX}_peak_memory_bytes"
+    lines = [f"# HELP {duration} Wall time of requests, callbacks and pipeline stages",
+             f"# TYPE {duration} histogram"]
+    for (kind, name), m in metrics:
+        labels = f'kind="{kind}",name="{_label(name)}"'
+        for bound, count in zip(DURATION_BUCKETS, m['buckets']):
+            lines.append(f'{duration}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{duration}_bucket{{{labels},le="+Inf"}} {m["count"]}')
+        lines.append(f"{duration}_sum{{{labels}}} {m['sum']:.6f}")
+        lines.append(f"{duration}_count{{{labels}}} {m['count']}")
+    if TRACE_MEMORY:
+        lines += [f"# HELP {memory} Largest peak of Python memory allocated while measured",
+                  f"# TYPE {memory} gauge"]
+        for (kind, name), m in metrics:
+            if m['peak'] is not None:
+                lines.append(f'{memory}{{kind="{kind}",name="{_label(name)}"}} {m["peak"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,204 @@
+"""
+Frozen control limits for Phase I / Phase II charting.
+
+In Phase I the limits are computed from a baseline period of a process
+that is in control. In Phase II they are frozen: later data is judged
+against the baseline's limits instead of its own, so a shift shows up as
+rule violations rather than moving the limits along with it.
+
+A limits object is a small JSON-serializable dict:
+
+    {"format": "huronspc-limits", "version": 1, "created": "...",
+     "chart": None or {"type": "xbar_r", "subgroup_size": 5},
+     "source": {"dataset_name": ..., "dataset_key": ..., "baseline_end": ..., "points": ...},
+     "limits": {"mean": ..., "std_dev": ..., "ucl": ..., "lcl": ..., ...}}
+
+`freeze_limits()` builds one from the stats of a baseline, `save_limits()`
+and `load_limits()` (or `dumps_limits()` and `loads_limits()`) store it,
+and `score_against_limits()` evaluates the rules of new data against it in
+one lazy pass, without computing any statistics of the new data.
+"""
+
+import json
+import math
+from datetime import datetime, timezone
+
+import polars as pl
+
+from utils.cache import content_hasher
+from utils.data_processor import (SUBGROUP_CHART_TYPES, control_rule_columns, subgroup_summary)
+
+LIMITS_FORMAT = 'huronspc-limits'
+LIMITS_VERSION = 1
+
+# Stats that make up the limits of an individuals chart
+LIMIT_KEYS = ('mean', 'std_dev', 'ucl', 'lcl', 'uwl', 'lwl', 'uzl', 'lzl', 'mr_avg', 'mr_ucl')
+# ... and those of an X̄-R or X̄-S chart
+SUBGROUP_LIMIT_KEYS = ('mean', 'std_dev', 'ucl', 'lcl', 'uwl', 'lwl', 'uzl', 'lzl', 'chart_type',
+                       'subgroup_size', 'dispersion', 'dispersion_avg', 'dispersion_lcl', 'dispersion_ucl')
+_CHART_NAMES = {'xbar_r': 'X̄-R', 'xbar_s': 'X̄-S'}
+# Limits that aren't numbers
+_LABEL_KEYS = ('chart_type', 'dispersion')
+# Limits that must be in increasing order (when present)
+_ORDERED_KEYS = [('lcl', 'lwl', 'lzl', 'mean', 'uzl', 'uwl', 'ucl'),
+                 ('dispersion_lcl', 'dispersion_avg', 'dispersion_ucl')]
+_NON_NEGATIVE_KEYS = ('std_dev', 'mr_avg', 'mr_ucl', 'dispersion_avg')
+
+
+def _limit_keys(chart):
+    return SUBGROUP_LIMIT_KEYS if chart else LIMIT_KEYS
+
+
+def freeze_limits(stats: dict, chart: dict = None, source: dict = None) -> dict:
+    """Freeze the limits of a baseline into a limits object.
+
+    Args:
+        stats: the baseline's stats (`calculate_control_stats()` or
+            `calculate_subgroup_stats()`)
+        chart: the subgroup chart the stats are for (see
+            `pipeline.chart_from_settings`), or None for individuals
+        source: where the baseline comes from, e.g. {'dataset_name',
+            'dataset_key', 'baseline_end'}; kept for reference only
+    Returns:
+        dict: the limits object (see module docstring)
+    """
+    return {
+        'format': LIMITS_FORMAT,
+        'version': LIMITS_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'chart': chart,
+        'source': {**(source or {}), 'points': stats.get('subgroups', stats['count'])},
+        'limits': {k: stats[k] for k in _limit_keys(chart)},
+    }
+
+
+def validate_limits(limits) -> dict:
+    """Check that `limits` is a limits object this version can use.
+
+    Returns:
+        dict: `limits`
+    Raises:
+        ValueError: if it isn't a limits object, comes from a newer version,
+            misses some limit or has limits that aren't finite numbers in
+            order (LCL <= mean <= UCL...)
+    """
+    if not isinstance(limits, dict) or limits.get('format') != LIMITS_FORMAT:
+        raise ValueError("Not a control limits file")
+    version = limits.get('version')
+    if not isinstance(version, int) or version > LIMITS_VERSION:
+        raise ValueError(f"Unsupported control limits version {version!r} (this app reads up to "
+                         f"version {LIMITS_VERSION})")
+    chart = limits.get('chart')
+    if chart is not None and (not isinstance(chart, dict) or chart.get('type') not in SUBGROUP_CHART_TYPES
+                              or not isinstance(chart.get('subgroup_size'), int)):
+        raise ValueError(f"Unknown chart in control limits: {chart!r}")
+    values = limits.get('limits')
+    missing = [k for k in _limit_keys(chart) if not isinstance(values, dict) or values.get(k) is None]
+    if missing:
+        raise ValueError(f"Control limits are missing {', '.join(missing)}")
+    for key in _limit_keys(chart):
+        value = values[key]
+        if key in _LABEL_KEYS:
+            if not isinstance(value, str):
+                raise ValueError(f"Control limit {key} must be a string, not {value!r}")
+        elif (isinstance(value, bool) or not isinstance(value, (int, float))
+              or not math.isfinite(value)):
+            raise ValueError(f"Control limit {key} must be a finite number, not {value!r}")
+    if chart is not None and (values['chart_type'] != chart['type']
+                              or values['subgroup_size'] != chart['subgroup_size']):
+        raise ValueError("Control limits don't match their chart")
+    for keys in _ORDERED_KEYS:
+        ordered = [k for k in keys if k in values and k in _limit_keys(chart)]
+        for low, high in zip(ordered, ordered[1:]):
+            if values[low] > values[high]:
+                raise ValueError(f"Control limits out of order: {low} {values[low]} > {high} {values[high]}")
+    negative = [k for k in _NON_NEGATIVE_KEYS if k in _limit_keys(chart) and values[k] < 0]
+    if negative:
+        raise ValueError(f"Control limits have negative {', '.join(negative)}")
+    source = limits.get('source')
+    if source is not None and (not isinstance(source, dict) or not isinstance(source.get('points', 0), int)
+                               or not isinstance(source.get('dataset_name', ''), (str, type(None)))):
+        raise ValueError("Invalid source in control limits")
+    return limits
+
+
+def dumps_limits(limits: dict) -> str:
+    return json.dumps(limits, indent=2)
+
+
+def loads_limits(text: str | bytes) -> dict:
+    """Parse and validate a limits object saved with `dumps_limits()`.
+
+    Raises:
+        ValueError: if `text` isn't JSON or not a valid limits object
+    """
+    try:
+        limits = json.loads(text)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Not a control limits file") from e
+    return validate_limits(limits)
+
+
+def save_limits(limits: dict, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(dumps_limits(limits))
+
+
+def load_limits(path: str) -> dict:
+    with open(path, 'rb') as f:
+        return loads_limits(f.read())
+
+
+def limits_id(limits: dict) -> str:
+    """Stable key of a limits object: the same limits always get the same
+    id, whoever froze or loaded them."""
+    hasher = content_hasher()
+    hasher.update(json.dumps([limits['chart'], limits['limits']], sort_keys=True).encode())
+    return hasher.hexdigest()
+
+
+def limits_label(limits: dict) -> str:
+    """Short description of a limits object for the UI, e.g.
+    'mean 10.02, UCL 12.9, LCL 7.1 (200 points of data.csv)'."""
+    values, source, chart = limits['limits'], limits.get('source') or {}, limits.get('chart')
+    unit = 'subgroups' if chart else 'points'
+    origin = f" ({source['points']:,} {unit} of {source['dataset_name']})" if source.get('dataset_name') else ''
+    label = f"mean {values['mean']:.4g}, UCL {values['ucl']:.4g}, LCL {values['lcl']:.4g}{origin}"
+    if chart:
+        label = f"{_CHART_NAMES[chart['type']]} n={chart['subgroup_size']}: {label}"
+    return label
+
+
+def stats_with_limits(stats: dict, limits: dict) -> dict:
+    """The stats of a dataset with its limits replaced by frozen ones.
+
+    The descriptive values of the data itself ('min', 'max', 'count', ...)
+    are kept, so the chart's axes and the stats panel still describe it.
+    """
+    return {**stats, **limits['limits']}
+
+
+def score_against_limits(df: pl.DataFrame | pl.LazyFrame, limits: dict,
+                         active_rules: dict = None) -> pl.LazyFrame:
+    """Evaluate the Nelson rules of new data against frozen limits.
+
+    No statistics of the new data are computed, only the rule flags: for
+    individual values the result is a single lazy query, to collect or to
+    stream to a file with `sink_parquet()` / `sink_csv()`. For subgroup
+    limits the observations are first reduced to subgroups of the frozen
+    size (one aggregation), and the rules apply to the subgroup means.
+
+    Args:
+        df: data with a numeric 'value' column
+        limits: a limits object
+        active_rules: as for `add_control_rules()`; all rules if None
+    Returns:
+        LazyFrame: the data (or its subgroups) with an 'index' column and the
+        Boolean 'rule_1' to 'rule_8' flags
+    """
+    chart = limits.get('chart')
+    if chart:
+        lf = subgroup_summary(df, chart['subgroup_size']).lazy()
+    else:
+        lf = df.lazy().with_row_index()
+    return lf.with_columns(control_rule_columns(limits['limits'], active_rules))
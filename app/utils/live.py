@@ -0,0 +1,83 @@
+"""
+Sources of new observations for the chart's live mode.
+
+A dataset grows in two ways, both ending in `pipeline.append_observations`,
+which stores each extended series as a new version with its own key:
+
+  * pushed through the append endpoint (`api/datasets.py`);
+  * polled from the CSV file a predefined dataset was read from, when
+    another process keeps appending rows to it.
+
+Each version points to the next one (`next:<key>` in the cache), so a chart
+showing an older version can catch up with `latest_version()`.
+"""
+
+import io
+import os
+
+import polars as pl
+
+from utils.cache import get_cache
+from utils.pipeline import append_observations
+
+# Bytes of a growing file read per poll; the rest is picked up by later polls
+LIVE_MAX_READ_BYTES = 4 * 1024 * 1024
+# Versions followed per call, in case of a pointer cycle
+_MAX_VERSIONS = 10_000
+
+
+def latest_version(dataset_key):
+    """Return the key of the newest version of a dataset (itself if nothing
+    was appended to it)."""
+    cache = get_cache()
+    for _ in range(_MAX_VERSIONS):
+        next_key = cache.get_json(f"next:{dataset_key}")
+        if next_key is None:
+            break
+        dataset_key = next_key
+    return dataset_key
+
+
+def poll_source_file(dataset_key, active_rules=None, baseline_end=0):
+    """Append the complete rows added to a dataset's source file since it
+    was read.
+
+    Only works for datasets read from a CSV file on the server (predefined
+    datasets); see `data_loader._remember_source`.
+
+    Returns:
+        str: the key of the extended dataset, or `dataset_key` if there's
+             nothing new.
+    """
+    cache = get_cache()
+    source = cache.get_json(f"source:{dataset_key}")
+    if source is None:
+        return dataset_key
+    try:
+        if os.path.getsize(source['path']) <= source['offset']:
+            return dataset_key
+        with open(source['path'], 'rb') as f:
+            f.seek(source['offset'])
+            data = f.read(LIVE_MAX_READ_BYTES)
+    except OSError:
+        return dataset_key
+
+    # Leave a partially written last line for the next poll
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return dataset_key
+    offset = source['offset'] + end
+    values = (
+        pl.read_csv(io.BytesIO(data[:end]), has_header=False, columns=[0], new_columns=['value'])
+        .select(pl.col('value').cast(pl.Float64, strict=False))
+        .drop_nulls()['value']
+    )
+    if values.is_empty():
+        cache.set_json(f"source:{dataset_key}", {'path': source['path'], 'offset': offset})
+        return dataset_key
+
+    new_key, _ = append_observations(dataset_key, values, active_rules, baseline_end)
+    if new_key is None:
+        return dataset_key
+    cache.set_json(f"source:{new_key}", {'path': source['path'], 'offset': offset})
+    return new_key
@@ -0,0 +1,512 @@
+"""
+Staged, memoized processing pipeline behind the callbacks.
+
+    load -> stats -> rules -> capability -> figure / table
+
+Time-indexed datasets can first be resampled to a period unit
+(`get_resampled`); the resampled series is then a dataset of its own, with
+a key derived from the original one (`resampled_key`).
+
+X̄-R and X̄-S charts add a subgroups stage before the stats
+(`get_subgroups`): the rules and the chart then work on the subgroup means.
+
+The stats can also use frozen limits (Phase II, see utils/limits.py)
+instead of a baseline period of the data: the baseline is then the limits'
+id (`frozen_baseline`), and the limits themselves are kept in the cache.
+
+Multi-series uploads first go through a batch stage, a summary per tag
+(`get_batch_summary`); each tag then goes through the stages above.
+
+Each stage is keyed by the inputs it actually depends on and memoized, so
+toggling a rule reuses the stats, and moving the USL/LSL slider reuses the
+stats and the rules. Data stages are memoized in the shared cache
+(`utils/cache.py`); figures, which are only useful to the process that
+serves them, in a small in-process LRU.
+
+The browser only holds small handles (the stage key plus the inputs that
+produced it), so any stage can be recomputed from its handle on a cache
+miss. Per-stage timings are logged at INFO level, and with INSTRUMENTATION
+set also reported in Server-Timing headers and /metrics.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import polars as pl
+
+from utils.cache import content_hasher, get_cache
+from utils.data_loader import get_cached_dataset
+from utils.data_processor import (SUBGROUP_CHART_TYPES, MAX_SUBGROUP_SIZE, calculate_capability,
+                                  calculate_control_stats, calculate_subgroup_stats, subgroup_summary,
+                                  add_control_rules, add_moving_range, append_control_rules,
+                                  batch_control_summary, resample, running_stats, stats_from_running,
+                                  update_running_stats)
+from utils.chart_creator import create_control_chart
+from utils.instrumentation import measure
+from utils.limits import limits_id, stats_with_limits
+from utils.slider_defaults import get_slider_defaults
+
+logger = logging.getLogger(__name__)
+
+FIGURE_MEMO_SIZE = 8
+DEFAULT_SUBGROUP_SIZE = 5
+# Period units of the toolbar's dropdown, as `group_by_dynamic` intervals
+# ('Observations' keeps the raw data)
+PERIOD_INTERVALS = {'Hours': '1h', 'Days': '1d', 'Weeks': '1w', 'Months': '1mo'}
+# Appended datasets are stored without rechunking; merge the chunks once
+# there are this many, so later queries don't slow down
+APPEND_MAX_CHUNKS = 64
+# Prefix of a baseline made of frozen limits rather than a number of points
+FROZEN_BASELINE_PREFIX = 'limits-'
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+@contextmanager
+def timed_stage(stage, key):
+    """Log how long a pipeline stage took to compute, and measure it when
+    instrumentation is on (utils/instrumentation.py)."""
+    start = time.perf_counter()
+    with measure(stage):
+        yield
+    logger.info("stage %-10s %8.1f ms  %s", stage, (time.perf_counter() - start) * 1000, key)
+
+
+def _memoized_json(stage, key, compute):
+    cache = get_cache()
+    value = cache.get_json(key)
+    if value is None:
+        with timed_stage(stage, key):
+            value = compute()
+        if value is not None:
+            cache.set_json(key, value)
+    return value
+
+
+def _memoized_frame(stage, key, compute):
+    cache = get_cache()
+    df = cache.get_frame(key)
+    if df is None:
+        with timed_stage(stage, key):
+            df = compute()
+        if df is not None:
+            cache.set_frame(key, df)
+    return df
+
+
+def rules_signature(active_rules):
+    """Compact string for the set of active rules, e.g. '1234568'."""
+    return ''.join(str(i) for i in range(1, 9) if active_rules.get(i, True)) or 'none'
+
+
+def baseline_end_from_settings(settings):
+    """End (exclusive) of the baseline period used for the stats, or 0 to
+    use all points; a frozen baseline when limits are frozen (see
+    `frozen_baseline`)."""
+    if settings.get('limits'):
+        return frozen_baseline(settings['limits'])
+    process_change_point = settings.get('process_change', 0) or 0
+    if settings.get('period_comparison_enabled', False) and process_change_point > 0:
+        return process_change_point
+    return 0
+
+
+def frozen_baseline(limits):
+    """The baseline of the stages for frozen limits, e.g. 'limits-3f2a…',
+    used wherever a baseline end would be. The limits must be in the cache
+    (`store_limits`) when the stats are computed."""
+    return FROZEN_BASELINE_PREFIX + limits_id(limits)
+
+
+def frozen_limits_id(baseline_end):
+    """The limits id of a frozen baseline, or None for a baseline period."""
+    if isinstance(baseline_end, str) and baseline_end.startswith(FROZEN_BASELINE_PREFIX):
+        return baseline_end[len(FROZEN_BASELINE_PREFIX):]
+    return None
+
+
+def store_limits(limits):
+    """Keep a limits object in the cache, so stages with its frozen
+    baseline can use it. Returns that baseline."""
+    baseline = frozen_baseline(limits)
+    get_cache().set_json(f"limits:{frozen_limits_id(baseline)}", limits)
+    return baseline
+
+
+def get_limits(limits_key):
+    """A limits object stored with `store_limits`, or None if it isn't (or
+    no longer) cached."""
+    return get_cache().get_json(f"limits:{limits_key}")
+
+
+def resample_interval(settings):
+    """The `group_by_dynamic` interval for the period unit selected in the
+    settings, or None to chart the observations as they are."""
+    return PERIOD_INTERVALS.get(settings.get('period_type'))
+
+
+def resampled_key(dataset_key, every):
+    """Dataset key of `dataset_key` resampled to periods of `every`."""
+    return f"{dataset_key}@{every}"
+
+
+def is_resampled(dataset_key):
+    return '@' in dataset_key
+
+
+def chart_from_settings(settings):
+    """The subgroup chart selected in the settings, e.g.
+    {'type': 'xbar_r', 'subgroup_size': 5}, or None for the individuals
+    (X-mR) chart."""
+    chart_type = settings.get('chart_type')
+    if chart_type not in SUBGROUP_CHART_TYPES:
+        return None
+    size = int(settings.get('subgroup_size') or DEFAULT_SUBGROUP_SIZE)
+    return {'type': chart_type, 'subgroup_size': min(max(size, 2), MAX_SUBGROUP_SIZE)}
+
+
+def chart_signature(chart):
+    """Suffix of the stage keys for a subgroup chart, e.g. ':xbar_r5'; empty
+    for the individuals chart, whose keys don't have one."""
+    return f":{chart['type']}{chart['subgroup_size']}" if chart else ''
+
+
+# --- Stages ---
+
+def get_resampled(dataset_key, every):
+    """Resample stage: a time-indexed dataset aggregated into periods of
+    `every` (see `data_processor.resample`), one row per period.
+
+    Cached under `resampled_key(dataset_key, every)` like any dataset, so
+    switching back to a period unit reuses it, and every later stage works
+    on it as on an uploaded dataset.
+
+    Returns None if the dataset is no longer available or has no
+    'timestamp' column.
+    """
+    def compute():
+        df = get_cached_dataset(dataset_key)
+        if df is None or 'timestamp' not in df.columns:
+            return None
+        return resample(df, every)
+
+    return _memoized_frame('resample', resampled_key(dataset_key, every), compute)
+
+
+def get_dataset(dataset_key):
+    """The dataset for a key: a cached dataset, or a resampled one, which
+    is recomputed from its source if it was evicted."""
+    source_key, _, every = dataset_key.partition('@')
+    if every:
+        return get_resampled(source_key, every)
+    return get_cached_dataset(dataset_key)
+
+
+def load_dataset(dataset_key):
+    """Load stage: the parsed dataset with an 'index' column, or None if it
+    is no longer cached."""
+    with timed_stage('load', dataset_key):
+        df = get_dataset(dataset_key)
+        return None if df is None else df.with_row_index()
+
+
+def get_subgroups(dataset_key, subgroup_size):
+    """Subgroups stage: the dataset reduced to one row per subgroup of
+    `subgroup_size` consecutive points (see `subgroup_summary`). For a
+    resampled dataset, the periods are the subgroups instead.
+
+    Returns None if the dataset is no longer available.
+    """
+    def compute():
+        df = get_dataset(dataset_key)
+        if df is None:
+            return None
+        if is_resampled(dataset_key):
+            # The periods already have the subgroup columns
+            return df.filter(pl.col('size') >= 2).with_row_index()
+        return subgroup_summary(df, subgroup_size)
+
+    return _memoized_frame('subgroups', f"subgroups:{dataset_key}:{subgroup_size}", compute)
+
+
+def get_stats(dataset_key, baseline_end=0, chart=None):
+    """Stats stage: control stats computed over the baseline period (the
+    points before `baseline_end`) when it is set, or over all points.
+
+    For a subgroup chart (see `chart_from_settings`) the stats are those of
+    the subgroups, and `baseline_end` counts subgroups. For a frozen
+    baseline (`frozen_baseline`) the limits are the frozen ones, and only
+    the descriptive stats (min, max, count...) come from the data.
+
+    Returns None if the dataset (or the frozen limits) is no longer available.
+    """
+    def compute():
+        limits_key = frozen_limits_id(baseline_end)
+        if limits_key:
+            limits = get_limits(limits_key)
+            stats = None if limits is None else get_stats(dataset_key, 0, chart)
+            return None if stats is None else stats_with_limits(stats, limits)
+        if chart:
+            subgroups = get_subgroups(dataset_key, chart['subgroup_size'])
+            if subgroups is None:
+                return None
+            lf = subgroups.lazy()
+            if baseline_end:
+                lf = lf.filter(pl.col("index") < baseline_end)
+            return calculate_subgroup_stats(lf, chart['type'])
+        df = get_dataset(dataset_key)
+        if df is None:
+            return None
+        lf = df.lazy()
+        if baseline_end:
+            lf = lf.with_row_index().filter(pl.col("index") < baseline_end)
+        return calculate_control_stats(lf)
+
+    return _memoized_json('stats', f"stats:{dataset_key}:{baseline_end}{chart_signature(chart)}", compute)
+
+
+def get_rules(dataset_key, baseline_end, active_rules, chart=None):
+    """Rules stage: the dataset (or, for a subgroup chart, its subgroups)
+    with the Nelson rule flag columns.
+
+    Returns None if the dataset is no longer available.
+    """
+    def compute():
+        stats = get_stats(dataset_key, baseline_end, chart)
+        df = get_subgroups(dataset_key, chart['subgroup_size']) if chart else load_dataset(dataset_key)
+        if df is None or stats is None:
+            return None
+        return add_control_rules(df, stats, active_rules)
+
+    key = f"flags:{dataset_key}:{baseline_end}:{rules_signature(active_rules)}{chart_signature(chart)}"
+    return _memoized_frame('rules', key, compute)
+
+
+def spec_limits(stats, settings):
+    """Return the (usl, lsl) to use: the user's slider values, or defaults
+    based on the data range."""
+    defaults = get_slider_defaults((stats['min'], stats['max']))
+    return settings.get('usl', defaults['usl']), settings.get('lsl', defaults['lsl'])
+
+
+def get_capability(dataset_key, baseline_end, usl, lsl, chart=None):
+    """Capability stage: Cp/Cpk for the given specification limits, or None
+    if they can't be computed."""
+    def compute():
+        stats = get_stats(dataset_key, baseline_end, chart)
+        if stats is None:
+            return None
+        # Wrapped so a legitimately missing capability is still memoized
+        return {'capability': calculate_capability(stats['mean'], stats['std_dev'], usl, lsl)}
+
+    key = f"capability:{dataset_key}:{baseline_end}:{usl}:{lsl}{chart_signature(chart)}"
+    result = _memoized_json('capability', key, compute)
+    return result['capability'] if result else None
+
+
+def extend_rules(dataset_key, new_key, baseline_end, active_rules, new_values=None):
+    """Rules stage for `new_key`, a dataset made by appending observations
+    to `dataset_key`.
+
+    When the rules for `dataset_key` are cached, only the appended points
+    are evaluated, against the stats of `new_key` (see
+    `append_control_rules`), and the earlier points keep their flags. When
+    the limits move with the appended points (limits over all points), each
+    flag therefore reflects the limits at the time its point arrived, as on
+    a chart watched live. If these rules are evicted, `get_rules` evaluates
+    every point against the current limits instead.
+
+    Otherwise this is `get_rules(new_key, ...)`. `new_values`, the appended
+    values, saves reading them back from the cache.
+    """
+    cache = get_cache()
+    signature = rules_signature(active_rules)
+    key = f"flags:{new_key}:{baseline_end}:{signature}"
+    rules = cache.get_frame(key)
+    if rules is not None:
+        return rules
+    old_key = f"flags:{dataset_key}:{baseline_end}:{signature}"
+    old_rules = cache.get_frame(old_key)
+    if old_rules is not None and new_values is None:
+        df = get_cached_dataset(new_key)
+        new_values = None if df is None else df['value'].slice(old_rules.height)
+    stats = get_stats(new_key, baseline_end)
+    if old_rules is None or new_values is None or stats is None:
+        return get_rules(new_key, baseline_end, active_rules)
+    with timed_stage('rules+', key):
+        rules = append_control_rules(old_rules, new_values, stats, active_rules)
+        if rules.n_chunks() > APPEND_MAX_CHUNKS:
+            rules = rules.rechunk()
+    cache.set_extended_frame(key, rules, old_key, old_rules.height)
+    return rules
+
+
+def append_observations(dataset_key, values, active_rules=None, baseline_end=0):
+    """Append new observations to a cached dataset without reprocessing it.
+
+    The result is stored as a new dataset (its key chains the old key with
+    the new values), so handles pointing at the old data stay valid. The
+    stats over all points are updated from running accumulators, and if the
+    rules stage for (`baseline_end`, `active_rules`) is cached for the old
+    dataset, only the new points are evaluated (see `extend_rules`): the
+    work is then proportional to the number of new values, not to the length
+    of the series. The new points are judged by the updated limits; the
+    earlier ones keep the flags they had.
+
+    Args:
+        dataset_key: key of the cached dataset to extend.
+        values: the new observations (numbers).
+        active_rules: as for `add_control_rules()`; all rules if None.
+        baseline_end: as for `get_stats()`; frozen limits must be cached.
+    Returns:
+        tuple: (new dataset_key, DataFrame of the new rows with their rule
+               flags), or (None, None) if `dataset_key` is no longer cached.
+    """
+    if active_rules is None:
+        active_rules = {i: True for i in range(1, 9)}
+    cache = get_cache()
+    df = get_cached_dataset(dataset_key)
+    if df is None:
+        return None, None
+    new_values = pl.Series('value', values, dtype=pl.Float64)
+
+    with timed_stage('append', dataset_key):
+        hasher = content_hasher()
+        hasher.update(dataset_key.encode())
+        hasher.update(new_values.to_numpy().tobytes())
+        new_key = hasher.hexdigest()
+
+        combined = pl.concat([df, new_values.to_frame()], how='diagonal', rechunk=False)
+        if combined.n_chunks() > APPEND_MAX_CHUNKS:
+            combined = combined.rechunk()
+        cache.set_extended_frame(new_key, combined, dataset_key, df.height)
+
+        running = cache.get_json(f"running:{dataset_key}") or running_stats(df['value'])
+        running = update_running_stats(running, new_values)
+        cache.set_json(f"running:{new_key}", running)
+        if not baseline_end:
+            cache.set_json(f"stats:{new_key}:0", stats_from_running(running))
+        elif frozen_limits_id(baseline_end):
+            # Frozen limits don't move: only the totals around them change
+            limits = get_limits(frozen_limits_id(baseline_end))
+            if limits is not None:
+                cache.set_json(f"stats:{new_key}:{baseline_end}",
+                               stats_with_limits(stats_from_running(running), limits))
+        elif baseline_end <= df.height:
+            # The baseline is all old points, so its stats don't change
+            cache.set_json(f"stats:{new_key}:{baseline_end}", get_stats(dataset_key, baseline_end))
+
+        rules = extend_rules(dataset_key, new_key, baseline_end, active_rules, new_values)
+        # Lets viewers of the old version find the new one (see utils/live.py)
+        cache.set_json(f"next:{dataset_key}", new_key)
+
+    return new_key, rules.tail(new_values.len())
+
+
+def get_batch_summary(batch_key, active_rules):
+    """Batch stage: stats and violation counts per tag of a multi-series
+    upload (see `data_loader.load_batch_file`), most violations first.
+
+    Returns None if the batch is no longer cached.
+    """
+    def compute():
+        df = get_cached_dataset(batch_key)
+        return None if df is None else batch_control_summary(df, active_rules)
+
+    return _memoized_frame('batch', f"summary:{batch_key}:{rules_signature(active_rules)}", compute)
+
+
+# --- Handles stored in the browser ---
+
+def stats_handle(dataset_key, baseline_end, chart=None):
+    return {
+        'key': f"stats:{dataset_key}:{baseline_end}{chart_signature(chart)}",
+        'dataset_key': dataset_key,
+        'baseline_end': baseline_end,
+        'chart': chart,
+    }
+
+
+def rules_handle(dataset_key, baseline_end, active_rules, rows, chart=None):
+    """Handle for `processed-data-store`; a few bytes regardless of the
+    number of rows (points of the chart: observations or subgroups)."""
+    return {
+        'key': f"flags:{dataset_key}:{baseline_end}:{rules_signature(active_rules)}{chart_signature(chart)}",
+        'dataset_key': dataset_key,
+        'baseline_end': baseline_end,
+        'active_rules': [i for i in range(1, 9) if active_rules.get(i, True)],
+        'rows': rows,
+        'chart': chart,
+    }
+
+
+def capability_handle(dataset_key, baseline_end, usl, lsl, capability, chart=None):
+    return {
+        'key': f"capability:{dataset_key}:{baseline_end}:{usl}:{lsl}{chart_signature(chart)}",
+        'usl': usl,
+        'lsl': lsl,
+        'capability': capability,
+    }
+
+
+def handle_active_rules(handle):
+    return {i: i in handle['active_rules'] for i in range(1, 9)}
+
+
+def load_processed_data(handle):
+    """Resolve a `processed-data-store` handle to the rule-evaluated DataFrame.
+
+    Returns None if the dataset itself is no longer available.
+    """
+    if not handle or handle.get('missing'):
+        return None
+    return get_rules(handle['dataset_key'], handle['baseline_end'], handle_active_rules(handle),
+                     handle.get('chart'))
+
+
+def figure_key(processed_handle, capability, chart_settings):
+    """Identity of the figure `get_figure()` builds for these handles."""
+    return json.dumps([processed_handle['key'], capability['key'], chart_settings], sort_keys=True)
+
+
+def clear_figures():
+    """Drop the figures memoized in this process (e.g. to time a cold run)."""
+    with _figures_lock:
+        _figures.clear()
+
+
+def get_figure(processed_handle, capability, chart_settings):
+    """Figure stage: the control chart for a rules handle, capability handle
+    and chart settings (period_type, y_axis_label, process_change).
+
+    Returns None if the dataset is no longer available.
+    """
+    key = figure_key(processed_handle, capability, chart_settings)
+    with _figures_lock:
+        fig = _figures.get(key)
+        if fig is not None:
+            _figures.move_to_end(key)
+            return fig
+
+    chart = processed_handle.get('chart')
+    df_with_rules = load_processed_data(processed_handle)
+    stats = get_stats(processed_handle['dataset_key'], processed_handle['baseline_end'], chart)
+    if df_with_rules is None or stats is None:
+        return None
+    with timed_stage('figure', processed_handle['key']):
+        # Subgroup charts plot the subgroup ranges or standard deviations instead
+        df_plotted = df_with_rules if chart else add_moving_range(df_with_rules)
+        fig = create_control_chart(df_plotted, stats, capability['capability'] or {},
+                                   handle_active_rules(processed_handle), chart_settings,
+                                   capability['usl'], capability['lsl'],
+                                   chart_settings.get('process_change'))
+
+    with _figures_lock:
+        _figures[key] = fig
+        while len(_figures) > FIGURE_MEMO_SIZE:
+            _figures.popitem(last=False)
+    return fig
@@ -0,0 +1,139 @@
+"""
+Batch evaluation of dataset files, for the `evaluate` command of app/cli.py.
+
+Each file is read with `data_loader.read_dataset_file` (the same parsing as
+an upload: first numeric column, or a value and a timestamp column) and
+evaluated like a single upload: control stats over all points or a
+baseline, or frozen limits (utils/limits.py), the Nelson rules and the
+capability. Only a summary row per file is kept, and optionally the per-row
+flags are written as a `rules_<name>.csv` file, the same as the app's
+"Download Data with Rules".
+
+Files are evaluated in a pool of processes, one file per task. The workers
+are started with 'spawn' (Polars doesn't survive a fork of a process that
+has used it) and each runs Polars single-threaded, so the pool rather than
+Polars spreads the work over the cores.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import polars as pl
+
+from utils.data_loader import read_dataset_file
+from utils.data_processor import (add_control_rules, calculate_capability, calculate_control_stats,
+                                  rule_flag_labels)
+from utils.limits import score_against_limits, stats_with_limits
+
+# Columns of the report, one row per file
+REPORT_SCHEMA = {
+    'file': pl.String,
+    'rows': pl.Int64,
+    'mean': pl.Float64,
+    'std_dev': pl.Float64,
+    'min': pl.Float64,
+    'max': pl.Float64,
+    'lcl': pl.Float64,
+    'ucl': pl.Float64,
+    'mr_avg': pl.Float64,
+    'cp': pl.Float64,
+    'cpk': pl.Float64,
+    'violations': pl.Int64,
+    **{f'rule_{i}': pl.Int64 for i in range(1, 9)},
+    'error': pl.String,
+}
+RULE_COLUMNS = [f'rule_{i}' for i in range(1, 9)]
+
+
+def rules_csv_name(file_path):
+    """Name of the per-row output of a file, as the app's download names it:
+    'rules_' + the file name, ending in '.csv'."""
+    filename = "rules_" + os.path.basename(file_path)
+    if not filename.lower().endswith('.csv'):
+        filename += '.csv'
+    return filename
+
+
+def evaluate_file(file_path, active_rules=None, usl=None, lsl=None, baseline_end=0, limits=None,
+                  rules_dir=None):
+    """Evaluate one dataset file and summarize it as a report row.
+
+    Args:
+        file_path: the file to read
+        active_rules: as for `add_control_rules()`; all rules if None
+        usl, lsl: specification limits for Cp/Cpk (none if either is None)
+        baseline_end: compute the limits over the first points only (0: all)
+        limits: frozen limits to judge the file against instead of its own
+            (individuals chart limits); `baseline_end` is then ignored
+        rules_dir: if given, write the per-row rule flags there as
+            `rules_csv_name(file_path)`
+    Returns:
+        dict: a row of REPORT_SCHEMA; 'error' says why a file couldn't be
+        read or evaluated (its other values are then None)
+    """
+    row = {'file': file_path}
+    try:
+        df = read_dataset_file(file_path)
+    except Exception as e:
+        return {**row, 'error': f"unreadable: {e}"}
+    if df is None:
+        return {**row, 'error': "no numeric data (at least 2 values needed)"}
+
+    try:
+        if limits is not None:
+            stats = stats_with_limits(calculate_control_stats(df), limits)
+            df_with_rules = score_against_limits(df, limits, active_rules).collect()
+        else:
+            df = df.with_row_index()
+            baseline = df.lazy().filter(pl.col('index') < baseline_end) if baseline_end else df
+            stats = calculate_control_stats(baseline)
+            df_with_rules = add_control_rules(df, stats, active_rules)
+        capability = calculate_capability(stats['mean'], stats['std_dev'], usl, lsl) or {}
+
+        counts = df_with_rules.select(pl.any_horizontal(RULE_COLUMNS).sum().alias('violations'),
+                                      pl.col(RULE_COLUMNS).sum()).row(0, named=True)
+        if rules_dir is not None:
+            rule_flag_labels(df_with_rules).write_csv(os.path.join(rules_dir, rules_csv_name(file_path)))
+    except Exception as e:
+        return {**row, 'error': f"evaluation failed: {e}"}
+    return {
+        **row, 'rows': df.height,
+        **{k: stats[k] for k in ('mean', 'std_dev', 'min', 'max', 'lcl', 'ucl', 'mr_avg')},
+        'cp': capability.get('cp'), 'cpk': capability.get('cpk'),
+        **counts, 'error': None,
+    }
+
+
+def _init_worker():
+    # Read when the worker first runs a Polars query: one thread each, unless
+    # set otherwise for the whole run
+    os.environ.setdefault('POLARS_MAX_THREADS', '1')
+
+
+def evaluate_files(file_paths, workers=None, **options):
+    """Evaluate many files (see `evaluate_file` for the options), in a pool of
+    `workers` processes (default: one per core; 1 runs them in this
+    process).
+
+    Yields:
+        report rows, as the files are done
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(file_paths) < 2:
+        for file_path in file_paths:
+            yield evaluate_file(file_path, **options)
+        return
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(file_paths)), mp_context=context,
+                             initializer=_init_worker) as pool:
+        futures = [pool.submit(evaluate_file, file_path, **options) for file_path in file_paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def build_report(rows):
+    """The report DataFrame (REPORT_SCHEMA) of `evaluate_file` rows, sorted by
+    file name."""
+    return pl.DataFrame(list(rows), schema=REPORT_SCHEMA).sort('file')
@@ -0,0 +1,144 @@
+"""
+Server-side paging, sorting and filtering for the data table.
+
+The DataTable runs with page_action/sort_action/filter_action='custom', so
+the browser only ever receives the rows of the page on screen. This module
+translates the table's sort_by and filter_query into Polars expressions and
+slices out the requested page.
+
+Rule flags are Boolean columns; they are shown, filtered and sorted as
+their "Broken"/"OK" labels, and only the rows of the page are converted.
+Timestamps are shown and filtered as TIMESTAMP_FORMAT text.
+"""
+
+import polars as pl
+
+from utils.data_processor import rule_flag_label
+
+# How timestamps are shown in the table; sorts like the timestamps themselves
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Dash filter operators, longest first so '>=' isn't read as '>'
+_OPERATORS = [
+    ('ge', ['ge ', '>=']),
+    ('le', ['le ', '<=']),
+    ('lt', ['lt ', '<']),
+    ('gt', ['gt ', '>']),
+    ('ne', ['ne ', '!=']),
+    ('eq', ['eq ', '=']),
+    ('contains', ['contains ']),
+    ('datestartswith', ['datestartswith ']),
+]
+
+
+def _split_filter_part(filter_part):
+    """Split one clause like '{value} s> 100' into ('value', 'gt', 100.0)."""
+    for operator, spellings in _OPERATORS:
+        for spelling in spellings:
+            if spelling in filter_part:
+                name_part, value_part = filter_part.split(spelling, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+                value_part = value_part.strip()
+                if not value_part:
+                    return None, None, None
+                quote = value_part[0]
+                if quote == value_part[-1] and quote in ("'", '"', '`') and len(value_part) > 1:
+                    value = value_part[1:-1].replace('\\' + quote, quote)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+                return name, operator, value
+    return None, None, None
+
+
+def _display_column(name, schema):
+    """The column as shown in the table (rule flags as their labels,
+    timestamps as text)."""
+    if schema[name] == pl.Boolean:
+        return rule_flag_label(pl.col(name))
+    if schema[name] == pl.Datetime:
+        return pl.col(name).dt.to_string(TIMESTAMP_FORMAT)
+    return pl.col(name)
+
+
+def _clause_expression(name, operator, value, schema):
+    column = _display_column(name, schema)
+    if operator == 'contains':
+        return column.cast(pl.Utf8).str.contains(str(value), literal=True)
+    if operator == 'datestartswith':
+        return column.cast(pl.Utf8).str.starts_with(str(value))
+
+    numeric = schema[name].is_numeric()
+    if numeric and isinstance(value, str):
+        # e.g. "value = abc": nothing can match
+        return pl.lit(False)
+    if not numeric:
+        value = str(value if not isinstance(value, float) or not value.is_integer() else int(value))
+    return {
+        'eq': column == value,
+        'ne': column != value,
+        'lt': column < value,
+        'le': column <= value,
+        'gt': column > value,
+        'ge': column >= value,
+    }[operator]
+
+
+def filter_expression(filter_query, schema):
+    """Translate a DataTable filter_query into a Polars expression.
+
+    Clauses on unknown columns or that can't be parsed are ignored. Returns
+    None if there is nothing to filter on.
+    """
+    if not filter_query:
+        return None
+    expressions = []
+    for part in filter_query.split(' && '):
+        name, operator, value = _split_filter_part(part)
+        if name in schema:
+            expressions.append(_clause_expression(name, operator, value, schema))
+    if not expressions:
+        return None
+    return pl.all_horizontal(expressions)
+
+
+def get_table_page(df: pl.DataFrame, page_current=0, page_size=100, sort_by=None,
+                   filter_query=None, violation_cols=None):
+    """Return one page of the table.
+
+    Args:
+        df: DataFrame to page through
+        page_current: Zero-based page number
+        page_size: Rows per page
+        sort_by: DataTable sort_by list, e.g. [{'column_id': 'value', 'direction': 'desc'}]
+        filter_query: DataTable filter_query string
+        violation_cols: If given, only keep rows where any of these rule
+                        (Boolean) columns is set
+    Returns:
+        tuple: (list of row dicts for the page, number of rows after filtering,
+                the page number actually served)
+    """
+    query = df.lazy()
+    predicate = filter_expression(filter_query, df.schema)
+    if predicate is not None:
+        query = query.filter(predicate)
+    if violation_cols is not None:
+        if not violation_cols:
+            query = query.filter(pl.lit(False))
+        else:
+            query = query.filter(pl.any_horizontal(violation_cols))
+    sort_by = [s for s in (sort_by or []) if s.get('column_id') in df.schema]
+    if sort_by:
+        query = query.sort([_display_column(s['column_id'], df.schema) for s in sort_by],
+                           descending=[s['direction'] == 'desc' for s in sort_by],
+                           maintain_order=True)
+
+    filtered = query.collect()
+    # Clamp to the last page, e.g. after a filter made the table shorter
+    last_page = max((filtered.height - 1) // page_size, 0)
+    page_current = min(page_current or 0, last_page)
+    page = filtered.slice(page_current * page_size, page_size)
+    page = page.select(_display_column(name, page.schema).alias(name) for name in page.columns)
+    return page.to_dicts(), filtered.height, page_current
@@ -0,0 +1,86 @@
+"""
+Benchmark: dataset load time per input format.
+
+Writes the same series (a float 'value' column plus a timestamp and a tag
+column, like a historian export) as CSV, Parquet, Arrow IPC, Arrow IPC
+stream and NDJSON, and times `load_uploaded_file` on each with a cold
+dataset cache: format detection, hashing, reading the first column and
+validation. The last column times `load_predefined_dataset` on the CSV once
+its memory-mapped Arrow sidecar exists.
+
+Every timing includes summing the column, so lazily memory-mapped data is
+actually paged in. Best of 3 runs.
+
+Run from the repo root:
+    python benchmarks/bench_load_formats.py [row counts...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import polars as pl
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from utils import data_loader  # noqa: E402
+from utils.cache import get_cache  # noqa: E402
+
+DEFAULT_ROWS = [100_000, 1_000_000, 10_000_000]
+REPEAT = 3
+
+FORMATS = {
+    'csv': ('.csv', lambda df, path: df.write_csv(path)),
+    'parquet': ('.parquet', lambda df, path: df.write_parquet(path)),
+    'ipc': ('.arrow', lambda df, path: df.write_ipc(path)),
+    'ipc_stream': ('.arrows', lambda df, path: df.write_ipc_stream(path)),
+    'ndjson': ('.ndjson', lambda df, path: df.write_ndjson(path)),
+}
+
+
+def make_series(rows):
+    rng = np.random.default_rng(0)
+    return pl.DataFrame({
+        'value': rng.normal(100, 5, rows).round(4),
+        'timestamp': np.datetime64('2024-01-01', 'ms') + np.arange(rows).astype('timedelta64[s]'),
+        'tag': np.full(rows, 'FIC-101.PV'),
+    })
+
+
+def best_of(load):
+    times = []
+    for _ in range(REPEAT):
+        get_cache().clear()
+        start = time.perf_counter()
+        _, df = load()
+        df['value'].sum()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(row_counts):
+    columns = list(FORMATS) + ['csv+sidecar']
+    print(f"{'rows':>11} " + ' '.join(f"{name:>12}" for name in columns) + "   (seconds)")
+    with tempfile.TemporaryDirectory() as tmp:
+        data_loader.DATA_DIR = tmp
+        for rows in row_counts:
+            df = make_series(rows)
+            results = []
+            for name, (extension, write) in FORMATS.items():
+                path = os.path.join(tmp, f'series{extension}')
+                write(df, path)
+                results.append(best_of(lambda: data_loader.load_uploaded_file(path)))
+                if name != 'csv':
+                    os.remove(path)
+            data_loader.build_sidecar(os.path.join(tmp, 'series.csv'))
+            results.append(best_of(lambda: data_loader.load_predefined_dataset('series.csv')))
+            print(f"{rows:>11,} " + ' '.join(f"{t:>12.3f}" for t in results))
+            for name in os.listdir(tmp):
+                os.remove(os.path.join(tmp, name))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_ROWS)
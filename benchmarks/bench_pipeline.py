@@ -0,0 +1,200 @@
+"""
+Benchmark: the data -> rules -> figure pipeline, stage by stage.
+
+For each synthetic pattern (see synthetic.py: in-control, shifted, trending,
+alternating) and series length, times:
+
+  * parse_csv:        `data_loader.parse_csv` on the base64 data URI of a CSV
+                      upload, with a cold dataset cache
+  * control_stats:    `calculate_control_stats`
+  * control_rules:    `add_control_rules`, all 8 rules
+  * moving_range:     `add_moving_range`
+  * control_chart:    `create_control_chart` (downsampled, as by default)
+  * to_json:          the figure's `to_json()`, as Dash serializes it
+  * callbacks:        what the stage callbacks do for a new upload, from a
+                      cold cache: the stats, rules, capability and figure
+                      stages (`utils.pipeline`), the stats panel, the first
+                      table page and the figure's JSON
+
+Each timing is the best of `--repeat` runs. The results are written as JSON
+(by default to benchmarks/results/, which git ignores), with the versions
+and machine they were measured on. Pass an earlier file with `--compare` to
+print the change per stage; timings more than `--threshold` times slower
+are reported as regressions and make the script exit with status 1.
+
+Run from the repo root:
+    python benchmarks/bench_pipeline.py [--sizes 1000 100000 1000000] [--patterns shifted]
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/<earlier run>.json
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# The cache must hold the largest series, and its figures stay in this process
+os.environ.setdefault('CACHE_BACKEND', 'memory')
+os.environ.setdefault('CACHE_MAX_BYTES', str(4 * 1024 ** 3))
+
+import dash  # noqa: E402
+import plotly  # noqa: E402
+import polars as pl  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'app'))
+
+from synthetic import GENERATORS, make_series  # noqa: E402
+from utils.cache import get_cache  # noqa: E402
+from utils.chart_creator import create_control_chart, make_stats_panel  # noqa: E402
+from utils.data_loader import parse_csv  # noqa: E402
+from utils.data_processor import (add_control_rules, add_moving_range, calculate_capability,  # noqa: E402
+                                  calculate_control_stats)
+from utils.pipeline import (capability_handle, clear_figures, get_capability, get_figure,  # noqa: E402
+                            get_rules, get_stats, rules_handle, spec_limits)
+from utils.table_query import get_table_page  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+STAGES = ['parse_csv', 'control_stats', 'control_rules', 'moving_range', 'control_chart', 'to_json',
+          'callbacks']
+ALL_RULES = {i: True for i in range(1, 9)}
+# The defaults of update_chart_settings()
+CHART_SETTINGS = {'period_type': 'Observation', 'y_axis_label': 'Individual Values', 'process_change': None,
+                  'full_resolution': False}
+
+
+def best_of(repeat, fn, setup=None):
+    """Best time of `repeat` calls of `fn` (after `setup()`, untimed), and
+    the last result."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_callbacks(dataset_key):
+    """The work of the stage callbacks for a freshly loaded dataset."""
+    stats = get_stats(dataset_key)
+    df_with_rules = get_rules(dataset_key, 0, ALL_RULES)
+    usl, lsl = spec_limits(stats, {})
+    capability = capability_handle(dataset_key, 0, usl, lsl, get_capability(dataset_key, 0, usl, lsl))
+    processed = rules_handle(dataset_key, 0, ALL_RULES, df_with_rules.height)
+    fig = get_figure(processed, capability, CHART_SETTINGS)
+    make_stats_panel(stats, capability['capability'])
+    get_table_page(df_with_rules.drop('index'))
+    return fig.to_json()
+
+
+def bench_series(pattern, n, repeat):
+    """Timings in seconds of every stage for one series."""
+    df = make_series(pattern, n)
+    contents = 'data:text/csv;base64,' + base64.b64encode(df.write_csv().encode()).decode()
+    cache = get_cache()
+    timings = {}
+
+    timings['parse_csv'], (dataset_key, parsed) = best_of(repeat, lambda: parse_csv(contents), cache.clear)
+    del contents
+    df = parsed.with_row_index()
+    timings['control_stats'], stats = best_of(repeat, lambda: calculate_control_stats(df))
+    timings['control_rules'], df_with_rules = best_of(repeat, lambda: add_control_rules(df, stats, ALL_RULES))
+    timings['moving_range'], df_plotted = best_of(repeat, lambda: add_moving_range(df_with_rules))
+    capability = calculate_capability(stats['mean'], stats['std_dev'], stats['ucl'], stats['lcl'])
+    timings['control_chart'], fig = best_of(repeat, lambda: create_control_chart(
+        df_plotted, stats, capability, ALL_RULES, CHART_SETTINGS, stats['ucl'], stats['lcl']))
+    timings['to_json'], _ = best_of(repeat, fig.to_json)
+
+    def cold_cache():
+        cache.clear()
+        clear_figures()
+        cache.set_frame(dataset_key, parsed)
+    timings['callbacks'], _ = best_of(repeat, lambda: run_callbacks(dataset_key), cold_cache)
+    return timings
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'polars': pl.__version__,
+        'plotly': plotly.__version__,
+        'dash': dash.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpus': os.cpu_count(),
+        'polars_threads': pl.thread_pool_size(),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Print the change of each timing against an earlier results file.
+
+    Returns:
+        int: the number of regressions (slower by more than `threshold` times)
+    """
+    with open(baseline_path) as f:
+        baseline = {(r['pattern'], r['points'], r['stage']): r['seconds'] for r in json.load(f)['results']}
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (regression: more than {threshold:.2f}x slower)")
+    print(f"{'pattern':>12} {'points':>11} {'stage':>14} {'before (ms)':>12} {'now (ms)':>10} {'change':>8}")
+    for r in results:
+        before = baseline.get((r['pattern'], r['points'], r['stage']))
+        if before is None:
+            continue
+        ratio = r['seconds'] / before if before else float('inf')
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{r['pattern']:>12} {r['points']:>11,} {r['stage']:>14} {before * 1000:>12.1f} "
+              f"{r['seconds'] * 1000:>10.1f} {ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="series lengths")
+    parser.add_argument('--patterns', nargs='+', choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument('--repeat', type=int, default=3, help="runs per timing (best is kept)")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/pipeline_<date>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare with")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="slowdown ratio reported as a regression (default: 1.25)")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'pattern':>12} {'points':>11} " + ' '.join(f"{stage:>13}" for stage in STAGES) + "   (ms)")
+    for pattern in args.patterns:
+        for n in args.sizes:
+            timings = bench_series(pattern, n, args.repeat)
+            print(f"{pattern:>12} {n:>11,} " + ' '.join(f"{timings[s] * 1000:>13.1f}" for s in STAGES))
+            results.extend({'pattern': pattern, 'points': n, 'stage': stage, 'seconds': timings[stage],
+                            'repeat': args.repeat} for stage in STAGES)
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', f"pipeline_{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'benchmark': 'pipeline', 'environment': environment(), 'results': results}, f, indent=1)
+    print(f"\nResults written to {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Benchmark: peak memory of parsing an uploaded CSV.
+
+Compares the old `parse_csv` (split the data URI, base64-decode the whole
+payload, decode it to a `str`, parse from `StringIO`) with the current one
+(chunked base64 decoding into a bytes buffer, or a temporary file for large
+uploads) on 10 MB, 100 MB and 500 MB files.
+
+Each measurement runs in a fresh subprocess. The reported number is the peak
+RSS while parsing, minus the RSS with just the data URI string loaded, i.e.
+the memory the parser itself needs on top of the request payload.
+
+Run from the repo root:
+    python benchmarks/bench_upload_memory.py [sizes in MB...]
+"""
+
+import base64
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import polars as pl
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+DEFAULT_SIZES_MB = [10, 100, 500]
+
+
+def parse_csv_before(contents):
+    """The previous implementation, kept here as the baseline."""
+    content_string = contents.split(',')[1]
+    decoded = base64.b64decode(content_string).decode('utf-8')
+    return pl.read_csv(io.StringIO(decoded), columns=[0])
+
+
+def parse_csv_after(contents):
+    from utils.data_loader import parse_csv
+    return parse_csv(contents)[1]
+
+
+def _rss_kb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def _reset_peak():
+    # Linux: writing 5 to clear_refs resets VmHWM (the peak RSS)
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def write_data_uri(size_mb, path):
+    """Write a data URI for a one-column CSV of about `size_mb` MB to `path`."""
+    rows = size_mb * 1024 * 1024 // 9  # '123.4567\n'
+    rng = np.random.default_rng(0)
+    with open(path, 'w') as out:
+        out.write('data:text/csv;base64,')
+        # Encode in blocks of a multiple of 3 bytes so the pieces concatenate
+        pending = b'value\n'
+        chunk_rows = 1_000_000
+        for start in range(0, rows, chunk_rows):
+            values = rng.uniform(100, 999, min(chunk_rows, rows - start))
+            block = pending + ('\n'.join(f'{v:.4f}' for v in values) + '\n').encode()
+            cut = len(block) - len(block) % 3
+            out.write(base64.b64encode(block[:cut]).decode())
+            pending = block[cut:]
+        out.write(base64.b64encode(pending).decode())
+
+
+def child(implementation, uri_path):
+    with open(uri_path) as f:
+        contents = f.read()
+    parse = parse_csv_before if implementation == 'before' else parse_csv_after
+    base_kb = _rss_kb('VmRSS')
+    if not _reset_peak():
+        base_kb = _rss_kb('VmHWM')
+    start = time.perf_counter()
+    df = parse(contents)
+    elapsed = time.perf_counter() - start
+    peak_kb = _rss_kb('VmHWM')
+    print(f"{(peak_kb - base_kb) / 1024:.0f} {elapsed:.2f} {df.height}")
+
+
+def main(sizes_mb):
+    print(f"{'upload':>8} {'before: peak (MB)':>18} {'time (s)':>9} {'after: peak (MB)':>17} {'time (s)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in sizes_mb:
+            uri_path = os.path.join(tmp, f'{size_mb}.uri')
+            write_data_uri(size_mb, uri_path)
+            results = []
+            for implementation in ('before', 'after'):
+                out = subprocess.run(
+                    [sys.executable, __file__, '--child', implementation, uri_path],
+                    capture_output=True, text=True, check=True).stdout.split()
+                results.append((float(out[0]), float(out[1]), int(out[2])))
+            assert results[0][2] == results[1][2], "implementations disagree on row count"
+            (before_mb, before_s, _), (after_mb, after_s, _) = results
+            print(f"{size_mb:>6}MB {before_mb:>18,.0f} {before_s:>9.2f} {after_mb:>17,.0f} {after_s:>9.2f}")
+            os.remove(uri_path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES_MB)
@@ -0,0 +1,76 @@
+"""
+Benchmark: building the rule-violation markers of the X-chart.
+
+Compares the columnar `rule_violation_markers()` with the row-by-row loop
+`create_control_chart` used before, on random series of 10k, 100k and 1M
+points.
+
+Run from the repo root:
+    python benchmarks/bench_violation_markers.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from utils.chart_creator import RULE_DESCRIPTIONS, rule_violation_markers  # noqa: E402
+from utils.data_processor import calculate_control_stats, add_control_rules  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000]
+REPEATS = 3
+
+
+def markers_loop(df, active_rules):
+    """The previous implementation, kept here as the baseline."""
+    indices, values, hover_texts, marker_colors = [], [], [], []
+    rule_cols = [f'rule_{i}' for i in range(1, 9) if active_rules.get(i, True)]
+    max_rules = len(rule_cols) if rule_cols else 1
+
+    for row in df.iter_rows(named=True):
+        broken = [RULE_DESCRIPTIONS[r] for r in rule_cols if row[r]]
+        if broken:
+            num_broken = len(broken)
+            indices.append(row['index'])
+            values.append(row['value'])
+            hover_texts.append("<br>".join(broken))
+            intensity = 1 - (num_broken - 1) / max_rules * 0.7
+            red_val = int(255 * intensity)
+            marker_colors.append(f'rgb({red_val}, 0, 0)')
+    return indices, values, hover_texts, marker_colors
+
+
+def best_of(fn, repeats=REPEATS):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rng = np.random.default_rng(42)
+    active_rules = {i: True for i in range(1, 9)}
+    print(f"{'points':>10} {'violations':>11} {'loop (s)':>10} {'columnar (s)':>13} {'speedup':>8}")
+    for n in SIZES:
+        # A slow drift on top of noise, so every rule fires somewhere
+        values = rng.normal(100, 5, n) + np.sin(np.arange(n) / 500) * 8
+        df = pl.DataFrame({'value': values}).with_row_index()
+        df = add_control_rules(df, calculate_control_stats(df), active_rules)
+
+        markers = rule_violation_markers(df, active_rules)
+        assert markers['hover_text'].to_list() == markers_loop(df, active_rules)[2]
+
+        loop_time = best_of(lambda: markers_loop(df, active_rules))
+        columnar_time = best_of(lambda: rule_violation_markers(df, active_rules))
+        print(f"{n:>10,} {markers.height:>11,} {loop_time:>10.3f} {columnar_time:>13.4f} "
+              f"{loop_time / columnar_time:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Load test: requests per second of the scoring API (`POST /api/v1/evaluate`).
+
+Sends the same batch request (`--series` series of `--points` random points
+each, with spec limits) from `--concurrency` threads for `--duration`
+seconds, and reports the throughput and latency percentiles for a JSON
+response and an Arrow IPC one.
+
+Without `--url` the requests go to the Flask app in this process (through
+its test client), which measures the evaluation and serialization cost
+alone. To measure a real deployment, start it and point the script at it:
+
+    gunicorn -w 4 -b 127.0.0.1:8050 app.app:server
+    python benchmarks/load_test_evaluate.py --url http://127.0.0.1:8050 --concurrency 8
+
+Run from the repo root:
+    python benchmarks/load_test_evaluate.py [--series 10] [--points 1000] [--duration 10]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+ROUTE = '/api/v1/evaluate'
+
+
+def make_body(series, points, seed=42):
+    rng = np.random.default_rng(seed)
+    return json.dumps({
+        'series': [{'id': f'line-{i}', 'values': rng.normal(100, 5, points).round(3).tolist(),
+                    'usl': 115, 'lsl': 85} for i in range(series)],
+    }).encode()
+
+
+def http_sender(url):
+    """Send function posting to a running server."""
+    def send(body, query):
+        req = urllib.request.Request(url + ROUTE + query, data=body,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, 0
+    return send
+
+
+def in_process_sender():
+    """Send function calling the app in this process."""
+    from app import server
+    lock = threading.Lock()
+    clients = {}
+
+    def send(body, query):
+        # Flask test clients aren't thread safe: one per thread
+        thread = threading.get_ident()
+        with lock:
+            client = clients.setdefault(thread, server.test_client())
+        response = client.post(ROUTE + query, data=body, content_type='application/json')
+        return response.status_code, len(response.data)
+    return send
+
+
+def run(send, body, query, concurrency, duration):
+    latencies, sizes, errors = [], [], []
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, size = send(body, query)
+            elapsed = time.perf_counter() - start
+            if status == 200:
+                latencies.append(elapsed)
+                sizes.append(size)
+            else:
+                errors.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sizes, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help="base URL of a running server (default: in-process)")
+    parser.add_argument('--series', type=int, default=10, help="series per request")
+    parser.add_argument('--points', type=int, default=1000, help="points per series")
+    parser.add_argument('--concurrency', type=int, default=4, help="client threads")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per response format")
+    args = parser.parse_args()
+
+    send = http_sender(args.url.rstrip('/')) if args.url else in_process_sender()
+    body = make_body(args.series, args.points)
+    target = args.url or 'in-process'
+    print(f"{target}: {args.series} series x {args.points:,} points per request "
+          f"({len(body) / 1024:.0f} kB), {args.concurrency} threads")
+    print(f"{'response':>9} {'requests':>9} {'req/s':>8} {'points/s':>11} {'p50 (ms)':>9} "
+          f"{'p95 (ms)':>9} {'kB/resp':>8} {'errors':>7}")
+    for name, query in [('json', ''), ('arrow', '?format=arrow')]:
+        send(body, query)  # warm up
+        latencies, sizes, errors, elapsed = run(send, body, query, args.concurrency, args.duration)
+        if not latencies:
+            print(f"{name:>9} all {len(errors)} requests failed (status {errors[0]})")
+            continue
+        rate = len(latencies) / elapsed
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        print(f"{name:>9} {len(latencies):>9,} {rate:>8.1f} {rate * args.series * args.points:>11,.0f} "
+              f"{p50:>9.1f} {p95:>9.1f} {np.mean(sizes) / 1024:>8.0f} {len(errors):>7}")
+
+
+if __name__ == '__main__':
+    main()
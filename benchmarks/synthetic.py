@@ -0,0 +1,59 @@
+"""
+Synthetic process data for the benchmarks.
+
+Each generator returns `n` observations of a process with mean 100 and
+standard deviation 5, with a different kind of special cause variation, so
+the rules fire about as often as they would on real data of that kind:
+
+  * `in_control`: normally distributed noise only
+  * `shifted`: the mean moves up by 1.5 sigma halfway through
+  * `trending`: the mean drifts linearly by 3 sigma over the series
+  * `alternating`: successive points alternate 1 sigma above and below
+    the mean, on top of a little noise
+
+Usage from a benchmark script (run from the repo root, so this directory is
+on sys.path):
+
+    from synthetic import GENERATORS, make_series
+    df = make_series('shifted', 1_000_000)
+"""
+
+import numpy as np
+import polars as pl
+
+MEAN = 100.0
+SIGMA = 5.0
+
+
+def in_control(n, rng):
+    return rng.normal(MEAN, SIGMA, n)
+
+
+def shifted(n, rng):
+    values = rng.normal(MEAN, SIGMA, n)
+    values[n // 2:] += 1.5 * SIGMA
+    return values
+
+
+def trending(n, rng):
+    return rng.normal(MEAN, SIGMA, n) + np.linspace(0, 3 * SIGMA, n)
+
+
+def alternating(n, rng):
+    signs = np.where(np.arange(n) % 2 == 0, 1.0, -1.0)
+    return MEAN + signs * SIGMA + rng.normal(0, SIGMA / 5, n)
+
+
+GENERATORS = {
+    'in_control': in_control,
+    'shifted': shifted,
+    'trending': trending,
+    'alternating': alternating,
+}
+
+
+def make_series(pattern, n, seed=42):
+    """A DataFrame with a 'value' column of `n` points of `pattern` (a key
+    of GENERATORS), the same for the same seed."""
+    rng = np.random.default_rng(seed)
+    return pl.DataFrame({'value': GENERATORS[pattern](n, rng).round(4)})
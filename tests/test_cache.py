@@ -0,0 +1,165 @@
+import os
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from utils.cache import ArrowDirectoryBackend, MemoryBackend, RedisBackend
+
+
+def make_redis_backend(**kwargs):
+    fakeredis = pytest.importorskip('fakeredis')
+    backend = RedisBackend('redis://localhost:6379/0', **kwargs)
+    backend.client = fakeredis.FakeRedis()
+    return backend
+
+
+@pytest.fixture(params=['memory', 'arrow', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend()
+    if request.param == 'arrow':
+        return ArrowDirectoryBackend(str(tmp_path))
+    return make_redis_backend()
+
+
+def test_frame_round_trip(backend):
+    df = pl.DataFrame({'value': [1.0, 2.5, None], 'timestamp': ['a', 'b', 'c']})
+    backend.set_frame('stats:abc:0', df)
+    assert_frame_equal(backend.get_frame('stats:abc:0'), df)
+
+
+def test_json_round_trip(backend):
+    value = {'mean': 1.5, 'ucl': 3.0, 'rules': [1, 2, 5], 'label': None}
+    backend.set_json('stats:abc:0', value)
+    assert backend.get_json('stats:abc:0') == value
+
+
+def test_frames_and_json_under_the_same_key_are_separate(backend):
+    df = pl.DataFrame({'value': [1.0]})
+    backend.set_frame('abc', df)
+    backend.set_json('abc', {'n': 1})
+    assert_frame_equal(backend.get_frame('abc'), df)
+    assert backend.get_json('abc') == {'n': 1}
+    backend.delete('abc')
+    assert backend.get_frame('abc') is None
+    assert backend.get_json('abc') is None
+
+
+def test_hit_and_miss_counters(backend):
+    assert backend.get_frame('missing') is None
+    assert backend.get_json('missing') is None
+    backend.set_json('present', [1])
+    backend.get_json('present')
+    backend.get_json('present')
+    assert backend.stats() == {'backend': backend.name, 'hits': 2, 'misses': 2}
+
+
+def test_none_key_is_a_miss_without_counting(backend):
+    assert backend.get_frame(None) is None
+    assert backend.stats()['misses'] == 0
+
+
+def test_clear(backend):
+    backend.set_frame('a', pl.DataFrame({'value': [1.0]}))
+    backend.set_json('b', 1)
+    backend.clear()
+    assert backend.get_frame('a') is None
+    assert backend.get_json('b') is None
+
+
+def test_memory_evicts_least_recently_used_entry():
+    backend = MemoryBackend(max_entries=2)
+    backend.set_json('a', 1)
+    backend.set_json('b', 2)
+    backend.get_json('a')
+    backend.set_json('c', 3)
+    assert backend.get_json('a') == 1
+    assert backend.get_json('b') is None
+    assert backend.get_json('c') == 3
+
+
+def test_memory_evicts_over_byte_budget_but_keeps_the_newest_entry():
+    df = pl.DataFrame({'value': list(range(1000))}, schema={'value': pl.Float64})
+    backend = MemoryBackend(max_bytes=df.estimated_size())
+    backend.set_frame('a', df)
+    backend.set_frame('b', df)
+    assert backend.get_frame('a') is None
+    assert backend.get_frame('b') is not None
+    # Bigger than the whole budget, still cached on its own
+    big = pl.concat([df, df])
+    backend.set_frame('big', big)
+    assert_frame_equal(backend.get_frame('big'), big)
+
+
+def test_arrow_evicts_least_recently_used_files(tmp_path):
+    df = pl.DataFrame({'value': list(range(1000))}, schema={'value': pl.Float64})
+    backend = ArrowDirectoryBackend(str(tmp_path), max_bytes=10 ** 9)
+    for i, key in enumerate(['a', 'b', 'c']):
+        backend.set_frame(key, df)
+        os.utime(tmp_path / f'{key}.arrow', (1000 + i, 1000 + i))
+    # Reading 'a' makes it the most recently used
+    backend.get_frame('a')
+    backend.max_bytes = 2 * os.path.getsize(tmp_path / 'a.arrow')
+    backend.set_json('d', 1)
+    assert backend.get_frame('b') is None
+    assert backend.get_frame('a') is not None
+    assert backend.get_json('d') == 1
+
+
+def test_arrow_keeps_files_being_written_by_other_workers(tmp_path):
+    backend = ArrowDirectoryBackend(str(tmp_path), max_bytes=1)
+    in_flight = tmp_path / 'tmpabc123.tmp'
+    in_flight.write_bytes(b'x' * 1000)
+    backend.set_json('a', 1)
+    backend.set_json('b', 2)
+    assert in_flight.exists()
+    backend.clear()
+    assert in_flight.exists()
+
+
+def test_redis_entries_expire_and_clear_keeps_other_keys():
+    backend = make_redis_backend(ttl=60)
+    backend.set_frame('a', pl.DataFrame({'value': [1.0]}))
+    backend.client.set('someone-else', b'1')
+    assert 0 < backend.client.ttl(backend.prefix + 'frame:a') <= 60
+    backend.clear()
+    assert backend.get_frame('a') is None
+    assert backend.client.get('someone-else') == b'1'
+
+
+def test_extended_frames_round_trip(backend):
+    df = pl.DataFrame({'value': [1.0, 2.0, 3.0]})
+    backend.set_frame('v0', df)
+    for i in range(1, 6):
+        extended = pl.concat([df, pl.DataFrame({'value': [float(i)]})])
+        backend.set_extended_frame(f'v{i}', extended, f'v{i - 1}', df.height)
+        df = extended
+    assert_frame_equal(backend.get_frame('v5'), df)
+    assert_frame_equal(backend.get_frame('v3'), df.head(6))
+
+
+def test_extended_frames_only_store_new_rows(monkeypatch, tmp_path):
+    monkeypatch.setattr('utils.cache.MAX_APPEND_CHAIN', 3)
+    backend = ArrowDirectoryBackend(str(tmp_path))
+    df = pl.DataFrame({'value': [float(i) for i in range(100)]})
+    backend.set_frame('v0', df)
+    for i in range(1, 6):
+        extended = pl.concat([df, pl.DataFrame({'value': [float(i)]})])
+        backend.set_extended_frame(f'v{i}', extended, f'v{i - 1}', df.height)
+        df = extended
+    full_copies = sorted(path.name for path in tmp_path.glob('*.arrow') if '#' not in path.name)
+    # A full copy once the chain is longer than MAX_APPEND_CHAIN
+    assert full_copies == ['v0.arrow', 'v4.arrow']
+    assert pl.read_ipc(tmp_path / 'v2#rows.arrow').height == 1
+    assert_frame_equal(backend.get_frame('v5'), df)
+
+
+def test_extended_frame_is_a_miss_without_its_base(tmp_path):
+    backend = ArrowDirectoryBackend(str(tmp_path))
+    df = pl.DataFrame({'value': [1.0, 2.0]})
+    backend.set_frame('v0', df.head(1))
+    backend.set_extended_frame('v1', df, 'v0', 1)
+    backend.delete('v0')
+    assert backend.get_frame('v1') is None
+    assert backend.stats()['misses'] == 1
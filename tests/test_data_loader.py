@@ -0,0 +1,16 @@
+from utils import data_loader
+
+
+def test_upload_paths_are_not_memoized(tmp_path):
+    before = dict(data_loader._file_keys)
+    for i in range(3):
+        path = tmp_path / f'upload{i}.csv'
+        path.write_text(f'value\n{i}\n2\n3\n')
+        dataset_key, df = data_loader.load_uploaded_file(str(path))
+        assert dataset_key is not None and df.height == 3
+    assert data_loader._file_keys == before
+
+
+def test_predefined_datasets_are_memoized():
+    data_loader.load_predefined_dataset('in_control.csv')
+    assert any(path.endswith('in_control.csv') for path in data_loader._file_keys)
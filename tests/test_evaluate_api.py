@@ -0,0 +1,45 @@
+import polars as pl
+import pytest
+from flask import Flask
+
+from api.evaluate import ARROW_STREAM, register_evaluate_routes
+
+
+@pytest.fixture
+def client():
+    server = Flask(__name__)
+    register_evaluate_routes(server)
+    return server.test_client()
+
+
+def test_evaluates_series(client):
+    response = client.post('/api/v1/evaluate', json={'series': [{'id': 'a', 'values': [1, 2, 3, 30]}],
+                                                     'active_rules': [1]})
+    assert response.status_code == 200
+    result = response.get_json()['results'][0]
+    assert result['id'] == 'a' and result['rows'] == 4
+
+
+@pytest.mark.parametrize('body', [
+    '{"values": [1, 2, NaN]}',
+    '{"values": [1, 2, Infinity]}',
+    '{"values": [1, 2, 3], "usl": -Infinity}',
+])
+def test_rejects_non_finite_numbers(client, body):
+    response = client.post('/api/v1/evaluate', data=body, content_type='application/json')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('active_rules', [[99], [0], [True], ['1']])
+def test_rejects_unknown_rules(client, active_rules):
+    response = client.post('/api/v1/evaluate', json={'values': [1, 2, 3], 'active_rules': active_rules})
+    assert response.status_code == 400
+
+
+def test_rejects_non_finite_arrow_values(client):
+    body = pl.DataFrame({'value': [1.0, 2.0, float('nan')]}).write_ipc_stream(None).getvalue()
+    response = client.post('/api/v1/evaluate', data=body, content_type=ARROW_STREAM)
+    assert response.status_code == 400
+    body = pl.DataFrame({'value': [1.0, 2.0, 3.0]}).write_ipc_stream(None).getvalue()
+    response = client.post('/api/v1/evaluate?usl=nan', data=body, content_type=ARROW_STREAM)
+    assert response.status_code == 400
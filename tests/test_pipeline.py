@@ -0,0 +1,46 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from utils.cache import get_cache
+from utils.data_processor import add_control_rules
+from utils.pipeline import append_observations, get_rules, get_stats
+
+ALL_RULES = {i: True for i in range(1, 9)}
+FLAGS = [f'rule_{i}' for i in range(1, 9)]
+
+
+@pytest.fixture
+def dataset_key():
+    key = 'f' * 32
+    values = np.random.default_rng(0).normal(10, 1, 500)
+    get_cache().set_frame(key, pl.DataFrame({'value': values}))
+    yield key
+    get_cache().clear()
+
+
+def full_evaluation(dataset_key, baseline_end):
+    df = get_cache().get_frame(dataset_key).with_row_index()
+    return add_control_rules(df, get_stats(dataset_key, baseline_end), ALL_RULES)
+
+
+def test_append_with_a_baseline_matches_a_full_evaluation(dataset_key):
+    get_rules(dataset_key, 100, ALL_RULES)
+    key = dataset_key
+    for values in ([14.0, 14.5], [9.0], [10.0, 13.0, 13.5]):
+        key, new_rows = append_observations(key, values, ALL_RULES, 100)
+        assert new_rows.height == len(values)
+    rules = get_rules(key, 100, ALL_RULES)
+    assert rules.height == 506
+    assert rules.select(FLAGS).equals(full_evaluation(key, 100).select(FLAGS))
+
+
+def test_append_over_all_points_keeps_earlier_flags(dataset_key):
+    old_rules = get_rules(dataset_key, 0, ALL_RULES)
+    key, new_rows = append_observations(dataset_key, [25.0, 10.0], ALL_RULES)
+    assert get_stats(key, 0)['mean'] != get_stats(dataset_key, 0)['mean']
+    rules = get_rules(key, 0, ALL_RULES)
+    assert rules.head(500).select(FLAGS).equals(old_rules.select(FLAGS))
+    # The new points are judged by the updated limits
+    assert rules.tail(2).select(FLAGS).equals(full_evaluation(key, 0).tail(2).select(FLAGS))
+    assert new_rows['rule_1'].to_list() == [True, False]
@@ -0,0 +1,67 @@
+import polars as pl
+import pytest
+from flask import Flask
+
+from api.datasets import register_dataset_routes
+from api.limits import register_limits_routes
+from api.validation import is_number, parse_active_rules
+from utils.cache import get_cache
+from utils.data_processor import calculate_control_stats
+from utils.limits import freeze_limits
+from utils.pipeline import frozen_limits_id, store_limits
+
+
+@pytest.mark.parametrize('value, expected', [
+    (1, True), (2.5, True), (float('nan'), False), (float('inf'), False), (True, False), ('1', False),
+])
+def test_is_number(value, expected):
+    assert is_number(value) is expected
+
+
+def test_parse_active_rules():
+    assert parse_active_rules(None) is None
+    assert parse_active_rules([1, 5]) == {i: i in (1, 5) for i in range(1, 9)}
+    assert parse_active_rules('2,3') == parse_active_rules([2, 3])
+    for bad in ([9], [0], [True], 'a,b', {'1': True}):
+        with pytest.raises(ValueError):
+            parse_active_rules(bad)
+
+
+@pytest.fixture
+def client():
+    server = Flask(__name__)
+    register_dataset_routes(server)
+    register_limits_routes(server)
+    yield server.test_client()
+    get_cache().clear()
+
+
+@pytest.fixture
+def dataset_key():
+    key = 'e' * 32
+    get_cache().set_frame(key, pl.DataFrame({'value': [10.0, 11.0, 9.0, 10.5, 9.5]}))
+    return key
+
+
+def test_append_rejects_non_finite_values_and_unknown_rules(client, dataset_key):
+    url = f'/api/datasets/{dataset_key}/append'
+    response = client.post(url, data='{"values": [1, NaN]}', content_type='application/json')
+    assert response.status_code == 400
+    response = client.post(url, json={'values': [10.0], 'active_rules': [1, 9]})
+    assert response.status_code == 400
+    response = client.post(url, json={'values': [10.0], 'active_rules': [1]})
+    assert response.status_code == 200
+    assert response.get_json()['rows'] == 6
+
+
+def test_score_rejects_non_finite_values_and_unknown_rules(client, dataset_key):
+    stats = calculate_control_stats(get_cache().get_frame(dataset_key))
+    limits_id = frozen_limits_id(store_limits(freeze_limits(stats, None, {})))
+    url = f'/api/limits/{limits_id}/score'
+    response = client.post(url, data='{"values": [Infinity]}', content_type='application/json')
+    assert response.status_code == 400
+    response = client.post(url, json={'values': [10.0], 'active_rules': [99]})
+    assert response.status_code == 400
+    response = client.post(url, json={'values': [10.0, 30.0], 'active_rules': [1]})
+    assert response.status_code == 200
+    assert response.get_json()['counts']['1'] == 1